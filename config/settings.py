@@ -5,6 +5,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Корень проекта: относительные пути из настроек не должны зависеть от рабочей директории
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 @dataclass
 class APISettings:
@@ -18,6 +21,7 @@ class APISettings:
     TINKOFF_SANDBOX_ACCOUNT_ID: str = os.getenv('TINKOFF_SANDBOX_ACCOUNT_ID', '')
     TINKOFF_LIVE_ACCOUNT_ID: str = os.getenv('TINKOFF_LIVE_ACCOUNT_ID', '')
     MOEX_API_KEY: str = os.getenv('MOEX_API_KEY', '')  # Для ALGOPACK
+    ISS_CACHE_DIR: str = os.path.join(PROJECT_ROOT, os.getenv('ISS_CACHE_DIR', 'data/cache/iss'))  # Дисковый кэш свечей ISS
     
     # Альтернативные брокеры
     BROKER_TYPE: str = os.getenv('BROKER_TYPE', 'paper')  # 'paper', 'tinkoff', 'finam', 'alor'
@@ -82,8 +86,22 @@ class APISettings:
 class DatabaseSettings:
     """Настройки БД"""
     DATABASE_URL: str = os.getenv('DATABASE_URL', 'sqlite:///data/trading_bot.db')
-    POOL_SIZE: int = 5
-    MAX_OVERFLOW: int = 10
+    POOL_SIZE: int = int(os.getenv('DB_POOL_SIZE', 5))
+    MAX_OVERFLOW: int = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    POOL_RECYCLE: int = int(os.getenv('DB_POOL_RECYCLE', 1800))  # Переоткрывать соединения старше (сек)
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 10000))  # Ожидание блокировки
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv('SQLITE_CACHE_SIZE_KB', 65536))  # Кэш страниц на соединение
+    SQLITE_MMAP_SIZE: int = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))  # Отображение файла БД в память (байт)
+    CANDLE_STORE: str = os.getenv('CANDLE_STORE', 'sql')  # Хранилище свечей для обучения: 'sql' или 'columnar'
+    COLUMNAR_STORE_DIR: str = os.getenv('COLUMNAR_STORE_DIR', 'data/columnar')
+    WRITE_QUEUE_SIZE: int = int(os.getenv('DB_WRITE_QUEUE_SIZE', 10000))  # Очередь фоновой записи
+    WRITE_BATCH_SIZE: int = int(os.getenv('DB_WRITE_BATCH_SIZE', 500))  # Записей в одной транзакции
+    WRITE_FLUSH_INTERVAL: float = float(os.getenv('DB_WRITE_FLUSH_INTERVAL', 1.0))  # Макс. задержка записи (сек)
+    DURABLE_TRADES: bool = os.getenv('DB_DURABLE_TRADES', 'true').lower() == 'true'  # Сделки - только после записи на диск
+    RETENTION_POLICY: str = os.getenv('DB_RETENTION_POLICY', '1m:90')  # Срок хранения в candles: 'таймфрейм:дней,...'
+    ARCHIVE_ENABLED: bool = os.getenv('DB_ARCHIVE_ENABLED', 'true').lower() == 'true'  # Архивировать вытесняемые свечи
+    ARCHIVE_DIR: str = os.getenv('DB_ARCHIVE_DIR', 'data/archive')
+    MAINTENANCE_WINDOW: str = os.getenv('DB_MAINTENANCE_WINDOW', '01:00-06:00')  # Окно обслуживания (МСК), вне торгов
 
 
 @dataclass
@@ -96,6 +114,10 @@ class TradingSettings:
     MAX_DRAWDOWN: float = 0.15
     DAILY_LOSS_LIMIT: float = 0.03
     COMMISSION_RATE: float = 0.0004  # 0.04%
+    CYCLE_INTERVAL_SECONDS: int = int(os.getenv('CYCLE_INTERVAL_SECONDS', 1800))  # Период торгового цикла
+    QUOTE_POLL_INTERVAL: float = float(os.getenv('QUOTE_POLL_INTERVAL', 1.0))  # Период опроса котировок (сек)
+    ORDERBOOK_POLL_INTERVAL: float = float(os.getenv('ORDERBOOK_POLL_INTERVAL', 0))  # Период опроса стаканов (0 = выкл.)
+    QUOTE_MAX_AGE: float = float(os.getenv('QUOTE_MAX_AGE', 5.0))  # Допустимый возраст котировки из кэша (сек)
     SANDBOX_LEARNING_ONLY: bool = os.getenv('SANDBOX_LEARNING_ONLY', 'true').lower() == 'true'  # Режим "только обучение" для sandbox (без торговли)
 
 
@@ -106,6 +128,9 @@ class MLSettings:
     PREDICTION_HORIZON: int = 30  # На сколько минут вперед
     TRAIN_TEST_SPLIT: float = 0.8
     MODEL_RETRAIN_DAYS: int = 90
+    FEATURE_STORE_ENABLED: bool = os.getenv('FEATURE_STORE_ENABLED', 'true').lower() == 'true'  # Кэш признаков для обучения
+    FEATURE_STORE_DIR: str = os.getenv('FEATURE_STORE_DIR', 'data/features')
+    FEATURE_WORKERS: int = int(os.getenv('FEATURE_WORKERS', 1))  # Процессов для расчета признаков (0 - по числу ядер)
 
 
 @dataclass
@@ -9,7 +9,7 @@ import time
 import logging
 import threading
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
 
 # Добавляем корневую папку в PYTHONPATH
 sys.path.insert(0, str(Path(__file__).parent))
@@ -31,6 +31,9 @@ try:
     from src.utils.token_manager import sandbox_token_manager, live_token_manager
     from src.data_collection.database import DatabaseManager
     from src.data_collection.moex_api import MOEXDataCollector
+    from src.data_collection.candle_sync import CandleSynchronizer
+    from src.data_collection.write_behind import WriteBehindQueue
+    from src.data_collection.quote_poller import QuoteCache, QuotePoller
     from src.monitoring.bot_status_manager import BotStatusManager
     from src.brokers.broker_factory import create_broker
 except ImportError as e:
@@ -45,7 +48,11 @@ class TradingBot:
         self.sandbox_client = None
         self.live_client = None
         self.db = None
+        self.db_writer = None
         self.moex = None
+        self.candle_sync = None
+        self.quote_cache = QuoteCache(max_age=settings.trading.QUOTE_MAX_AGE)
+        self.quote_poller = None
         self.trading_enabled = True
         self.sandbox_capital = settings.trading.INITIAL_CAPITAL
         self.live_capital = settings.trading.INITIAL_CAPITAL
@@ -73,7 +80,8 @@ class TradingBot:
                             token=finam_token,
                             account_id=finam_account,
                             sandbox=True,
-                            initial_capital=settings.trading.INITIAL_CAPITAL
+                            initial_capital=settings.trading.INITIAL_CAPITAL,
+                            quote_cache=self.quote_cache
                         )
                         logger.info("✅ Sandbox Finam клиент инициализирован")
                     else:
@@ -87,7 +95,8 @@ class TradingBot:
                             token=sandbox_token_manager.get_token(),
                             account_id=settings.api.TINKOFF_SANDBOX_ACCOUNT_ID or settings.api.TINKOFF_ACCOUNT_ID,
                             sandbox=True,
-                            initial_capital=settings.trading.INITIAL_CAPITAL
+                            initial_capital=settings.trading.INITIAL_CAPITAL,
+                            quote_cache=self.quote_cache
                         )
                         logger.info("✅ Sandbox Tinkoff клиент инициализирован")
                     else:
@@ -99,7 +108,8 @@ class TradingBot:
                         token='',
                         account_id='',
                         sandbox=True,
-                        initial_capital=settings.trading.INITIAL_CAPITAL
+                        initial_capital=settings.trading.INITIAL_CAPITAL,
+                        quote_cache=self.quote_cache
                     )
                     logger.info(f"✅ Sandbox {broker_type} клиент инициализирован")
             except Exception as e:
@@ -118,7 +128,8 @@ class TradingBot:
                             token=finam_token,
                             account_id=finam_account,
                             sandbox=False,
-                            initial_capital=settings.trading.INITIAL_CAPITAL
+                            initial_capital=settings.trading.INITIAL_CAPITAL,
+                            quote_cache=self.quote_cache
                         )
                         logger.info("✅ Live Finam клиент инициализирован")
                     else:
@@ -132,7 +143,8 @@ class TradingBot:
                             token=live_token_manager.get_token(),
                             account_id=settings.api.TINKOFF_LIVE_ACCOUNT_ID or settings.api.TINKOFF_ACCOUNT_ID,
                             sandbox=False,
-                            initial_capital=settings.trading.INITIAL_CAPITAL
+                            initial_capital=settings.trading.INITIAL_CAPITAL,
+                            quote_cache=self.quote_cache
                         )
                         logger.info("✅ Live Tinkoff клиент инициализирован")
                     else:
@@ -144,7 +156,8 @@ class TradingBot:
                         token='',
                         account_id='',
                         sandbox=False,
-                        initial_capital=settings.trading.INITIAL_CAPITAL
+                        initial_capital=settings.trading.INITIAL_CAPITAL,
+                        quote_cache=self.quote_cache
                     )
                     logger.info(f"✅ Live {broker_type} клиент инициализирован")
             except Exception as e:
@@ -157,6 +170,14 @@ class TradingBot:
         # Инициализация БД
         try:
             self.db = DatabaseManager(settings.db.DATABASE_URL)
+            # Запись в БД в фоне: торговый цикл не ждет диска
+            self.db_writer = WriteBehindQueue(
+                self.db,
+                max_queue=settings.db.WRITE_QUEUE_SIZE,
+                batch_size=settings.db.WRITE_BATCH_SIZE,
+                flush_interval=settings.db.WRITE_FLUSH_INTERVAL,
+                durable_trades=settings.db.DURABLE_TRADES
+            )
             logger.info(f"✅ Подключение к БД установлено")
         except Exception as e:
             logger.warning(f"⚠️  Проблема с подключением к БД: {e}")
@@ -168,8 +189,34 @@ class TradingBot:
         except Exception as e:
             logger.warning(f"⚠️  Проблема с MOEX API: {e}")
         
+        if self.moex and self.db:
+            self.candle_sync = CandleSynchronizer(self.moex, self.db, writer=self.db_writer)
+        
+        # Фоновый опрос котировок: брокер и портфель читают цены из кэша без HTTP
+        if self.moex:
+            try:
+                orderbook_interval = settings.trading.ORDERBOOK_POLL_INTERVAL or None
+                self.quote_poller = QuotePoller(
+                    self.moex,
+                    self.quote_cache,
+                    self.load_tickers(),
+                    interval=settings.trading.QUOTE_POLL_INTERVAL,
+                    orderbook_interval=orderbook_interval
+                )
+                self.quote_poller.start()
+                logger.info("✅ Опрос котировок запущен")
+            except Exception as e:
+                logger.warning(f"⚠️  Проблема с опросом котировок: {e}")
+        
         return True
     
+    def load_tickers(self) -> list:
+        """Основной набор тикеров из config/trading_config.yaml"""
+        import yaml
+        with open('config/trading_config.yaml', 'r') as f:
+            config = yaml.safe_load(f)
+        return config.get('tickers', {}).get('primary', ['SBER', 'GAZP', 'LKOH', 'GMKN'])
+    
     def get_portfolio_info(self, client, mode_name: str):
         """Получить информацию о портфеле"""
         try:
@@ -179,6 +226,14 @@ class TradingBot:
             positions = portfolio.get('positions', [])
             positions_count = len(positions)
             
+            # Снимок портфеля для истории (пишется в фоне; без баланса из API не пишем)
+            if self.db_writer and capital:
+                self.db_writer.save_snapshot(capital, cash, positions, account=mode_name.lower())
+            
+            # Котировки открытых позиций тоже держим в кэше
+            if self.quote_poller and positions:
+                self.quote_poller.add_tickers([pos['ticker'] for pos in positions if pos.get('ticker')])
+            
             # Если баланс 0, используем INITIAL_CAPITAL из настроек
             if capital == 0.0:
                 if mode_name == "Sandbox":
@@ -231,44 +286,17 @@ class TradingBot:
                 self.sandbox_capital = portfolio_info['capital']
             
             # Сбор данных для обучения
-            if self.moex and self.db:
+            if self.candle_sync:
                 logger.info("Сбор данных для обучения...")
                 try:
                     # Загрузка конфига тикеров
-                    import yaml
-                    with open('config/trading_config.yaml', 'r') as f:
-                        config = yaml.safe_load(f)
-                    tickers = config.get('tickers', {}).get('primary', ['SBER', 'GAZP', 'LKOH', 'GMKN'])
-                    
-                    # Сбор данных за последние 7 дней
-                    end_date = datetime.now()
-                    start_date = end_date - timedelta(days=7)
+                    tickers = self.load_tickers()
                     
-                    for ticker in tickers:
-                        try:
-                            candles = self.moex.get_historical_candles(
-                                ticker=ticker,
-                                start_date=start_date,
-                                end_date=end_date,
-                                timeframe='1h'
-                            )
-                            
-                            if not candles.empty and self.db:
-                                # Сохранение в БД
-                                for _, row in candles.iterrows():
-                                    self.db.save_candle(
-                                        ticker=ticker,
-                                        time=row.get('time', row.get('begin', datetime.now())),
-                                        open=row.get('open', 0),
-                                        high=row.get('high', 0),
-                                        low=row.get('low', 0),
-                                        close=row.get('close', 0),
-                                        volume=row.get('volume', 0),
-                                        timeframe='1h'
-                                    )
-                                logger.info(f"✓ Собрано {len(candles)} свечей для {ticker}")
-                        except Exception as e:
-                            logger.warning(f"Ошибка сбора данных для {ticker}: {e}")
+                    # Докачиваем только свечи новее последней сохраненной (+ небольшое перекрытие)
+                    saved = self.candle_sync.sync(tickers, timeframe='1h')
+                    for ticker, count in saved.items():
+                        if count:
+                            logger.info(f"✓ Собрано {count} свечей для {ticker}")
                     
                     logger.info("Данные собраны и сохранены в БД")
                 except Exception as e:
@@ -348,7 +376,8 @@ class TradingBot:
             return
         
         logger.info("✅ Бот запущен и работает")
-        logger.info("Торговый цикл будет выполняться каждые 30 минут")
+        cycle_interval = settings.trading.CYCLE_INTERVAL_SECONDS
+        logger.info(f"Торговый цикл будет выполняться каждые {cycle_interval} секунд")
         
         # Основной цикл
         cycle_count = 0
@@ -361,15 +390,20 @@ class TradingBot:
                 
                 self.trading_cycle()
                 
-                # Ожидание до следующего цикла (30 минут = 1800 секунд)
-                logger.info("\nОжидание до следующего цикла (30 минут)...")
-                time.sleep(1800)  # 30 минут
+                # Ожидание до следующего цикла
+                logger.info(f"\nОжидание до следующего цикла ({cycle_interval} секунд)...")
+                time.sleep(cycle_interval)
                 
         except KeyboardInterrupt:
             logger.info("\nБот остановлен пользователем (Ctrl+C)")
         except Exception as e:
             logger.error(f"Критическая ошибка: {e}", exc_info=True)
             raise
+        finally:
+            if self.quote_poller:
+                self.quote_poller.stop()
+            if self.db_writer:
+                self.db_writer.close()
 
 
 def main():
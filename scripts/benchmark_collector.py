@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Замер пропускной способности MOEXDataCollector на локальном стенде ISS"""
+
+import sys
+import argparse
+import logging
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Добавляем корневую папку в PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data_collection.candle_sync import CandleSynchronizer
+from src.data_collection.database import DatabaseManager
+from src.data_collection.iss_stub_server import ISSStubServer
+from src.data_collection.moex_api import MOEXDataCollector
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+
+def timed(label, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<40} {elapsed:8.3f} с")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк MOEXDataCollector на стенде ISS')
+    parser.add_argument('--db', default='data/trading_bot.db', help='Источник данных для стенда')
+    parser.add_argument('--tickers', nargs='*', default=['SBER', 'GAZP', 'LKOH', 'GMKN'])
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--timeframe', default='1h')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.02, help='Задержка стенда, с')
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = ISSStubServer(
+        db_path=args.db,
+        latency=args.latency,
+        latency_jitter=args.jitter,
+        error_rate=args.error_rate,
+        shift_to_now=True
+    )
+    url = stub.start()
+    workdir = Path(tempfile.mkdtemp(prefix='iss_bench_'))
+
+    try:
+        collector = MOEXDataCollector(max_workers=args.workers, cache_dir=None, base_url=url)
+        end = datetime.now()
+        start = end - timedelta(days=args.days)
+
+        print(f"Стенд: {url}, задержка {args.latency}+{args.jitter} с, ошибок {args.error_rate:.0%}")
+
+        data, elapsed = timed(
+            f"История {len(args.tickers)} тикеров ({args.timeframe}, {args.days} д)",
+            collector.get_historical_candles_many, args.tickers, start, end, args.timeframe
+        )
+        rows = sum(len(df) for df in data.values())
+        print(f"  {'':<40} {rows} свечей, {rows / elapsed if elapsed else 0:,.0f} свечей/с")
+
+        timed("Снимок цен (bulk)", collector.get_current_prices, args.tickers)
+
+        # Синхронизация пишет во временную копию, рабочая БД не трогается
+        db_copy = workdir / 'bench.db'
+        if Path(args.db).exists():
+            shutil.copy(args.db, db_copy)
+        db = DatabaseManager(f'sqlite:///{db_copy}')
+        sync = CandleSynchronizer(collector, db)
+        timed("Инкрементальная синхронизация", sync.sync, args.tickers, args.timeframe)
+
+        print(f"Запросов к стенду: {stub.stats['requests']}, ошибок: {stub.stats['errors']}")
+    finally:
+        stub.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Бенчмарк конкурентных чтений/записей БД: профиль engine по умолчанию против настроенного"""
+
+import sys
+import argparse
+import logging
+import multiprocessing as mp
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Добавляем корневую папку в PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from src.data_collection.database import DatabaseManager
+
+logging.basicConfig(level=logging.ERROR)
+
+
+def writer(database_url: str, profile: str, worker: int, seconds: float, batch: int, result):
+    """Upsert пачек минутных свечей (как синхронизация и лента сделок)"""
+    logging.disable(logging.INFO)
+    db = DatabaseManager(database_url, engine_profile=profile)
+    ticker = f'BENCH{worker}'
+    start = datetime(2025, 1, 1)
+    ops = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        times = pd.date_range(start + timedelta(minutes=ops * batch), periods=batch, freq='1min')
+        df = pd.DataFrame({'time': times, 'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': 1.5,
+                           'volume': np.arange(batch)})
+        try:
+            db.save_candles(df, ticker, '1m')
+            ops += 1
+        except Exception:
+            errors += 1
+    result.put(('write', ops, errors))
+
+
+def reader(database_url: str, profile: str, worker: int, seconds: float, tickers, result):
+    """Чтение года часовых свечей (как построение признаков и бэктест)"""
+    logging.disable(logging.INFO)
+    db = DatabaseManager(database_url, engine_profile=profile)
+    start, end = datetime(2020, 1, 1), datetime(2030, 1, 1)
+    ops = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            db.load_candle_arrays(tickers[ops % len(tickers)], '1h', start, end)
+            ops += 1
+        except Exception:
+            errors += 1
+    result.put(('read', ops, errors))
+
+
+def run_profile(source: Path, profile: str, args) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix=f'db_bench_{profile}_'))
+    try:
+        path = workdir / 'bench.db'
+        shutil.copy(source, path)
+        if profile == 'default':
+            # Исходный режим журнала SQLite (копия могла унаследовать WAL)
+            with sqlite3.connect(path) as conn:
+                conn.execute('PRAGMA journal_mode = DELETE')
+        database_url = f'sqlite:///{path}'
+        # Миграции и создание таблиц - до старта замера
+        DatabaseManager(database_url, engine_profile=profile)
+
+        result = mp.Queue()
+        procs = [
+            mp.Process(target=writer, args=(database_url, profile, i, args.seconds, args.batch, result))
+            for i in range(args.writers)
+        ] + [
+            mp.Process(target=reader, args=(database_url, profile, i, args.seconds, args.tickers, result))
+            for i in range(args.readers)
+        ]
+        for proc in procs:
+            proc.start()
+        totals = {'write': [0, 0], 'read': [0, 0]}
+        for _ in procs:
+            kind, ops, errors = result.get()
+            totals[kind][0] += ops
+            totals[kind][1] += errors
+        for proc in procs:
+            proc.join()
+        return totals
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк конкурентного доступа к SQLite')
+    parser.add_argument('--db', default='data/trading_bot.db', help='Исходная БД (копируется, не изменяется)')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=60, help='Свечей в одной записи')
+    parser.add_argument('--tickers', nargs='*', default=['SBER', 'GAZP', 'LKOH', 'GMKN'])
+    args = parser.parse_args()
+
+    source = Path(args.db)
+    if not source.exists():
+        parser.error(f'БД не найдена: {source}')
+
+    print(f"{args.writers} писателя, {args.readers} читателя, {args.seconds} с на профиль")
+    print(f"{'профиль':<10} {'записей/с':>10} {'ошибок':>8} {'чтений/с':>10} {'ошибок':>8}")
+    for profile in ('default', 'tuned'):
+        totals = run_profile(source, profile, args)
+        print(
+            f"{profile:<10} {totals['write'][0] / args.seconds:>10.1f} {totals['write'][1]:>8} "
+            f"{totals['read'][0] / args.seconds:>10.1f} {totals['read'][1]:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
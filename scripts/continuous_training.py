@@ -5,7 +5,9 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.data_collection.database import DatabaseManager
-from src.ml_models.features.feature_engineering import FeatureEngineer
+from src.data_collection.columnar_store import ColumnarCandleStore
+from src.ml_models.features.feature_engineering import FeatureEngineer, ticker_flags
+from src.ml_models.features.feature_store import FeatureStore
 from src.ml_models.models.xgboost_model import XGBoostClassifier
 from config.settings import settings
 from datetime import datetime, timedelta
@@ -33,7 +35,15 @@ class ContinuousTrainer:
     
     def __init__(self):
         self.db = DatabaseManager(settings.db.DATABASE_URL)
-        self.feature_eng = FeatureEngineer()
+        # Колоночное хранилище - реплика свечей БД для быстрого чтения при обучении
+        self.candle_store = None
+        if settings.db.CANDLE_STORE == 'columnar':
+            self.candle_store = ColumnarCandleStore(settings.db.COLUMNAR_STORE_DIR)
+        self.feature_eng = FeatureEngineer(workers=settings.ml.FEATURE_WORKERS)
+        # Признаки уже обработанной истории не пересчитываются каждый час
+        self.feature_store = None
+        if settings.ml.FEATURE_STORE_ENABLED:
+            self.feature_store = FeatureStore(settings.ml.FEATURE_STORE_DIR, workers=settings.ml.FEATURE_WORKERS)
         self.best_models = {}
         self.training_history = []
         
@@ -54,17 +64,34 @@ class ContinuousTrainer:
             all_features = []
             all_labels_dict = {5: [], 10: [], 15: []}
             
+            if self.candle_store is not None:
+                for ticker in tickers:
+                    self.candle_store.sync_from_database(self.db, ticker, '1h', start_date)
+                panel = self.candle_store.load_panel(tickers, '1h', start_date, end_date)
+            else:
+                # Все тикеры одним запросом
+                panel = self.db.load_panel(tickers, '1h', start_date, end_date)
+            
+            # Признаки: из хранилища (досчитываются только новые бары)
+            # или всех тикеров одним векторным проходом по панели
+            if self.feature_store is not None:
+                panel_features = self.feature_store.panel_features(panel, '1h')
+            else:
+                panel_features = self.feature_eng.create_panel_features(panel)
+            
             for ticker in tickers:
-                data = self.db.load_candles(ticker, '1h', start_date, end_date)
+                data = panel.ticker_frame(ticker)
                 
                 if data.empty:
                     continue
                 
-                features = self.feature_eng.create_features(data)
+                features = panel_features[ticker]
                 
                 if len(features) > 0:
-                    for t in tickers:
-                        features[f'is_{t}'] = int(ticker == t)
+                    # Общая модель учится на всех тикерах: is_<TICKER> - единственное, что отличает
+                    # их строки. При инференсе столбцы не считаются (FeatureEngineer.from_model
+                    # заполняет их по тикеру и только если бустер по ним делит)
+                    features = ticker_flags(features, ticker, tickers)
                     
                     all_features.append(features)
                     
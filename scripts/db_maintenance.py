@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Обслуживание БД: вытеснение старых свечей в архив, ANALYZE и VACUUM вне торговых часов"""
+
+import sys
+import argparse
+import logging
+import time
+from pathlib import Path
+
+# Добавляем корневую папку в PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import schedule
+
+from config.settings import settings
+from src.data_collection.database import DatabaseManager
+from src.data_collection.retention import RetentionManager
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--once', action='store_true', help='Выполнить один раз и выйти')
+    parser.add_argument('--force', action='store_true', help='Не ждать окна обслуживания')
+    args = parser.parse_args()
+
+    db = DatabaseManager(settings.db.DATABASE_URL)
+    retention = RetentionManager(db)
+    logger.info(
+        f"Политика хранения: {retention.policy}, архив: {'да' if retention.archive else 'нет'}, "
+        f"окно обслуживания (МСК): {settings.db.MAINTENANCE_WINDOW}"
+    )
+
+    if args.once:
+        retention.run(force=args.force)
+        return
+
+    # Окно проверяется внутри run(); за сутки выполняется один запуск
+    schedule.every(10).minutes.do(retention.run)
+    retention.run(force=args.force)
+    while True:
+        try:
+            schedule.run_pending()
+            time.sleep(60)
+        except KeyboardInterrupt:
+            logger.info("Обслуживание БД остановлено")
+            break
+
+
+if __name__ == "__main__":
+    main()
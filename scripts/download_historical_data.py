@@ -33,7 +33,7 @@ def main():
     tickers = config['tickers']['primary']
     
     # Инициализация
-    collector = MOEXDataCollector()
+    collector = MOEXDataCollector(cache_dir=settings.api.ISS_CACHE_DIR)
     cleaner = DataCleaner()
     db = DatabaseManager(settings.db.DATABASE_URL)
     
@@ -48,19 +48,19 @@ def main():
     print(f"Тикеры: {', '.join(tickers)}")
     print()
     
-    # Загрузка для каждого тикера
-    for i, ticker in enumerate(tickers, 1):
+    # Параллельная загрузка всех тикеров
+    candles_by_ticker = collector.get_historical_candles_many(
+        tickers=tickers,
+        start_date=start_date,
+        end_date=end_date,
+        timeframe=timeframe
+    )
+    
+    # Очистка и сохранение для каждого тикера
+    for i, (ticker, candles) in enumerate(candles_by_ticker.items(), 1):
         print(f"\n[{i}/{len(tickers)}] Обработка {ticker}...")
         
         try:
-            # Загрузка с MOEX
-            candles = collector.get_historical_candles(
-                ticker=ticker,
-                start_date=start_date,
-                end_date=end_date,
-                timeframe=timeframe
-            )
-            
             if candles.empty:
                 print(f"  ✗ Нет данных для {ticker}")
                 continue
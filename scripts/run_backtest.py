@@ -79,24 +79,18 @@ tickers = ['SBER', 'GAZP', 'LKOH', 'GMKN']
 end_date = datetime.now()
 start_date = end_date - timedelta(days=180)
 
+# Все тикеры одним запросом, на общей шкале времени
+panel = db.load_panel(tickers, '1h', start_date, end_date, fields=['close'])
+
 prices = {}
 for ticker in tickers:
-    logger.info(f"Загрузка данных для {ticker}...")
-    df = db.load_candles(ticker, '1h', start_date, end_date)
+    df = panel.ticker_frame(ticker)
     
     if df.empty:
         logger.warning(f"  Нет данных для {ticker}")
         continue
     
-    # Переименовываем колонку времени
-    if 'time' in df.columns:
-        df = df.rename(columns={'time': 'timestamp'})
-    elif 'begin' in df.columns:
-        df = df.rename(columns={'begin': 'timestamp'})
-    
-    # Конвертируем в datetime
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    prices[ticker] = df[['timestamp', 'close']].copy()
+    prices[ticker] = df.rename(columns={'time': 'timestamp'})[['timestamp', 'close']]
     logger.info(f"✓ Загружено {len(df)} свечей для {ticker}")
 
 logger.info("")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Запуск локального стенда MOEX ISS (замена iss.moex.com для офлайн-тестов)"""
+
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# Добавляем корневую папку в PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data_collection.iss_stub_server import ISSStubServer
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальный стенд MOEX ISS')
+    parser.add_argument('--db', default='data/trading_bot.db', help='SQLite-база со свечами для синтеза ответов')
+    parser.add_argument('--recordings', default=None, help='Директория записанных ответов')
+    parser.add_argument('--record-from', default=None,
+                        help='Режим записи: адрес настоящего ISS (например, https://iss.moex.com/iss)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа, с')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Случайная добавка к задержке, с')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов с ошибкой')
+    parser.add_argument('--error-status', type=int, default=500, help='HTTP-статус ошибки')
+    parser.add_argument('--shift-to-now', action='store_true',
+                        help='Сдвинуть историю так, чтобы она заканчивалась вчерашним днем')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.record_from and not args.recordings:
+        parser.error('--record-from требует --recordings')
+
+    stub = ISSStubServer(
+        db_path=args.db,
+        recordings_dir=args.recordings,
+        upstream_url=args.record_from,
+        latency=args.latency,
+        latency_jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        shift_to_now=args.shift_to_now,
+        seed=args.seed,
+        host=args.host,
+        port=args.port
+    )
+
+    print(f"Стенд ISS: {stub.url}")
+    print(f"Для бота: export MOEX_ISS_URL={stub.url}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        print("\nОстановка")
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,8 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.data_collection.database import DatabaseManager
-from src.ml_models.features.feature_engineering import FeatureEngineer
+from src.ml_models.features.feature_engineering import FeatureEngineer, ticker_flags
+from src.ml_models.features.feature_store import FeatureStore
 from src.ml_models.models.xgboost_model import XGBoostClassifier
 from config.settings import settings
 from datetime import datetime, timedelta
@@ -46,11 +47,19 @@ def train_optimized_model():
     # Словарь для хранения данных по каждому тикеру
     ticker_data = {}
     
-    feature_eng = FeatureEngineer()
+    feature_eng = FeatureEngineer(workers=settings.ml.FEATURE_WORKERS)
+    
+    # Все тикеры одним запросом; признаки - из хранилища (пересчет только новых баров)
+    # или одним векторным проходом по панели
+    panel = db.load_panel(tickers, timeframe, start_date, end_date)
+    if settings.ml.FEATURE_STORE_ENABLED:
+        panel_features = FeatureStore(settings.ml.FEATURE_STORE_DIR, workers=settings.ml.FEATURE_WORKERS).panel_features(panel, timeframe)
+    else:
+        panel_features = feature_eng.create_panel_features(panel)
     
     for ticker in tickers:
         print(f"\n  Обработка {ticker}...")
-        data = db.load_candles(ticker, timeframe, start_date, end_date)
+        data = panel.ticker_frame(ticker)
         
         if data.empty:
             print(f"    ✗ Нет данных для {ticker}")
@@ -58,13 +67,14 @@ def train_optimized_model():
         
         print(f"    Загружено {len(data)} свечей")
         
-        # Создание признаков
-        features = feature_eng.create_features(data)
+        # Признаки тикера из общего расчета
+        features = panel_features[ticker]
         
         if len(features) > 0:
-            # Добавляем признак тикера
-            for t in tickers:
-                features[f'is_{t}'] = int(ticker == t)
+            # Общая модель учится на всех тикерах: is_<TICKER> - единственное, что отличает
+            # их строки. При инференсе столбцы не считаются (FeatureEngineer.from_model
+            # заполняет их по тикеру и только если бустер по ним делит)
+            features = ticker_flags(features, ticker, tickers)
             
             # Сохраняем признаки и исходные данные
             ticker_data[ticker] = {
@@ -12,6 +12,7 @@ import jwt
 import time
 
 from src.brokers.base_broker import BaseBroker
+from src.utils.rate_limiter import get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +30,9 @@ class AlorBroker(BaseBroker):
         super().__init__(token, account_id, sandbox)
         self.base_url = "https://api.alor.ru" if not sandbox else "https://apidev.alor.ru"
         self.refresh_token = None
+        # Keep-alive и общий для процесса бюджет запросов с повторами на 429/5xx
+        self.session = requests.Session()
+        self.limiter = get_rate_limiter()
         self.logger.info(f"AlorBroker инициализирован (sandbox={sandbox})")
     
     def _get_headers(self) -> Dict[str, str]:
@@ -51,7 +55,7 @@ class AlorBroker(BaseBroker):
         
         try:
             url = f"{self.base_url}/md/v2/portfolios/{self.account_id}"
-            response = requests.get(url, headers=self._get_headers(), timeout=10)
+            response = self.limiter.get(url, session=self.session, headers=self._get_headers(), timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -111,7 +115,7 @@ class AlorBroker(BaseBroker):
                 }
             }
             
-            response = requests.post(url, headers=headers, json=data, timeout=10)
+            response = self.limiter.post(url, session=self.session, headers=headers, json=data, timeout=10)
             
             if response.status_code == 200:
                 result = response.json()
@@ -159,7 +163,7 @@ class AlorBroker(BaseBroker):
                 "tf": tf
             }
             
-            response = requests.get(url, params=params, headers=self._get_headers(), timeout=30)
+            response = self.limiter.get(url, session=self.session, params=params, headers=self._get_headers(), timeout=30)
             
             if response.status_code == 200:
                 data = response.json()
@@ -16,7 +16,8 @@ def create_broker(
     token: str = "",
     account_id: str = "",
     sandbox: bool = False,
-    initial_capital: float = 1000000.0
+    initial_capital: float = 1000000.0,
+    quote_cache=None
 ) -> BaseBroker:
     """
     Создать экземпляр брокера
@@ -27,6 +28,7 @@ def create_broker(
         account_id: ID счета
         sandbox: Режим песочницы
         initial_capital: Начальный капитал (для paper trading)
+        quote_cache: Общий кэш котировок QuoteCache (для paper trading)
     
     Returns:
         Экземпляр брокера
@@ -39,7 +41,8 @@ def create_broker(
             token=token,
             account_id=account_id,
             sandbox=sandbox,
-            initial_capital=initial_capital
+            initial_capital=initial_capital,
+            quote_cache=quote_cache
         )
     
     elif broker_type == "tinkoff":
@@ -55,7 +58,8 @@ def create_broker(
                 token=token,
                 account_id=account_id,
                 sandbox=sandbox,
-                initial_capital=initial_capital
+                initial_capital=initial_capital,
+                quote_cache=quote_cache
             )
         except Exception as e:
             logger.warning(f"Ошибка создания Tinkoff Broker: {e}, используем Paper Trading")
@@ -63,7 +67,8 @@ def create_broker(
                 token=token,
                 account_id=account_id,
                 sandbox=sandbox,
-                initial_capital=initial_capital
+                initial_capital=initial_capital,
+                quote_cache=quote_cache
             )
     
     elif broker_type == "finam":
@@ -77,7 +82,8 @@ def create_broker(
                 token=token,
                 account_id=account_id,
                 sandbox=sandbox,
-                initial_capital=initial_capital
+                initial_capital=initial_capital,
+                quote_cache=quote_cache
             )
     
     elif broker_type == "alor":
@@ -91,7 +97,8 @@ def create_broker(
                 token=token,
                 account_id=account_id,
                 sandbox=sandbox,
-                initial_capital=initial_capital
+                initial_capital=initial_capital,
+                quote_cache=quote_cache
             )
     
     else:
@@ -100,7 +107,8 @@ def create_broker(
             token=token,
             account_id=account_id,
             sandbox=sandbox,
-            initial_capital=initial_capital
+            initial_capital=initial_capital,
+            quote_cache=quote_cache
         )
 
 
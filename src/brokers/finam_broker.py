@@ -11,6 +11,7 @@ from typing import Optional, Dict
 import time
 
 from src.brokers.base_broker import BaseBroker
+from src.utils.rate_limiter import get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +28,9 @@ class FinamBroker(BaseBroker):
         """
         super().__init__(token, account_id, sandbox)
         self.base_url = "https://tradeapi.finam.ru" if token else "https://export.finam.ru"
+        # Keep-alive и общий для процесса бюджет запросов с повторами на 429/5xx
+        self.session = requests.Session()
+        self.limiter = get_rate_limiter()
         self.logger.info(f"FinamBroker инициализирован (sandbox={sandbox})")
     
     def get_portfolio(self) -> Dict:
@@ -56,7 +60,7 @@ class FinamBroker(BaseBroker):
                 params['Content.IncludePositions'] = True
                 params['Content.IncludeMaxBuySell'] = True
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self.limiter.get(url, session=self.session, headers=headers, params=params, timeout=10)
             
             self.logger.debug(f"Finam API ответ: status={response.status_code}, url={url}")
             
@@ -148,7 +152,7 @@ class FinamBroker(BaseBroker):
                 "orderType": "Market"
             }
             
-            response = requests.post(url, headers=headers, json=data, timeout=10)
+            response = self.limiter.post(url, session=self.session, headers=headers, json=data, timeout=10)
             
             if response.status_code == 200:
                 result = response.json()
@@ -221,7 +225,7 @@ class FinamBroker(BaseBroker):
                 'at': 1
             }
             
-            response = requests.get(url, params=params, timeout=30)
+            response = self.limiter.get(url, session=self.session, params=params, timeout=30)
             
             if response.status_code == 200:
                 # Парсим CSV
@@ -18,19 +18,28 @@ logger = logging.getLogger(__name__)
 class PaperTradingBroker(BaseBroker):
     """Виртуальный брокер для paper trading (тестирование без реального API)"""
     
-    def __init__(self, token: str = "", account_id: str = "", sandbox: bool = False, initial_capital: float = 1000000.0):
+    def __init__(
+        self,
+        token: str = "",
+        account_id: str = "",
+        sandbox: bool = False,
+        initial_capital: float = 1000000.0,
+        quote_cache=None
+    ):
         """
         Args:
             token: Не используется
             account_id: Не используется
             sandbox: Не используется
             initial_capital: Начальный капитал
+            quote_cache: Общий кэш котировок QuoteCache (None = цены запрашиваются у MOEX)
         """
         super().__init__(token, account_id, sandbox)
         self.initial_capital = initial_capital
         self.cash = initial_capital
         self.positions = {}  # {ticker: {'quantity': int, 'average_price': float}}
         self.moex = MOEXDataCollector()
+        self.quote_cache = quote_cache
         self.order_history = []
         self.logger.info(f"PaperTradingBroker инициализирован (капитал: {initial_capital:,.0f} ₽)")
     
@@ -39,9 +48,13 @@ class PaperTradingBroker(BaseBroker):
         positions_list = []
         total_value = self.cash
         
+        prices = self._get_prices(list(self.positions)) if self.positions else None
+        
         for ticker, pos in self.positions.items():
-            # Получаем текущую цену с MOEX
-            current_price = self.moex.get_current_price(ticker) or pos['average_price']
+            current_price = prices.get(ticker) if prices is not None else None
+            if current_price is None or pd.isna(current_price):
+                current_price = pos['average_price']
+            current_price = float(current_price)
             
             position_value = pos['quantity'] * current_price
             total_value += position_value
@@ -67,8 +80,10 @@ class PaperTradingBroker(BaseBroker):
     ) -> Dict:
         """Разместить рыночный ордер (виртуальный)"""
         try:
-            # Получаем текущую цену с MOEX
-            current_price = self.moex.get_current_price(ticker)
+            # Текущая цена из кэша котировок, при его отсутствии - с MOEX
+            current_price = self.quote_cache.get_price(ticker) if self.quote_cache else None
+            if current_price is None:
+                current_price = self.moex.get_current_price(ticker)
             
             if not current_price:
                 # Если цена не получена, используем среднюю цену позиции или случайную
@@ -165,6 +180,17 @@ class PaperTradingBroker(BaseBroker):
             self.logger.error(f"Ошибка paper trading: {e}")
             return {"order_id": "", "status": "FAILED", "lots_executed": 0, "executed_price": 0.0}
     
+    def _get_prices(self, tickers: list) -> pd.Series:
+        """Цены тикеров: свежие - из кэша котировок, недостающие - одним запросом к MOEX"""
+        if self.quote_cache is None:
+            return self.moex.get_current_prices(tickers)
+        
+        prices = self.quote_cache.get_prices(tickers)
+        missing = prices.index[prices.isna()].tolist()
+        if missing:
+            prices.update(self.moex.get_current_prices(missing))
+        return prices
+    
     def get_figi_by_ticker(self, ticker: str) -> Optional[str]:
         """Получить FIGI по тикеру (для paper trading не требуется)"""
         return ticker
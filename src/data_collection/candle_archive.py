@@ -0,0 +1,147 @@
+"""Сжатый архив старых свечей (npz по месяцам), вытесненных из таблицы candles"""
+
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = {
+    'time': 'int64',       # нс от эпохи
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'int64',
+}
+
+
+def datetime_to_ns(value: datetime) -> int:
+    """datetime -> нс от эпохи; даты вне диапазона datetime64[ns] прижимаются к границам"""
+    try:
+        return pd.Timestamp(value).value
+    except (OverflowError, pd.errors.OutOfBoundsDatetime):
+        # Минимум int64 в datetime64 - это NaT, поэтому нижняя граница на 1 больше
+        return np.iinfo('int64').max if value.year > 2000 else np.iinfo('int64').min + 1
+
+
+def empty_arrays() -> Dict[str, np.ndarray]:
+    return {name: np.empty(0, dtype=dtype) for name, dtype in ARCHIVE_COLUMNS.items()}
+
+
+def merge_arrays(old: Dict[str, np.ndarray], new: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Слить отсортированные по времени свечи; при совпадении времени остается new"""
+    if not len(old['time']):
+        return new
+    if not len(new['time']):
+        return old
+    keep = ~np.isin(old['time'], new['time'])
+    times = np.concatenate([old['time'][keep], new['time']])
+    order = np.argsort(times, kind='stable')
+    return {
+        name: np.concatenate([old[name][keep], new[name]])[order]
+        for name in ARCHIVE_COLUMNS
+    }
+
+
+class CandleArchive:
+    """
+    Архив свечей: <root>/<тикер>/<таймфрейм>/<ГГГГ-ММ>.npz
+
+    Файл месяца - сжатые колонки time/open/high/low/close/volume. Запись
+    сливает новые бары с уже архивированными за месяц и атомарно подменяет
+    файл. Чтение загружает только месяцы, пересекающие диапазон.
+    """
+
+    def __init__(self, root: str = 'data/archive'):
+        """
+        Args:
+            root: Корневая директория архива (создается при первой записи)
+        """
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _series_dir(self, ticker: str, timeframe: str) -> Path:
+        return self.root / ticker / timeframe
+
+    def months(self, ticker: str, timeframe: str) -> List[str]:
+        """Архивированные месяцы серии (ГГГГ-ММ) по возрастанию"""
+        try:
+            names = os.listdir(self._series_dir(ticker, timeframe))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-4] for name in names if name.endswith('.npz'))
+
+    def _read_month(self, path: Path) -> Dict[str, np.ndarray]:
+        with np.load(path) as data:
+            return {name: data[name] for name in ARCHIVE_COLUMNS}
+
+    def write(self, ticker: str, timeframe: str, arrays: Dict[str, np.ndarray]) -> int:
+        """
+        Добавить свечи в архив (arrays в формате load_candle_arrays, по возрастанию времени)
+
+        Returns:
+            Количество записанных свечей
+        """
+        times = arrays['time']
+        if not len(times):
+            return 0
+
+        series_dir = self._series_dir(ticker, timeframe)
+        series_dir.mkdir(parents=True, exist_ok=True)
+        month_keys = times.astype('datetime64[ns]').astype('datetime64[M]')
+        starts = np.flatnonzero(np.r_[True, month_keys[1:] != month_keys[:-1]])
+        ends = np.r_[starts[1:], len(times)]
+
+        with self._lock:
+            for lo, hi in zip(starts, ends):
+                path = series_dir / f'{month_keys[lo]}.npz'
+                chunk = {name: np.asarray(arrays[name][lo:hi], dtype=dtype) for name, dtype in ARCHIVE_COLUMNS.items()}
+                if path.exists():
+                    chunk = merge_arrays(self._read_month(path), chunk)
+                tmp = path.with_suffix('.tmp')
+                with open(tmp, 'wb') as f:
+                    np.savez_compressed(f, **chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, path)
+
+        logger.debug(f"Архив: записано {len(times)} свечей {ticker} {timeframe}")
+        return len(times)
+
+    def read(
+        self,
+        ticker: str,
+        timeframe: str,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Свечи диапазона [start_date, end_date] из архива
+
+        Returns:
+            Dict в формате load_candle_arrays или None, если в архиве ничего нет
+        """
+        months = self.months(ticker, timeframe)
+        if not months:
+            return None
+
+        start_ns, end_ns = datetime_to_ns(start_date), datetime_to_ns(end_date)
+        first = str(np.datetime64(start_ns, 'ns').astype('datetime64[M]'))
+        last = str(np.datetime64(end_ns, 'ns').astype('datetime64[M]'))
+        selected = [month for month in months if first <= month <= last]
+        if not selected:
+            return None
+
+        series_dir = self._series_dir(ticker, timeframe)
+        parts = [self._read_month(series_dir / f'{month}.npz') for month in selected]
+        arrays = {name: np.concatenate([part[name] for part in parts]) for name in ARCHIVE_COLUMNS}
+        lo = int(np.searchsorted(arrays['time'], start_ns, side='left'))
+        hi = int(np.searchsorted(arrays['time'], end_ns, side='right'))
+        return {name: values[lo:hi] for name, values in arrays.items()}
@@ -0,0 +1,101 @@
+"""Инкрементальная синхронизация свечей MOEX -> БД по отметке последней свечи"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from src.data_collection.moex_api import MOEXDataCollector
+from src.data_collection.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Длительность одной свечи по таймфрейму
+TIMEFRAME_DELTAS = {
+    '1m': timedelta(minutes=1),
+    '5m': timedelta(minutes=5),
+    '10m': timedelta(minutes=10),
+    '15m': timedelta(minutes=15),
+    '30m': timedelta(minutes=30),
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+}
+
+
+class CandleSynchronizer:
+    """
+    Докачивает только новые свечи для набора тикеров
+    
+    Для каждого (тикер, таймфрейм) берется последняя сохраненная свеча из
+    DatabaseManager, и с MOEX запрашиваются свечи начиная с нее минус overlap_bars
+    свечей: перекрытие перезаписывает еще формировавшуюся на прошлом цикле свечу.
+    Для тикеров без истории загружаются последние initial_days дней.
+    """
+    
+    def __init__(
+        self,
+        collector: MOEXDataCollector,
+        db: DatabaseManager,
+        overlap_bars: int = 2,
+        initial_days: int = 7,
+        writer=None
+    ):
+        """
+        Args:
+            collector: Коллектор MOEX
+            db: Менеджер БД
+            overlap_bars: Сколько последних сохраненных свечей перезапрашивать
+            initial_days: Глубина первой загрузки для тикеров без истории
+            writer: Куда писать свечи (например, WriteBehindQueue); по умолчанию db
+        """
+        self.collector = collector
+        self.db = db
+        self.overlap_bars = overlap_bars
+        self.initial_days = initial_days
+        self.writer = writer or db
+    
+    def get_sync_start(self, ticker: str, timeframe: str, now: Optional[datetime] = None) -> datetime:
+        """Начало окна докачки для тикера"""
+        now = now or datetime.now()
+        last_time = self.db.get_last_candle_time(ticker, timeframe)
+        
+        if last_time is None:
+            return now - timedelta(days=self.initial_days)
+        
+        bar = TIMEFRAME_DELTAS.get(timeframe, timedelta(hours=1))
+        return last_time - bar * self.overlap_bars
+    
+    def sync(self, tickers: List[str], timeframe: str = '1h') -> Dict[str, int]:
+        """
+        Синхронизировать свечи для тикеров
+        
+        Args:
+            tickers: Список тикеров
+            timeframe: Таймфрейм
+        
+        Returns:
+            Dict {ticker: количество сохраненных свечей}
+        """
+        end_date = datetime.now()
+        start_dates = {ticker: self.get_sync_start(ticker, timeframe, end_date) for ticker in tickers}
+        
+        candles_by_ticker = self.collector.get_historical_candles_many(
+            tickers=tickers,
+            start_date=min(start_dates.values()) if start_dates else end_date,
+            end_date=end_date,
+            timeframe=timeframe,
+            start_dates=start_dates
+        )
+        
+        saved = {}
+        for ticker, candles in candles_by_ticker.items():
+            saved[ticker] = 0
+            if candles.empty:
+                continue
+            
+            try:
+                saved[ticker] = self.writer.save_candles(candles, ticker, timeframe)
+            except Exception as e:
+                logger.warning(f"Ошибка сохранения свечей для {ticker}: {e}")
+        
+        logger.info(f"Синхронизация {timeframe}: {sum(saved.values())} свечей по {len(tickers)} тикерам")
+        return saved
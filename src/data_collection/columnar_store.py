@@ -0,0 +1,255 @@
+"""Колоночное хранилище свечей на memory-mapped файлах (альтернатива таблице candles)"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.data_collection.candle_archive import datetime_to_ns
+from src.data_collection.database import DatabaseManager, candles_frame, prepare_candles
+from src.data_collection.panel import PANEL_FIELDS, CandlePanel, build_panel
+
+logger = logging.getLogger(__name__)
+
+COLUMN_DTYPES = {
+    'time': 'int64',       # нс от эпохи
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'int64',
+}
+INDEX_STRIDE = 4096  # Каждое INDEX_STRIDE-е время попадает в разреженный индекс
+
+
+class _Series:
+    """Файлы одной серии (тикер, таймфрейм): колонки, разреженный индекс и meta.json с числом строк"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.count = 0
+        self.index = np.empty(0, dtype='int64')
+        self._maps: Dict[str, np.ndarray] = {}
+        meta = path / 'meta.json'
+        if meta.exists():
+            self.count = int(json.loads(meta.read_text())['count'])
+            index = path / 'index.i8'
+            if index.exists():
+                self.index = np.fromfile(index, dtype='int64')
+
+    def column_file(self, name: str) -> Path:
+        return self.path / f'{name}.col'
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """memmap-представления колонок длиной count (переоткрываются после записи)"""
+        if not self._maps or len(self._maps['time']) != self.count:
+            if self.count == 0:
+                self._maps = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+            else:
+                self._maps = {
+                    name: np.memmap(self.column_file(name), dtype=dtype, mode='r', shape=(self.count,))
+                    for name, dtype in COLUMN_DTYPES.items()
+                }
+        return self._maps
+
+    def locate(self, value: int, side: str) -> int:
+        """searchsorted по колонке time: сначала по индексу в памяти, затем внутри одного блока"""
+        times = self.columns()['time']
+        block = max(int(np.searchsorted(self.index, value, side=side)) - 1, 0)
+        lo = block * INDEX_STRIDE
+        hi = min(lo + 2 * INDEX_STRIDE, self.count)
+        return lo + int(np.searchsorted(times[lo:hi], value, side=side))
+
+    def commit(self, count: int) -> None:
+        """Зафиксировать новую длину: индекс и meta.json пишутся после данных"""
+        self._maps = {}
+        self.count = count
+        times = self.columns()['time']
+        self.index = np.array(times[::INDEX_STRIDE], dtype='int64')
+        _atomic_write(self.path / 'index.i8', self.index.tobytes())
+        _atomic_write(self.path / 'meta.json', json.dumps({'count': count}).encode())
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ColumnarCandleStore:
+    """
+    Колоночное хранилище свечей: по файлу на колонку для каждой пары (тикер, таймфрейм)
+
+    Запись - дозапись в конец файлов; пересекающийся хвост (перекачка последних
+    баров) переписывается с позиции первого нового бара. Чтение - срез numpy.memmap
+    без копирования, границы диапазона ищутся по разреженному индексу времени.
+    Число валидных строк хранится в meta.json и обновляется после данных, поэтому
+    оборванная запись не видна читателям.
+
+    Интерфейс совпадает с DatabaseManager: save_candles / load_candles /
+    load_candle_arrays / load_panel / get_last_candle_time.
+    """
+
+    def __init__(self, root: str = 'data/columnar'):
+        """
+        Args:
+            root: Корневая директория хранилища
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._lock = threading.Lock()
+
+    def _get_series(self, ticker: str, timeframe: str) -> _Series:
+        key = (ticker, timeframe)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self.root / ticker / timeframe)
+            return series
+
+    def save_candles(self, df: pd.DataFrame, ticker: str, timeframe: str) -> int:
+        """
+        Сохранить свечи (upsert по времени)
+
+        Returns:
+            Количество сохраненных свечей
+        """
+        if df.empty:
+            return 0
+
+        frame = prepare_candles(df)
+        new = {name: frame[name].to_numpy() for name in COLUMN_DTYPES if name != 'time'}
+        new['time'] = frame['time'].to_numpy(dtype='datetime64[ns]').view('int64')
+
+        series = self._get_series(ticker, timeframe)
+        with series.lock:
+            series.path.mkdir(parents=True, exist_ok=True)
+            position = series.locate(int(new['time'][0]), 'left') if series.count else 0
+
+            if position < series.count:
+                # Пересечение с сохраненным хвостом: слить хвост с новыми барами (новые важнее)
+                tail = {name: np.array(values[position:]) for name, values in series.columns().items()}
+                keep = ~np.isin(tail['time'], new['time'])
+                merged_time = np.concatenate([tail['time'][keep], new['time']])
+                order = np.argsort(merged_time, kind='stable')
+                new = {
+                    name: np.concatenate([tail[name][keep], new[name]])[order]
+                    for name in COLUMN_DTYPES
+                }
+
+            # Слитый хвост не короче прежнего, поэтому файлы только растут: срезы memmap,
+            # уже выданные читателям, не упираются в усеченный файл
+            count = position + len(new['time'])
+            for name, dtype in COLUMN_DTYPES.items():
+                path = series.column_file(name)
+                itemsize = np.dtype(dtype).itemsize
+                with open(path, 'r+b' if path.exists() else 'wb') as f:
+                    f.seek(position * itemsize)
+                    f.write(np.ascontiguousarray(new[name], dtype=dtype).tobytes())
+                    f.truncate(count * itemsize)
+            series.commit(count)
+
+        logger.debug(f"Колоночное хранилище: сохранено {len(frame)} свечей {ticker} {timeframe}")
+        return len(frame)
+
+    def load_candle_arrays(
+        self,
+        ticker: str,
+        timeframe: str,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Свечи диапазона [start_date, end_date] как срезы memmap (без копирования)
+
+        Returns:
+            Dict: time (int64, нс от эпохи), open/high/low/close (float64), volume (int64)
+        """
+        series = self._get_series(ticker, timeframe)
+        with series.lock:
+            if not series.count:
+                return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+            lo = series.locate(datetime_to_ns(start_date), 'left')
+            hi = series.locate(datetime_to_ns(end_date), 'right')
+            return {name: values[lo:hi] for name, values in series.columns().items()}
+
+    def load_candles(
+        self,
+        ticker: str,
+        timeframe: str,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> pd.DataFrame:
+        """Загрузить свечи (time, open, high, low, close, volume)"""
+        try:
+            return candles_frame(self.load_candle_arrays(ticker, timeframe, start_date, end_date))
+        except Exception as e:
+            logger.error(f"Ошибка загрузки свечей из колоночного хранилища: {e}")
+            return pd.DataFrame()
+
+    def load_panel(
+        self,
+        tickers: Sequence[str],
+        timeframe: str,
+        start_date: datetime,
+        end_date: datetime,
+        fields: Sequence[str] = PANEL_FIELDS,
+    ) -> CandlePanel:
+        """Свечи набора тикеров, выровненные по общей шкале времени (см. DatabaseManager.load_panel)"""
+        tickers = list(dict.fromkeys(tickers))
+        unknown = set(fields) - set(PANEL_FIELDS)
+        if unknown:
+            raise ValueError(f"Неизвестные поля панели: {sorted(unknown)}")
+
+        arrays = [self.load_candle_arrays(ticker, timeframe, start_date, end_date) for ticker in tickers]
+        codes = np.concatenate([np.full(len(a['time']), i, dtype='int64') for i, a in enumerate(arrays)])
+        return build_panel(
+            tickers,
+            codes,
+            np.concatenate([a['time'] for a in arrays]),
+            {name: np.concatenate([a[name] for a in arrays]) for name in fields},
+        )
+
+    def get_last_candle_time(self, ticker: str, timeframe: str) -> Optional[datetime]:
+        """Время последней сохраненной свечи или None"""
+        series = self._get_series(ticker, timeframe)
+        with series.lock:
+            if not series.count:
+                return None
+            return pd.Timestamp(int(series.columns()['time'][-1])).to_pydatetime()
+
+    def sync_from_database(self, db: DatabaseManager, ticker: str, timeframe: str, start_date: datetime) -> int:
+        """
+        Догрузить из БД свечи, которых еще нет в хранилище
+
+        Последний бар перечитывается (он мог быть сохранен еще формирующимся).
+
+        Returns:
+            Количество перенесенных свечей
+        """
+        last_time = self.get_last_candle_time(ticker, timeframe)
+        since = last_time if last_time is not None and last_time > start_date else start_date
+        arrays = db.load_candle_arrays(ticker, timeframe, since, datetime.max)
+        if not len(arrays['time']):
+            return 0
+        return self.save_candles(candles_frame(arrays), ticker, timeframe)
+
+    def list_series(self) -> List[Tuple[str, str]]:
+        """Все пары (тикер, таймфрейм) в хранилище"""
+        return sorted(
+            (path.parent.name, path.name)
+            for path in self.root.glob('*/*')
+            if (path / 'meta.json').exists()
+        )
+
@@ -1,25 +1,168 @@
 ﻿"""Работа с базой данных (SQLAlchemy ORM)"""
 
+import functools
+import io
+import itertools
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean, Index, bindparam, func, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import logging
 
+from config.settings import settings
+from src.data_collection.candle_archive import CandleArchive, merge_arrays
+from src.data_collection.db_engine import create_db_engine
+from src.data_collection.migrations import mark_migration_applied, migration_applied, run_migrations
+from src.data_collection.panel import PANEL_FIELDS, CandlePanel, build_panel
+from src.data_collection.portfolio_history import (
+    KEYFRAME_INTERVAL, PositionState, position_state, read_position_state, snapshot_changes
+)
+
 Base = declarative_base()
 logger = logging.getLogger(__name__)
 
+# Естественный ключ свечи и обновляемые при upsert колонки
+CANDLE_KEY = ['ticker', 'timeframe', 'time']
+CANDLE_VALUES = ['open', 'high', 'low', 'close', 'volume']
+
+# Быстрое чтение: только нужные колонки, параметры времени через DateTime,
+# чтобы на SQLite сравнение шло в том же текстовом формате, в котором время хранится
+def _range_select(table: str):
+    return text(
+        f"SELECT time, open, high, low, close, volume FROM {table} "
+        "WHERE ticker = :ticker AND timeframe = :timeframe AND time >= :start AND time <= :end "
+        "ORDER BY time"
+    ).bindparams(bindparam('start', type_=DateTime), bindparam('end', type_=DateTime))
+
+
+CANDLE_ARRAYS_SQL = _range_select('candles')
+ROLLUP_ARRAYS_SQL = _range_select('candle_rollups')
+
+
+@functools.lru_cache(maxsize=64)
+def _panel_select(table: str, fields: Tuple[str, ...]):
+    """Один запрос по списку тикеров: IN раскрывается в range scan по индексу на каждый тикер"""
+    return text(
+        f"SELECT ticker, time, {', '.join(fields)} FROM {table} "
+        "WHERE ticker IN :tickers AND timeframe = :timeframe AND time >= :start AND time <= :end"
+    ).bindparams(
+        bindparam('tickers', expanding=True),
+        bindparam('start', type_=DateTime),
+        bindparam('end', type_=DateTime),
+    )
+
+# История портфеля: range scan по (account, timestamp) и (account, snapshot_id)
+EQUITY_SQL = text(
+    "SELECT timestamp, total_value, cash FROM portfolio_snapshots "
+    "WHERE account = :account AND timestamp >= :start AND timestamp <= :end "
+    "ORDER BY timestamp"
+).bindparams(bindparam('start', type_=DateTime), bindparam('end', type_=DateTime))
+TICKER_POSITION_SQL = text(
+    "SELECT timestamp, quantity, average_price FROM position_history "
+    "WHERE account = :account AND ticker = :ticker AND timestamp > :start AND timestamp <= :end "
+    "ORDER BY snapshot_id"
+).bindparams(bindparam('start', type_=DateTime), bindparam('end', type_=DateTime))
+
+# Цепочки агрегатов: базовый таймфрейм -> производные (каждый строится из предыдущего).
+# Цепочки не пересекаются по целевым таймфреймам, поэтому у агрегата один источник;
+# 1h из 1m лежит в candle_rollups отдельно от нативных часовых свечей ISS
+ROLLUP_CHAINS = {
+    '1m': ['5m', '15m', '1h'],
+    '1h': ['4h', '1d'],
+}
+_NS_MINUTE = 60 * 10**9
+ROLLUP_BUCKET_NS = {
+    '5m': 5 * _NS_MINUTE,
+    '15m': 15 * _NS_MINUTE,
+    '1h': 60 * _NS_MINUTE,
+    '4h': 240 * _NS_MINUTE,
+    '1d': 1440 * _NS_MINUTE,
+}
+ROLLUP_TIMEFRAMES = {target for chain in ROLLUP_CHAINS.values() for target in chain}
+# Отметка в schema_migrations: агрегаты накопленной истории построены
+ROLLUPS_BACKFILL_MIGRATION = 'candle_rollups_backfill'
+
+
+def prepare_candles(df: pd.DataFrame) -> pd.DataFrame:
+    """Колонки свечей в типах хранилища, по возрастанию времени, без дублей по времени"""
+    times = pd.to_datetime(df['time'] if 'time' in df.columns else df['timestamp'])
+    volume = df['volume'] if 'volume' in df.columns else pd.Series(0, index=df.index)
+    frame = pd.DataFrame({
+        'time': times.to_numpy(),
+        'open': df['open'].to_numpy(dtype='float64'),
+        'high': df['high'].to_numpy(dtype='float64'),
+        'low': df['low'].to_numpy(dtype='float64'),
+        'close': df['close'].to_numpy(dtype='float64'),
+        'volume': volume.fillna(0).to_numpy(dtype='int64'),
+    })
+    # Одна строка на ключ: ON CONFLICT не может обновить строку дважды за запрос
+    return (
+        frame.drop_duplicates('time', keep='last')
+        .sort_values('time', kind='stable')
+        .reset_index(drop=True)
+    )
+
+
+def candle_arrays_from_rows(rows: List[tuple]) -> Dict[str, np.ndarray]:
+    """Строки (time, open, high, low, close, volume) -> типизированные колонки"""
+    if not rows:
+        return {
+            'time': np.empty(0, dtype='int64'),
+            **{name: np.empty(0, dtype='float64') for name in ('open', 'high', 'low', 'close')},
+            'volume': np.empty(0, dtype='int64'),
+        }
+    
+    times, opens, highs, lows, closes, volumes = zip(*rows)
+    # SQLite отдает время строкой, PostgreSQL - datetime; NumPy разбирает оба варианта
+    return {
+        'time': np.array(times, dtype='datetime64[us]').astype('datetime64[ns]').view('int64'),
+        'open': np.array(opens, dtype='float64'),
+        'high': np.array(highs, dtype='float64'),
+        'low': np.array(lows, dtype='float64'),
+        'close': np.array(closes, dtype='float64'),
+        'volume': np.array(volumes, dtype='int64'),
+    }
+
+
+def rollup_arrays(arrays: Dict[str, np.ndarray], bucket_ns: int) -> Dict[str, np.ndarray]:
+    """Агрегировать отсортированные свечи в бары длины bucket_ns (время бара - начало интервала)"""
+    times = arrays['time']
+    if not len(times):
+        return arrays
+    keys = times // bucket_ns
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    return {
+        'time': keys[starts] * bucket_ns,
+        'open': arrays['open'][starts],
+        'high': np.maximum.reduceat(arrays['high'], starts),
+        'low': np.minimum.reduceat(arrays['low'], starts),
+        'close': arrays['close'][ends],
+        'volume': np.add.reduceat(arrays['volume'], starts),
+    }
+
+
+def candles_frame(arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """DataFrame поверх массивов load_candle_arrays без копирования колонок"""
+    columns = {'time': arrays['time'].view('datetime64[ns]')}
+    columns.update((name, arrays[name]) for name in CANDLE_VALUES)
+    return pd.DataFrame(columns, copy=False)
+
 
 class Candle(Base):
     """Таблица свечей"""
     __tablename__ = 'candles'
+    __table_args__ = (
+        Index('idx_ticker_timeframe_time', 'ticker', 'timeframe', 'time', unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
-    ticker = Column(String(10), index=True, nullable=False)
-    timeframe = Column(String(5), nullable=False)  # '1m', '1h', '1d'
-    time = Column(DateTime, index=True, nullable=False)
+    ticker = Column(String(10), nullable=False)
+    timeframe = Column(String(10), nullable=False)  # '1m', '1h', '1d', 't500', 'v100000'
+    time = Column(DateTime, nullable=False)
     open = Column(Float, nullable=False)
     high = Column(Float, nullable=False)
     low = Column(Float, nullable=False)
@@ -43,51 +186,117 @@ class Trade(Base):
 
 
 class PortfolioSnapshot(Base):
-    """Снимки портфеля для отслеживания динамики"""
+    """Снимки портфеля для отслеживания динамики (позиции - в position_history)"""
     __tablename__ = 'portfolio_snapshots'
+    __table_args__ = (
+        Index('idx_portfolio_account_time', 'account', 'timestamp'),
+    )
     
     id = Column(Integer, primary_key=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    account = Column(String(20), nullable=False, default='', server_default='')  # sandbox / live
     total_value = Column(Float, nullable=False)
     cash = Column(Float, nullable=False)
-    positions_json = Column(String)  # JSON со всеми позициями
+    keyframe = Column(Boolean, nullable=False, default=False, server_default='0')  # Полное состояние позиций
+    positions_json = Column(String)  # Устарело: JSON позиций снимков до position_history
+
+
+class PositionHistory(Base):
+    """
+    Позиции по снимкам портфеля с дельта-кодированием
+    
+    Снимок-ключевой кадр (PortfolioSnapshot.keyframe) хранит все открытые позиции,
+    остальные - только изменившиеся (количество или средняя цена); закрытие
+    позиции - строка с quantity = 0.
+    """
+    __tablename__ = 'position_history'
+    __table_args__ = (
+        Index('idx_position_history_account_snapshot', 'account', 'snapshot_id'),
+        Index('idx_position_history_account_ticker_time', 'account', 'ticker', 'timestamp'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    snapshot_id = Column(Integer, nullable=False)
+    account = Column(String(20), nullable=False, default='')
+    timestamp = Column(DateTime, nullable=False)
+    ticker = Column(String(10), nullable=False)
+    quantity = Column(Float, nullable=False)
+    average_price = Column(Float, nullable=False, default=0.0)
+
+
+class CandleRollup(Base):
+    """Агрегированные свечи старших таймфреймов (см. ROLLUP_CHAINS), поддерживаются при save_candles"""
+    __tablename__ = 'candle_rollups'
+    __table_args__ = (
+        Index('idx_rollup_ticker_timeframe_time', 'ticker', 'timeframe', 'time', unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    ticker = Column(String(10), nullable=False)
+    timeframe = Column(String(10), nullable=False)
+    time = Column(DateTime, nullable=False)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume = Column(Integer, nullable=False)
+
+
+class CandleSyncState(Base):
+    """Отметка последней сохраненной свечи по (тикер, таймфрейм) для инкрементальной синхронизации"""
+    __tablename__ = 'candle_sync_state'
+    
+    ticker = Column(String(10), primary_key=True)
+    timeframe = Column(String(10), primary_key=True)
+    last_time = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
 
 class DatabaseManager:
     """Менеджер для работы с БД"""
     
-    def __init__(self, database_url: str):
+    def __init__(self, database_url: str, engine_profile: str = 'tuned', archive_dir: Optional[str] = None):
+        """
+        Args:
+            database_url: URL БД SQLAlchemy
+            engine_profile: Профиль engine (см. create_db_engine)
+            archive_dir: Архив вытесненных свечей (по умолчанию settings.db.ARCHIVE_DIR)
+        """
         self.database_url = database_url
+        self.archive = CandleArchive(archive_dir or settings.db.ARCHIVE_DIR)
         try:
-            self.engine = create_engine(database_url, echo=False)
+            self.engine = create_db_engine(database_url, profile=engine_profile)
             Base.metadata.create_all(self.engine)
+            run_migrations(self.engine)
             self.Session = sessionmaker(bind=self.engine)
+            # Последнее записанное состояние позиций по счетам: account -> (состояние, снимков после ключевого кадра)
+            self._position_state: Dict[str, Tuple[PositionState, Optional[int]]] = {}
+            self._backfill_rollups()
             logger.info(f"Подключение к БД установлено: {database_url.split('@')[1] if '@' in database_url else 'локальная'}")
         except Exception as e:
             logger.error(f"Ошибка подключения к БД: {e}")
             raise
     
-    def save_candles(self, df: pd.DataFrame, ticker: str, timeframe: str) -> None:
-        """Сохранить свечи в БД"""
+    def save_candles(self, df: pd.DataFrame, ticker: str, timeframe: str) -> int:
+        """
+        Сохранить свечи в БД (bulk upsert по ключу ticker, timeframe, time)
+        
+        Весь DataFrame уходит одним executemany: на SQLite - INSERT ... ON CONFLICT
+        DO UPDATE, на PostgreSQL - COPY во временную таблицу и INSERT ... SELECT
+        ... ON CONFLICT. Повторное сохранение того же окна обновляет свечи на месте.
+        
+        Returns:
+            Количество сохраненных свечей
+        """
         if df.empty:
-            return
+            return 0
         
         session = self.Session()
         try:
-            for _, row in df.iterrows():
-                candle = Candle(
-                    ticker=ticker,
-                    timeframe=timeframe,
-                    time=row.get('time', row.get('timestamp', datetime.now())),
-                    open=row['open'],
-                    high=row['high'],
-                    low=row['low'],
-                    close=row['close'],
-                    volume=int(row.get('volume', 0))
-                )
-                session.merge(candle)
+            count = self._upsert_candles(session, df, ticker, timeframe)
             session.commit()
-            logger.info(f"Сохранено {len(df)} свечей для {ticker}")
+            logger.info(f"Сохранено {count} свечей для {ticker}")
+            return count
         except Exception as e:
             session.rollback()
             logger.error(f"Ошибка сохранения свечей: {e}")
@@ -95,6 +304,314 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def _upsert_candles(self, session, df: pd.DataFrame, ticker: str, timeframe: str) -> int:
+        """Upsert свечей в рамках транзакции session (без commit)"""
+        frame = prepare_candles(df)
+        self._upsert_frame(session, Candle.__table__, frame, ticker, timeframe)
+        self._update_sync_state(session, ticker, timeframe, frame['time'].iloc[-1].to_pydatetime())
+        
+        if timeframe in ROLLUP_CHAINS:
+            self._update_rollups(session, ticker, timeframe, frame['time'].iloc[0], frame['time'].iloc[-1])
+        return len(frame)
+    
+    def _upsert_frame(self, session, table, frame: pd.DataFrame, ticker: str, timeframe: str) -> None:
+        """Upsert подготовленных свечей в таблицу candles или candle_rollups"""
+        dialect = self.engine.dialect.name
+        if dialect == 'postgresql':
+            self._copy_upsert_candles(session, frame, ticker, timeframe, table.name)
+        elif dialect == 'sqlite':
+            self._executemany_upsert_candles(session, frame, ticker, timeframe, table.name)
+        else:
+            self._replace_candles(session, frame, ticker, timeframe, table)
+    
+    def _update_rollups(self, session, ticker: str, base_timeframe: str, first: pd.Timestamp, last: pd.Timestamp) -> None:
+        """
+        Пересчитать агрегаты, затронутые базовыми свечами [first, last]
+        
+        Для каждого уровня цепочки перечитываются только исходные бары затронутых
+        интервалов (range scan) и агрегируются заново, так что частично
+        сформированный старший бар дополняется с каждым сохранением.
+        """
+        sql, source_tf = CANDLE_ARRAYS_SQL, base_timeframe
+        lo, hi = first.value, last.value
+        for target in ROLLUP_CHAINS[base_timeframe]:
+            bucket = ROLLUP_BUCKET_NS[target]
+            lo = lo // bucket * bucket
+            hi = hi // bucket * bucket
+            rows = session.execute(sql, {
+                'ticker': ticker,
+                'timeframe': source_tf,
+                'start': pd.Timestamp(lo).to_pydatetime(),
+                'end': pd.Timestamp(hi + bucket - 1000).to_pydatetime(),
+            }).fetchall()
+            rolled = rollup_arrays(candle_arrays_from_rows(rows), bucket)
+            if not len(rolled['time']):
+                return
+            self._upsert_frame(session, CandleRollup.__table__, candles_frame(rolled), ticker, target)
+            sql, source_tf = ROLLUP_ARRAYS_SQL, target
+    
+    def rebuild_rollups(self, ticker: str, base_timeframe: str) -> None:
+        """Пересчитать все агрегаты тикера из базовых свечей (для уже накопленной истории)"""
+        if base_timeframe not in ROLLUP_CHAINS:
+            raise ValueError(f"Для таймфрейма {base_timeframe} агрегаты не строятся")
+        session = self.Session()
+        try:
+            first, last = (
+                session.query(func.min(Candle.time), func.max(Candle.time))
+                .filter(Candle.ticker == ticker, Candle.timeframe == base_timeframe)
+                .one()
+            )
+            if first is not None:
+                self._update_rollups(session, ticker, base_timeframe, pd.Timestamp(first), pd.Timestamp(last))
+                session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Ошибка пересчета агрегатов {ticker} {base_timeframe}: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def _backfill_rollups(self) -> None:
+        """
+        Однократно построить агрегаты для истории, накопленной до появления candle_rollups
+        
+        Выполнение отмечается в schema_migrations: дальше агрегаты поддерживает
+        save_candles, и повторные запуски не сканируют candles заново.
+        """
+        if migration_applied(self.engine, ROLLUPS_BACKFILL_MIGRATION):
+            return
+        session = self.Session()
+        try:
+            if session.query(CandleRollup.id).first() is not None:
+                series = []
+            else:
+                series = (
+                    session.query(Candle.ticker, Candle.timeframe)
+                    .filter(Candle.timeframe.in_(list(ROLLUP_CHAINS)))
+                    .distinct()
+                    .all()
+                )
+        finally:
+            session.close()
+        for ticker, timeframe in series:
+            self.rebuild_rollups(ticker, timeframe)
+        mark_migration_applied(self.engine, ROLLUPS_BACKFILL_MIGRATION)
+        if series:
+            logger.info(f"Построены агрегаты свечей для {len(series)} серий")
+    
+    @staticmethod
+    def _candle_rows(frame: pd.DataFrame, ticker: str, timeframe: str) -> List[dict]:
+        """Параметры executemany (время - python datetime, как его хранит ORM)"""
+        return [
+            {'ticker': ticker, 'timeframe': timeframe, 'time': t, 'open': o,
+             'high': h, 'low': l, 'close': c, 'volume': v}
+            for t, o, h, l, c, v in zip(
+                frame['time'].dt.to_pydatetime(),
+                frame['open'].tolist(), frame['high'].tolist(),
+                frame['low'].tolist(), frame['close'].tolist(),
+                frame['volume'].tolist()
+            )
+        ]
+    
+    def _executemany_upsert_candles(
+        self, session, frame: pd.DataFrame, ticker: str, timeframe: str, table: str = 'candles'
+    ) -> None:
+        """SQLite: INSERT ... ON CONFLICT (ticker, timeframe, time) DO UPDATE одним executemany"""
+        columns = CANDLE_KEY + CANDLE_VALUES
+        updates = ', '.join(f"{name} = excluded.{name}" for name in CANDLE_VALUES)
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT ({', '.join(CANDLE_KEY)}) DO UPDATE SET {updates}"
+        )
+        # Время в текстовом формате, в котором его пишет SQLAlchemy DateTime на SQLite:
+        # обход обработки параметров ORM ускоряет вставку в несколько раз
+        times = np.char.replace(
+            np.datetime_as_string(frame['time'].to_numpy(dtype='datetime64[us]'), unit='us'), 'T', ' '
+        )
+        rows = zip(
+            itertools.repeat(ticker), itertools.repeat(timeframe), times.tolist(),
+            frame['open'].tolist(), frame['high'].tolist(), frame['low'].tolist(),
+            frame['close'].tolist(), frame['volume'].tolist()
+        )
+        cursor = session.connection().connection.cursor()
+        try:
+            cursor.executemany(sql, rows)
+        finally:
+            cursor.close()
+    
+    def _copy_upsert_candles(
+        self, session, frame: pd.DataFrame, ticker: str, timeframe: str, table: str = 'candles'
+    ) -> None:
+        """PostgreSQL: COPY во временную таблицу и слияние INSERT ... SELECT ... ON CONFLICT"""
+        columns = CANDLE_KEY + CANDLE_VALUES
+        buffer = io.StringIO()
+        out = frame.assign(ticker=ticker, timeframe=timeframe)[columns]
+        out.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S.%f')
+        buffer.seek(0)
+        
+        updates = ', '.join(f"{name} = EXCLUDED.{name}" for name in CANDLE_VALUES)
+        column_list = ', '.join(columns)
+        
+        cursor = session.connection().connection.cursor()
+        try:
+            # Без id: иначе DEFAULT nextval() расходовал бы последовательность на каждую строку
+            cursor.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS {table}_stage ON COMMIT DELETE ROWS "
+                f"AS SELECT {column_list} FROM {table} WITH NO DATA"
+            )
+            cursor.copy_expert(f"COPY {table}_stage ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(
+                f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {table}_stage "
+                f"ON CONFLICT ({', '.join(CANDLE_KEY)}) DO UPDATE SET {updates}"
+            )
+        finally:
+            cursor.close()
+    
+    def _replace_candles(self, session, frame: pd.DataFrame, ticker: str, timeframe: str, table=None) -> None:
+        """Прочие СУБД: удалить окно и вставить его заново одним executemany"""
+        table = Candle.__table__ if table is None else table
+        session.execute(table.delete().where(
+            table.c.ticker == ticker,
+            table.c.timeframe == timeframe,
+            table.c.time >= frame['time'].iloc[0].to_pydatetime(),
+            table.c.time <= frame['time'].iloc[-1].to_pydatetime()
+        ))
+        session.execute(table.insert(), self._candle_rows(frame, ticker, timeframe))
+    
+    def _update_sync_state(self, session, ticker: str, timeframe: str, last_time: datetime) -> None:
+        """Сдвинуть отметку последней свечи вперед (назад она не двигается)"""
+        state = session.get(CandleSyncState, (ticker, timeframe))
+        if state is None:
+            session.add(CandleSyncState(ticker=ticker, timeframe=timeframe, last_time=last_time))
+        elif last_time > state.last_time:
+            state.last_time = last_time
+            state.updated_at = datetime.utcnow()
+    
+    def get_last_candle_time(self, ticker: str, timeframe: str) -> Optional[datetime]:
+        """
+        Время последней сохраненной свечи (high-water mark)
+        
+        Для БД, заполненных до появления candle_sync_state, отметка однократно
+        вычисляется по таблице candles и запоминается.
+        
+        Returns:
+            datetime или None, если свечей еще нет
+        """
+        session = self.Session()
+        try:
+            state = session.get(CandleSyncState, (ticker, timeframe))
+            if state is not None:
+                return state.last_time
+            
+            last_time = (
+                session.query(func.max(Candle.time))
+                .filter(Candle.ticker == ticker, Candle.timeframe == timeframe)
+                .scalar()
+            )
+            if last_time is None:
+                return None
+            
+            self._update_sync_state(session, ticker, timeframe, last_time)
+            session.commit()
+            return last_time
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Ошибка чтения отметки синхронизации: {e}")
+            return None
+        finally:
+            session.close()
+    
+    def load_candle_arrays(
+        self,
+        ticker: str,
+        timeframe: str,
+        start_date: datetime,
+        end_date: datetime,
+        include_archive: bool = True,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Быстрое чтение свечей в NumPy-массивы без ORM
+        
+        Один заранее скомпилированный SQL-запрос с проекцией нужных колонок
+        (range scan по idx_ticker_timeframe_time); строки раскладываются сразу
+        в типизированные массивы. Если нативных свечей таймфрейма нет, они
+        берутся из агрегатов candle_rollups (см. ROLLUP_CHAINS). Свечи,
+        вытесненные политикой хранения, дочитываются из архива (include_archive).
+        
+        Returns:
+            Dict: time (int64, нс от эпохи), open/high/low/close (float64), volume (int64)
+        """
+        params = {'ticker': ticker, 'timeframe': timeframe, 'start': start_date, 'end': end_date}
+        with self.engine.connect() as conn:
+            rows = conn.execute(CANDLE_ARRAYS_SQL, params).fetchall()
+            if not rows and timeframe in ROLLUP_TIMEFRAMES:
+                rows = conn.execute(ROLLUP_ARRAYS_SQL, params).fetchall()
+        arrays = candle_arrays_from_rows(rows)
+        
+        if include_archive:
+            archived = self.archive.read(ticker, timeframe, start_date, end_date)
+            if archived is not None:
+                arrays = merge_arrays(archived, arrays)
+        return arrays
+    
+    def load_panel(
+        self,
+        tickers: Sequence[str],
+        timeframe: str,
+        start_date: datetime,
+        end_date: datetime,
+        fields: Sequence[str] = PANEL_FIELDS,
+    ) -> CandlePanel:
+        """
+        Свечи набора тикеров одним запросом, выровненные по общей шкале времени
+        
+        Args:
+            tickers: Тикеры (порядок столбцов панели)
+            timeframe: Таймфрейм
+            start_date: Начало диапазона
+            end_date: Конец диапазона
+            fields: Поля из open/high/low/close/volume
+        
+        Returns:
+            CandlePanel: times, tickers, fields[поле] (время x тикер), mask
+        """
+        tickers = list(dict.fromkeys(tickers))
+        fields = tuple(fields)
+        unknown = set(fields) - set(CANDLE_VALUES)
+        if unknown:
+            raise ValueError(f"Неизвестные поля панели: {sorted(unknown)}")
+        
+        params = {'tickers': tickers, 'timeframe': timeframe, 'start': start_date, 'end': end_date}
+        with self.engine.connect() as conn:
+            rows = conn.execute(_panel_select('candles', fields), params).fetchall()
+            if timeframe in ROLLUP_TIMEFRAMES:
+                found = {row[0] for row in rows}
+                missing = [ticker for ticker in tickers if ticker not in found]
+                if missing:
+                    params['tickers'] = missing
+                    rows += conn.execute(_panel_select('candle_rollups', fields), params).fetchall()
+        
+        columns = list(zip(*rows)) if rows else [()] * (len(fields) + 2)
+        codes = {ticker: i for i, ticker in enumerate(tickers)}
+        ticker_codes = np.fromiter((codes[ticker] for ticker in columns[0]), dtype='int64', count=len(rows))
+        times = np.array(columns[1], dtype='datetime64[us]').astype('datetime64[ns]').view('int64')
+        values = {
+            name: np.array(column, dtype='int64' if name == 'volume' else 'float64')
+            for name, column in zip(fields, columns[2:])
+        }
+        
+        # Вытесненные в архив бары (строки из БД важнее)
+        for code, ticker in enumerate(tickers):
+            archived = self.archive.read(ticker, timeframe, start_date, end_date)
+            if archived is None or not len(archived['time']):
+                continue
+            keep = ~np.isin(archived['time'], times[ticker_codes == code])
+            ticker_codes = np.concatenate([ticker_codes, np.full(int(keep.sum()), code, dtype='int64')])
+            times = np.concatenate([times, archived['time'][keep]])
+            values = {name: np.concatenate([column, archived[name][keep]]) for name, column in values.items()}
+        
+        return build_panel(tickers, ticker_codes, times, values)
+    
     def load_candles(
         self,
         ticker: str,
@@ -102,30 +619,245 @@ class DatabaseManager:
         start_date: datetime,
         end_date: datetime,
     ) -> pd.DataFrame:
-        """Загрузить свечи из БД"""
-        session = self.Session()
+        """Загрузить свечи из БД (time, open, high, low, close, volume)"""
         try:
-            query = (
-                session.query(Candle)
-                .filter(
-                    Candle.ticker == ticker,
-                    Candle.timeframe == timeframe,
-                    Candle.time >= start_date,
-                    Candle.time <= end_date
-                )
-                .order_by(Candle.time)
-            )
-            
-            df = pd.read_sql(query.statement, session.bind)
-            if not df.empty and 'time' in df.columns:
-                df['time'] = pd.to_datetime(df['time'])
-            return df
+            arrays = self.load_candle_arrays(ticker, timeframe, start_date, end_date)
+            return candles_frame(arrays)
         except Exception as e:
             logger.error(f"Ошибка загрузки свечей: {e}")
             return pd.DataFrame()
+    
+    def candle_tickers_before(self, timeframe: str, before: datetime) -> List[str]:
+        """Тикеры, у которых в candles есть свечи таймфрейма старше before"""
+        with self.engine.connect() as conn:
+            return [row[0] for row in conn.execute(
+                text("SELECT DISTINCT ticker FROM candles WHERE timeframe = :timeframe AND time < :before")
+                .bindparams(bindparam('before', type_=DateTime)),
+                {'timeframe': timeframe, 'before': before},
+            )]
+    
+    def prune_candles(self, ticker: str, timeframe: str, before: datetime) -> int:
+        """
+        Удалить из candles свечи старше before
+        
+        Агрегаты candle_rollups по удаляемому диапазону пересчитываются в той же
+        транзакции, поэтому старшие таймфреймы после удаления остаются полными.
+        
+        Returns:
+            Количество удаленных свечей
+        """
+        session = self.Session()
+        try:
+            if timeframe in ROLLUP_CHAINS:
+                first = session.query(func.min(Candle.time)).filter(
+                    Candle.ticker == ticker, Candle.timeframe == timeframe, Candle.time < before
+                ).scalar()
+                if first is not None:
+                    last = pd.Timestamp(before) - pd.Timedelta(microseconds=1)
+                    self._update_rollups(session, ticker, timeframe, pd.Timestamp(first), last)
+            
+            removed = session.query(Candle).filter(
+                Candle.ticker == ticker, Candle.timeframe == timeframe, Candle.time < before
+            ).delete(synchronize_session=False)
+            session.commit()
+            return removed
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Ошибка удаления старых свечей {ticker} {timeframe}: {e}")
+            raise
         finally:
             session.close()
     
+    def optimize(self, vacuum: bool = True) -> None:
+        """
+        Обновить статистику планировщика (ANALYZE) и вернуть место после удалений (VACUUM)
+        
+        VACUUM перестраивает файл SQLite целиком и держит эксклюзивную блокировку,
+        поэтому запускается только вне торговых часов (см. RetentionManager).
+        """
+        # VACUUM не выполняется внутри транзакции
+        dialect = self.engine.dialect.name
+        with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            if dialect == 'postgresql':
+                conn.exec_driver_sql("VACUUM ANALYZE" if vacuum else "ANALYZE")
+            elif dialect == 'sqlite':
+                conn.exec_driver_sql("ANALYZE")
+                if vacuum:
+                    conn.exec_driver_sql("VACUUM")
+                    # Усечь WAL, разросшийся за время VACUUM
+                    conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+            else:
+                logger.info(f"Обслуживание БД для {dialect} не поддерживается")
+    
+    def write_batch(
+        self,
+        candles: Sequence[Tuple[pd.DataFrame, str, str]] = (),
+        trades: Sequence[dict] = (),
+        snapshots: Sequence[dict] = (),
+        durable: bool = False
+    ) -> None:
+        """
+        Записать пачку разнотипных записей одной транзакцией
+        
+        Args:
+            candles: Список (df, ticker, timeframe)
+            trades: Данные сделок (поля Trade)
+            snapshots: Снимки портфеля (timestamp, account, total_value, cash, positions - см. save_snapshot)
+            durable: Дождаться сброса на диск (SQLite: synchronous=FULL на время commit)
+        """
+        session = self.Session()
+        restore_sync = None
+        try:
+            if durable and self.engine.dialect.name == 'sqlite':
+                conn = session.connection()
+                restore_sync = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+                conn.exec_driver_sql("PRAGMA synchronous = FULL")
+            
+            for df, ticker, timeframe in candles:
+                if not df.empty:
+                    self._upsert_candles(session, df, ticker, timeframe)
+            session.add_all([Trade(**trade) for trade in trades])
+            self._add_snapshots(session, snapshots)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            # Кэш состояния мог уйти вперед незаписанных снимков: следующий снимок - ключевой кадр
+            self._position_state.clear()
+            logger.error(f"Ошибка пакетной записи: {e}")
+            raise
+        finally:
+            if restore_sync is not None:
+                # Соединение вернется в пул: вернуть прежний режим синхронизации
+                session.connection().exec_driver_sql(f"PRAGMA synchronous = {int(restore_sync)}")
+            session.close()
+    
+    def save_snapshot(
+        self,
+        total_value: float,
+        cash: float,
+        positions: Sequence[dict] = (),
+        account: str = '',
+        timestamp: Optional[datetime] = None
+    ) -> None:
+        """
+        Сохранить снимок портфеля
+        
+        Args:
+            total_value: Стоимость портфеля
+            cash: Денежные средства
+            positions: Позиции брокера (ticker, quantity, average_price / average_buy_price)
+            account: Счет (sandbox / live): у каждого своя цепочка дельт
+            timestamp: Время снимка (по умолчанию сейчас, UTC)
+        """
+        self.write_batch(snapshots=[{
+            'timestamp': timestamp or datetime.utcnow(),
+            'account': account,
+            'total_value': float(total_value),
+            'cash': float(cash),
+            'positions': list(positions),
+        }])
+    
+    def _add_snapshots(self, session, snapshots: Sequence[dict]) -> None:
+        """Снимки и дельты позиций к предыдущему записанному состоянию счета"""
+        for snapshot in snapshots:
+            account = snapshot.get('account', '')
+            timestamp = snapshot.get('timestamp') or datetime.utcnow()
+            state = position_state(snapshot.get('positions') or ())
+            if account not in self._position_state:
+                # Первый снимок после запуска - ключевой кадр; прежнее состояние - из БД,
+                # чтобы закрытые за время простоя позиции получили запись с количеством 0
+                self._position_state[account] = (read_position_state(session.connection(), account), None)
+            previous, since_keyframe = self._position_state[account]
+            keyframe = since_keyframe is None or since_keyframe + 1 >= KEYFRAME_INTERVAL
+            changes = snapshot_changes(previous, state, keyframe)
+            
+            record = PortfolioSnapshot(
+                timestamp=timestamp,
+                account=account,
+                total_value=snapshot['total_value'],
+                cash=snapshot['cash'],
+                keyframe=keyframe,
+            )
+            session.add(record)
+            session.flush()
+            session.add_all([
+                PositionHistory(
+                    snapshot_id=record.id,
+                    account=account,
+                    timestamp=timestamp,
+                    ticker=ticker,
+                    quantity=quantity,
+                    average_price=price,
+                )
+                for ticker, (quantity, price) in changes.items()
+            ])
+            self._position_state[account] = (state, 0 if keyframe else since_keyframe + 1)
+    
+    def load_equity_series(self, start_date: datetime, end_date: datetime, account: str = '') -> pd.DataFrame:
+        """
+        Кривая капитала счета за период одним индексным запросом
+        
+        Returns:
+            DataFrame: time, total_value, cash, exposure (total_value - cash)
+        """
+        try:
+            params = {'account': account, 'start': start_date, 'end': end_date}
+            with self.engine.connect() as conn:
+                rows = conn.execute(EQUITY_SQL, params).fetchall()
+            times, totals, cash = zip(*rows) if rows else ((), (), ())
+            total_value = np.array(totals, dtype='float64')
+            cash = np.array(cash, dtype='float64')
+            return pd.DataFrame({
+                'time': np.array(times, dtype='datetime64[us]').astype('datetime64[ns]'),
+                'total_value': total_value,
+                'cash': cash,
+                'exposure': total_value - cash,
+            })
+        except Exception as e:
+            logger.error(f"Ошибка загрузки истории капитала: {e}")
+            return pd.DataFrame()
+    
+    def load_positions(self, at: Optional[datetime] = None, account: str = '') -> PositionState:
+        """
+        Позиции счета на момент at (по умолчанию - последние записанные)
+        
+        Состояние собирается из ближайшего ключевого кадра и дельт после него.
+        
+        Returns:
+            Dict: тикер -> (количество, средняя цена)
+        """
+        with self.engine.connect() as conn:
+            return read_position_state(conn, account, at)
+    
+    def load_position_history(
+        self,
+        ticker: str,
+        start_date: datetime,
+        end_date: datetime,
+        account: str = ''
+    ) -> pd.DataFrame:
+        """
+        История позиции по тикеру: состояние на start_date и каждое изменение до end_date
+        
+        Returns:
+            DataFrame: time, quantity, average_price (quantity = 0 - позиции нет)
+        """
+        quantity, price = self.load_positions(start_date, account).get(ticker, (0.0, 0.0))
+        params = {'account': account, 'ticker': ticker, 'start': start_date, 'end': end_date}
+        with self.engine.connect() as conn:
+            rows = conn.execute(TICKER_POSITION_SQL, params).fetchall()
+        
+        times, quantities, prices = zip(*rows) if rows else ((), (), ())
+        frame = pd.DataFrame({
+            'time': np.array((start_date,) + times, dtype='datetime64[us]').astype('datetime64[ns]'),
+            'quantity': np.array((quantity,) + quantities, dtype='float64'),
+            'average_price': np.array((price,) + prices, dtype='float64'),
+        })
+        # Ключевые кадры повторяют неизменившиеся позиции
+        values = frame[['quantity', 'average_price']].to_numpy()
+        changed = np.r_[True, (values[1:] != values[:-1]).any(axis=1)]
+        return frame[changed].reset_index(drop=True)
+    
     def save_trade(self, trade_data: dict) -> None:
         """Сохранить сделку"""
         session = self.Session()
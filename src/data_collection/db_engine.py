@@ -0,0 +1,83 @@
+"""Создание SQLAlchemy engine с профилем производительности под СУБД"""
+
+import logging
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+from config.settings import DatabaseSettings, settings
+
+logger = logging.getLogger(__name__)
+
+
+def _sqlite_pragmas(db_settings: DatabaseSettings, in_memory: bool) -> list:
+    pragmas = [
+        f"PRAGMA busy_timeout = {db_settings.SQLITE_BUSY_TIMEOUT_MS}",
+        "PRAGMA synchronous = NORMAL",
+        f"PRAGMA cache_size = -{db_settings.SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size = {db_settings.SQLITE_MMAP_SIZE}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+    if not in_memory:
+        # WAL: читатели не блокируют писателя и друг друга (бот, Telegram, обучение)
+        pragmas.insert(0, "PRAGMA journal_mode = WAL")
+    return pragmas
+
+
+def create_db_engine(
+    database_url: str,
+    profile: str = 'tuned',
+    db_settings: Optional[DatabaseSettings] = None
+) -> Engine:
+    """
+    Создать engine для database_url
+
+    Args:
+        database_url: URL БД SQLAlchemy
+        profile: 'tuned' - профиль производительности; 'default' - настройки SQLAlchemy
+            по умолчанию (для сравнения в бенчмарке)
+        db_settings: Настройки БД (по умолчанию settings.db)
+
+    Профиль 'tuned':
+        SQLite - WAL, synchronous=NORMAL, mmap_size, cache_size, busy_timeout на каждом
+        новом соединении; PostgreSQL и прочие - пул POOL_SIZE + MAX_OVERFLOW соединений
+        с pre-ping и переоткрытием через POOL_RECYCLE секунд.
+    """
+    db_settings = db_settings or settings.db
+    url = make_url(database_url)
+
+    if profile != 'tuned':
+        return create_engine(database_url, echo=False)
+
+    if url.get_backend_name() == 'sqlite':
+        in_memory = url.database in (None, '', ':memory:')
+        engine = create_engine(
+            database_url,
+            echo=False,
+            connect_args={
+                'timeout': db_settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+                'check_same_thread': False,
+            },
+        )
+        pragmas = _sqlite_pragmas(db_settings, in_memory)
+
+        @event.listens_for(engine, 'connect')
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+
+        return engine
+
+    return create_engine(
+        database_url,
+        echo=False,
+        pool_size=db_settings.POOL_SIZE,
+        max_overflow=db_settings.MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=db_settings.POOL_RECYCLE,
+    )
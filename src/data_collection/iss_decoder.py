@@ -0,0 +1,82 @@
+"""Декодирование блоков MOEX ISS JSON напрямую в колонки NumPy"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# Колонки свечей ISS и их типы после декодирования
+CANDLE_COLUMNS = {
+    'begin': 'datetime64[s]',
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'int64',
+}
+
+# Колонки ленты сделок ISS
+TRADE_COLUMNS = {
+    'TRADENO': 'int64',
+    'SYSTIME': 'datetime64[s]',
+    'PRICE': 'float64',
+    'QUANTITY': 'int64',
+}
+
+# Колонки стакана ISS
+ORDERBOOK_COLUMNS = {
+    'BUYSELL': 'object',
+    'PRICE': 'float64',
+    'QUANTITY': 'int64',
+}
+
+
+def decode_block(
+    columns: Sequence[str],
+    pages: List[List[list]],
+    spec: Dict[str, str]
+) -> Dict[str, np.ndarray]:
+    """
+    Декодировать строки блока ISS (одна или несколько страниц) в массивы NumPy
+    
+    Под каждую колонку заранее выделяется массив на все строки всех страниц,
+    страницы записываются в него срезами без промежуточных DataFrame.
+    Строковые даты ISS ('YYYY-MM-DD HH:MM:SS') разбираются самим NumPy,
+    None превращается в NaN/NaT (для целых колонок - в 0).
+    
+    Args:
+        columns: Колонки блока в порядке ISS
+        pages: Страницы строк блока
+        spec: {колонка: dtype} - какие колонки декодировать и в какой тип
+    
+    Returns:
+        Dict {колонка: np.ndarray}; колонки, которых нет в ответе, пропускаются
+    """
+    total = sum(len(page) for page in pages)
+    result = {}
+    
+    for name, dtype in spec.items():
+        if name not in columns:
+            continue
+        
+        idx = list(columns).index(name)
+        dtype = np.dtype(dtype)
+        out = np.empty(total, dtype=dtype)
+        
+        pos = 0
+        for page in pages:
+            n = len(page)
+            if not n:
+                continue
+            values = [row[idx] for row in page]
+            if dtype.kind in 'iu':
+                try:
+                    out[pos:pos + n] = values
+                except TypeError:
+                    out[pos:pos + n] = np.nan_to_num(np.array(values, dtype='float64'))
+            else:
+                out[pos:pos + n] = values
+            pos += n
+        
+        result[name] = out
+    
+    return result
@@ -0,0 +1,462 @@
+"""
+Локальный стенд MOEX ISS для офлайн-нагрузочного тестирования
+Отдает записанные ответы или данные, синтезированные из data/trading_bot.db
+"""
+
+import json
+import logging
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+from src.data_collection.response_cache import ISSResponseCache
+from src.utils.rate_limiter import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+CANDLES_PAGE_SIZE = 500
+TRADES_PAGE_SIZE = 5000
+TRADES_PER_BAR = 200
+
+BOARD_PREFIX = '/iss/engines/stock/markets/shares/boards/TQBR/securities'
+
+# interval ISS -> (таймфрейм в БД, на сколько частей делить бар БД / сколько баров склеивать)
+INTERVAL_MINUTES = {1: 1, 5: 5, 10: 10, 15: 15, 30: 30, 60: 60, 24: 1440}
+
+
+class ISSStubServer:
+    """
+    HTTP-стенд, имитирующий эндпоинты iss.moex.com, которые использует MOEXDataCollector
+
+    Поддерживаемые эндпоинты: securities.json (список и marketdata, в т.ч. bulk),
+    securities/{T}.json, candles.json (с пагинацией start), orderbook.json, trades.json
+    (курсор tradeno/next_trade). Порядок поиска ответа: записи из recordings_dir,
+    затем синтез из часовых свечей SQLite-базы. Задержка и доля ошибок настраиваются.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = 'data/trading_bot.db',
+        recordings_dir: Optional[str] = None,
+        upstream_url: Optional[str] = None,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        shift_to_now: bool = False,
+        seed: int = 0,
+        host: str = '127.0.0.1',
+        port: int = 0
+    ):
+        """
+        Args:
+            db_path: SQLite-база с часовыми свечами для синтеза ответов (None = не синтезировать)
+            recordings_dir: Директория записанных ответов
+            upstream_url: Адрес настоящего ISS для режима записи (ответы сохраняются в recordings_dir)
+            latency: Базовая задержка ответа (секунды)
+            latency_jitter: Случайная добавка к задержке, равномерно [0, latency_jitter]
+            error_rate: Доля запросов, на которые отвечать ошибкой
+            error_status: HTTP-статус ошибки (500, 503, 429, ...)
+            shift_to_now: Сдвинуть историю так, чтобы последний день базы стал вчерашним днем
+            seed: Seed генератора для задержек/ошибок и синтеза
+            host: Адрес прослушивания
+            port: Порт (0 = любой свободный)
+        """
+        self.db_path = db_path
+        self.recordings = ISSResponseCache(recordings_dir, open_ttl=0) if recordings_dir else None
+        self.upstream_url = upstream_url.rstrip('/') if upstream_url else None
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.shift_to_now = shift_to_now
+        self.seed = seed
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._series: Dict[str, Dict[str, np.ndarray]] = {}
+        self._series_lock = threading.Lock()
+        self._time_shift = np.timedelta64(0, 's')
+        self.stats = {'requests': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+
+        if db_path and shift_to_now:
+            self._time_shift = self._compute_time_shift()
+
+        handler = type('ISSStubHandler', (_ISSStubHandler,), {'stub': self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Базовый адрес стенда для MOEXDataCollector(base_url=...)"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/iss"
+
+    def start(self) -> str:
+        """Запустить стенд в фоновом потоке; возвращает базовый адрес"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='iss-stub', daemon=True)
+        self._thread.start()
+        logger.info(f"ISS-стенд запущен: {self.url}")
+        return self.url
+
+    def serve_forever(self) -> None:
+        """Запустить стенд в текущем потоке"""
+        logger.info(f"ISS-стенд запущен: {self.url}")
+        self.httpd.serve_forever()
+
+    def stop(self) -> None:
+        """Остановить стенд"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _count(self, name: str) -> None:
+        # Обработчики работают в потоках ThreadingHTTPServer
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    # ---- Внедрение задержек и ошибок ----
+
+    def _roll(self) -> Tuple[float, bool]:
+        with self._random_lock:
+            delay = self.latency + self._random.uniform(0, self.latency_jitter) if self.latency_jitter else self.latency
+            fail = self.error_rate > 0 and self._random.random() < self.error_rate
+        return delay, fail
+
+    # ---- Данные ----
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, check_same_thread=False)
+
+    def _compute_time_shift(self) -> np.timedelta64:
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(time) FROM candles WHERE timeframe = '1h'").fetchone()
+        if not row or not row[0]:
+            return np.timedelta64(0, 's')
+        last_day = datetime.fromisoformat(row[0][:19]).date()
+        days = (datetime.now().date() - timedelta(days=1) - last_day).days
+        return np.timedelta64(days, 'D').astype('timedelta64[s]')
+
+    def _hourly(self, ticker: str) -> Dict[str, np.ndarray]:
+        """Часовые свечи тикера из БД (кэшируются в памяти стенда)"""
+        with self._series_lock:
+            series = self._series.get(ticker)
+        if series is not None:
+            return series
+
+        rows = []
+        if self.db_path:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT time, open, high, low, close, volume FROM candles "
+                    "WHERE ticker = ? AND timeframe = '1h' ORDER BY time",
+                    (ticker,)
+                ).fetchall()
+
+        if rows:
+            columns = list(zip(*rows))
+            times = np.array([t[:19] for t in columns[0]], dtype='datetime64[s]') + self._time_shift
+            series = {
+                'time': times,
+                'open': np.array(columns[1], dtype='float64'),
+                'high': np.array(columns[2], dtype='float64'),
+                'low': np.array(columns[3], dtype='float64'),
+                'close': np.array(columns[4], dtype='float64'),
+                'volume': np.array(columns[5], dtype='int64'),
+            }
+        else:
+            empty_f = np.empty(0, dtype='float64')
+            series = {
+                'time': np.empty(0, dtype='datetime64[s]'),
+                'open': empty_f, 'high': empty_f, 'low': empty_f, 'close': empty_f,
+                'volume': np.empty(0, dtype='int64'),
+            }
+
+        with self._series_lock:
+            self._series[ticker] = series
+        return series
+
+    def tickers(self) -> List[str]:
+        if not self.db_path:
+            return []
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT ticker FROM candles ORDER BY ticker")]
+
+    def _candles(self, ticker: str, interval: int, start: datetime, end: datetime) -> Dict[str, np.ndarray]:
+        """Свечи нужного интервала в диапазоне [start, end] из часовых"""
+        hourly = self._hourly(ticker)
+        minutes = INTERVAL_MINUTES.get(interval, 60)
+
+        if minutes == 60:
+            series = hourly
+        elif minutes > 60:
+            series = _resample_daily(hourly)
+        else:
+            series = _split_bars(hourly, 60 // minutes, self.seed, ticker)
+
+        times = series['time']
+        lo = np.searchsorted(times, np.datetime64(start, 's'), side='left')
+        hi = np.searchsorted(times, np.datetime64(end, 's'), side='right')
+        result = {name: values[lo:hi] for name, values in series.items()}
+        result['end'] = result['time'] + np.timedelta64(minutes * 60 - 1, 's')
+        return result
+
+    def _last_close(self, ticker: str) -> Optional[float]:
+        hourly = self._hourly(ticker)
+        return float(hourly['close'][-1]) if len(hourly['close']) else None
+
+    def _trades(self, ticker: str) -> Dict[str, np.ndarray]:
+        """Лента сделок последнего торгового дня: TRADES_PER_BAR сделок на часовой бар"""
+        hourly = self._hourly(ticker)
+        if not len(hourly['time']):
+            return {'TRADENO': np.empty(0, dtype='int64')}
+
+        day = hourly['time'][-1].astype('datetime64[D]')
+        mask = hourly['time'].astype('datetime64[D]') == day
+        bars = _split_bars({name: values[mask] for name, values in hourly.items()}, TRADES_PER_BAR, self.seed, ticker)
+        offsets = np.arange(len(bars['time'])) % TRADES_PER_BAR
+        step = 3600 // TRADES_PER_BAR
+        times = bars['time'] + (offsets * step).astype('timedelta64[s]')
+        return {
+            'TRADENO': np.arange(1, len(times) + 1, dtype='int64') + 10_000_000,
+            'SYSTIME': times,
+            'PRICE': bars['close'],
+            'QUANTITY': np.maximum(bars['volume'], 1),
+        }
+
+    # ---- Маршрутизация ----
+
+    def handle(self, path: str, params: Dict[str, str]) -> Tuple[int, Optional[Dict]]:
+        """Ответ на запрос: (HTTP-статус, JSON)"""
+        if self.recordings is not None:
+            recorded = self.recordings.get(path, params)
+            if recorded is not None:
+                return 200, recorded
+
+        if self.upstream_url:
+            response = get_rate_limiter().get(self.upstream_url + path[len('/iss'):], params=params, timeout=30)
+            if response.status_code != 200:
+                return response.status_code, None
+            data = response.json()
+            if self.recordings is not None:
+                self.recordings.set(path, params, data, closed=True)
+            return 200, data
+
+        return self._synthesize(path, params)
+
+    def _synthesize(self, path: str, params: Dict[str, str]) -> Tuple[int, Optional[Dict]]:
+        if path == f'{BOARD_PREFIX}.json':
+            tickers = params['securities'].split(',') if params.get('securities') else self.tickers()
+            return 200, self._securities_reply(tickers)
+
+        match = re.fullmatch(rf'{BOARD_PREFIX}/([A-Z0-9]+)\.json', path)
+        if match:
+            return 200, self._securities_reply([match.group(1)])
+
+        match = re.fullmatch(rf'{BOARD_PREFIX}/([A-Z0-9]+)/(candles|orderbook|trades)\.json', path)
+        if not match:
+            return 404, None
+
+        ticker, endpoint = match.groups()
+        if endpoint == 'candles':
+            return 200, self._candles_reply(ticker, params)
+        if endpoint == 'orderbook':
+            return 200, self._orderbook_reply(ticker)
+        return 200, self._trades_reply(ticker, params)
+
+    def _securities_reply(self, tickers: List[str]) -> Dict:
+        securities, marketdata = [], []
+        for ticker in tickers:
+            last = self._last_close(ticker)
+            if last is None:
+                continue
+            securities.append([ticker, 'TQBR', ticker, last])
+            marketdata.append([ticker, 'TQBR', last, last])
+        return {
+            'securities': {'columns': ['SECID', 'BOARDID', 'SHORTNAME', 'PREVPRICE'], 'data': securities},
+            'marketdata': {'columns': ['SECID', 'BOARDID', 'LAST', 'CLOSE'], 'data': marketdata},
+        }
+
+    def _candles_reply(self, ticker: str, params: Dict[str, str]) -> Dict:
+        start = datetime.fromisoformat(params.get('from', '1970-01-01'))
+        till = params.get('till')
+        end = datetime.fromisoformat(till) if till else datetime.now()
+        if till and len(till) <= 10:
+            end = end + timedelta(days=1) - timedelta(seconds=1)
+        interval = int(params.get('interval', 60))
+
+        series = self._candles(ticker, interval, start, end)
+        offset = int(params.get('start', 0))
+        page = slice(offset, offset + CANDLES_PAGE_SIZE)
+
+        columns = ['open', 'close', 'high', 'low', 'value', 'volume', 'begin', 'end']
+        data = [
+            [o, c, h, l, c * v, int(v), str(b).replace('T', ' '), str(e).replace('T', ' ')]
+            for o, c, h, l, v, b, e in zip(
+                series['open'][page].tolist(), series['close'][page].tolist(),
+                series['high'][page].tolist(), series['low'][page].tolist(),
+                series['volume'][page].tolist(), series['time'][page], series['end'][page]
+            )
+        ]
+        return {'candles': {'columns': columns, 'data': data}}
+
+    def _orderbook_reply(self, ticker: str) -> Dict:
+        last = self._last_close(ticker)
+        data = []
+        if last is not None:
+            tick = max(round(last * 0.0005, 2), 0.01)
+            for level in range(10, 0, -1):
+                data.append(['TQBR', ticker, 'S', round(last + level * tick, 2), 10 * level])
+            for level in range(1, 11):
+                data.append(['TQBR', ticker, 'B', round(last - level * tick, 2), 10 * level])
+        return {'orderbook': {'columns': ['BOARDID', 'SECID', 'BUYSELL', 'PRICE', 'QUANTITY'], 'data': data}}
+
+    def _trades_reply(self, ticker: str, params: Dict[str, str]) -> Dict:
+        trades = self._trades(ticker)
+        tradenos = trades['TRADENO']
+        first = 0
+        if params.get('tradeno'):
+            side = 'right' if params.get('next_trade') == '1' else 'left'
+            first = int(np.searchsorted(tradenos, int(params['tradeno']), side=side))
+        first += int(params.get('start', 0))
+        page = slice(first, first + TRADES_PAGE_SIZE)
+
+        columns = ['TRADENO', 'TRADETIME', 'BOARDID', 'SECID', 'PRICE', 'QUANTITY', 'SYSTIME']
+        data = [
+            [no, str(t)[11:19], 'TQBR', ticker, p, q, str(t).replace('T', ' ')]
+            for no, t, p, q in zip(
+                tradenos[page].tolist(), trades.get('SYSTIME', tradenos)[page],
+                trades.get('PRICE', tradenos)[page].tolist(), trades.get('QUANTITY', tradenos)[page].tolist()
+            )
+        ]
+        return {'trades': {'columns': columns, 'data': data}}
+
+
+def _apply_iss_params(data: Dict, params: Dict[str, str]) -> Dict:
+    """iss.only, <block>.columns и iss.meta как у настоящего ISS"""
+    only = params.get('iss.only')
+    blocks = only.split(',') if only else list(data)
+    result = {}
+    for block in blocks:
+        if block not in data:
+            continue
+        columns = data[block]['columns']
+        rows = data[block]['data']
+        wanted = params.get(f'{block}.columns')
+        if wanted:
+            idx = [columns.index(name) for name in wanted.split(',') if name in columns]
+            columns = [columns[i] for i in idx]
+            rows = [[row[i] for i in idx] for row in rows]
+        result[block] = {'columns': columns, 'data': rows}
+        if params.get('iss.meta') != 'off':
+            result[block]['metadata'] = {name: {'type': 'string'} for name in columns}
+    return result
+
+
+def _resample_daily(hourly: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    if not len(hourly['time']):
+        return hourly
+    days = hourly['time'].astype('datetime64[D]')
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    ends = np.r_[starts[1:], len(days)] - 1
+    return {
+        'time': days[starts].astype('datetime64[s]'),
+        'open': hourly['open'][starts],
+        'high': np.maximum.reduceat(hourly['high'], starts),
+        'low': np.minimum.reduceat(hourly['low'], starts),
+        'close': hourly['close'][ends],
+        'volume': np.add.reduceat(hourly['volume'], starts),
+    }
+
+
+def _split_bars(hourly: Dict[str, np.ndarray], parts: int, seed: int, ticker: str) -> Dict[str, np.ndarray]:
+    """
+    Детерминированно разбить часовые бары на parts частей
+
+    Цена идет от open к close с шумом в пределах [low, high], объем делится
+    поровну; суммарно части воспроизводят исходный бар.
+    """
+    n = len(hourly['time'])
+    if not n or parts <= 1:
+        return hourly
+
+    rng = np.random.default_rng([seed, sum(map(ord, ticker))])
+    frac = np.linspace(0, 1, parts + 1)
+    path = hourly['open'][:, None] + (hourly['close'] - hourly['open'])[:, None] * frac[None, :]
+    noise = rng.normal(0, 0.25, size=(n, parts + 1)) * (hourly['high'] - hourly['low'])[:, None]
+    noise[:, 0] = noise[:, -1] = 0
+    path = np.clip(path + noise, hourly['low'][:, None], hourly['high'][:, None])
+
+    opens = path[:, :-1]
+    closes = path[:, 1:]
+    highs = np.maximum(opens, closes)
+    lows = np.minimum(opens, closes)
+
+    step = np.timedelta64(3600 // parts, 's')
+    times = hourly['time'][:, None] + np.arange(parts) * step
+    volume = hourly['volume'][:, None] // parts + np.zeros((1, parts), dtype='int64')
+    volume[:, 0] += hourly['volume'] - volume.sum(axis=1)
+
+    return {
+        'time': times.ravel(),
+        'open': opens.ravel(),
+        'high': highs.ravel(),
+        'low': lows.ravel(),
+        'close': closes.ravel(),
+        'volume': volume.ravel(),
+    }
+
+
+class _ISSStubHandler(BaseHTTPRequestHandler):
+    stub: ISSStubServer = None
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = dict(parse_qsl(parts.query, keep_blank_values=True))
+        stub = self.stub
+        stub._count('requests')
+
+        delay, fail = stub._roll()
+        if delay:
+            time.sleep(delay)
+
+        if fail:
+            stub._count('errors')
+            self._reply(stub.error_status, {'error': 'injected'})
+            return
+
+        try:
+            status, data = stub.handle(parts.path, params)
+        except Exception as e:
+            logger.error(f"Ошибка ISS-стенда на {self.path}: {e}")
+            status, data = 500, None
+
+        if data is None:
+            self._reply(status, {'error': 'not found' if status == 404 else 'error'})
+            return
+
+        self._reply(status, _apply_iss_params(data, params))
+
+    def _reply(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 429:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("ISS-стенд: " + format % args)
@@ -0,0 +1,212 @@
+"""Миграции схемы БД, которые create_all не выполняет для уже существующих таблиц"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import DateTime, inspect, text
+from sqlalchemy.engine import Engine
+
+from src.data_collection.portfolio_history import (
+    KEYFRAME_INTERVAL, parse_positions_json, read_position_state, snapshot_changes
+)
+
+logger = logging.getLogger(__name__)
+
+CANDLES_UNIQUE_INDEX = 'idx_ticker_timeframe_time'
+CANDLES_KEY_COLUMNS = ['ticker', 'timeframe', 'time']
+# Одиночные индексы: ticker покрыт префиксом составного, по одному time запросов нет
+REDUNDANT_CANDLE_INDEXES = ['ix_candles_ticker', 'ix_candles_time']
+# Ширина candles.timeframe: метки баров из сделок ('t500', 'v100000', 'tr15m')
+CANDLES_TIMEFRAME_LENGTH = 10
+CANDLES_TIMEFRAME_MIGRATION = 'candles_timeframe_varchar10'
+# Отметки однократных шагов, выполнение которых не видно по схеме (например, перенос данных)
+SCHEMA_MIGRATIONS_TABLE = 'schema_migrations'
+
+
+def migration_applied(engine: Engine, name: str) -> bool:
+    """Отмечен ли однократный шаг name как выполненный"""
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {SCHEMA_MIGRATIONS_TABLE} "
+            f"(name VARCHAR(100) PRIMARY KEY, applied_at TIMESTAMP)"
+        ))
+        row = conn.execute(
+            text(f"SELECT 1 FROM {SCHEMA_MIGRATIONS_TABLE} WHERE name = :name"), {'name': name}
+        ).first()
+    return row is not None
+
+
+def mark_migration_applied(engine: Engine, name: str) -> None:
+    """Отметить однократный шаг name выполненным (таблицу создает migration_applied)"""
+    with engine.begin() as conn:
+        conn.execute(
+            text(f"INSERT INTO {SCHEMA_MIGRATIONS_TABLE} (name, applied_at) VALUES (:name, :applied_at)"),
+            {'name': name, 'applied_at': datetime.utcnow()}
+        )
+
+
+def migrate_candles_unique_index(engine: Engine) -> int:
+    """
+    Удалить дубли свечей и создать уникальный индекс (ticker, timeframe, time)
+
+    Из каждой группы дублей остается строка с максимальным id (последняя
+    загруженная). Индекс превращает load_candles в один range scan, а повторные
+    синхронизации - в upsert вместо добавления строк. Идемпотентна.
+
+    Returns:
+        Количество удаленных дублей
+    """
+    inspector = inspect(engine)
+    if 'candles' not in inspector.get_table_names():
+        return 0
+
+    indexes = inspector.get_indexes('candles')
+    has_unique = any(
+        idx.get('unique') and list(idx['column_names']) == CANDLES_KEY_COLUMNS
+        for idx in indexes
+    )
+    existing = {idx['name'] for idx in indexes}
+
+    removed = 0
+    with engine.begin() as conn:
+        if not has_unique:
+            logger.info("Миграция candles: удаление дублей и создание уникального индекса")
+            result = conn.execute(text(
+                "DELETE FROM candles WHERE id NOT IN ("
+                "SELECT MAX(id) FROM candles GROUP BY ticker, timeframe, time)"
+            ))
+            removed = result.rowcount or 0
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {CANDLES_UNIQUE_INDEX} "
+                f"ON candles ({', '.join(CANDLES_KEY_COLUMNS)})"
+            ))
+
+        for name in REDUNDANT_CANDLE_INDEXES:
+            if name in existing:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+                logger.info(f"Миграция candles: удален избыточный индекс {name}")
+
+        if not has_unique:
+            # Обновить статистику планировщика под новый индекс
+            conn.execute(text("ANALYZE candles"))
+
+    if removed:
+        logger.info(f"Миграция candles: удалено дублей: {removed}")
+    return removed
+
+
+def migrate_candles_timeframe_length(engine: Engine) -> bool:
+    """
+    Расширить candles.timeframe с VARCHAR(5) до VARCHAR(CANDLES_TIMEFRAME_LENGTH)
+
+    create_all не меняет существующие таблицы, а в старой схеме колонка
+    VARCHAR(5), и на PostgreSQL вставка 't500' или 'tr15m' падает. SQLite
+    длину VARCHAR не проверяет, там шаг только отмечается. Однократный шаг
+    (schema_migrations).
+
+    Returns:
+        True, если колонка была расширена
+    """
+    inspector = inspect(engine)
+    if 'candles' not in inspector.get_table_names():
+        return False
+    if migration_applied(engine, CANDLES_TIMEFRAME_MIGRATION):
+        return False
+
+    column = next(c for c in inspector.get_columns('candles') if c['name'] == 'timeframe')
+    length = getattr(column['type'], 'length', None)
+    altered = False
+    if engine.dialect.name == 'postgresql' and length is not None and length < CANDLES_TIMEFRAME_LENGTH:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"ALTER TABLE candles ALTER COLUMN timeframe TYPE VARCHAR({CANDLES_TIMEFRAME_LENGTH})"
+            ))
+        altered = True
+        logger.info(f"Миграция candles: timeframe расширена до VARCHAR({CANDLES_TIMEFRAME_LENGTH})")
+
+    mark_migration_applied(engine, CANDLES_TIMEFRAME_MIGRATION)
+    return altered
+
+
+def migrate_portfolio_history(engine: Engine) -> int:
+    """
+    Перевести portfolio_snapshots на position_history
+    
+    Добавляет колонки account и keyframe и индекс (account, timestamp), затем
+    раскладывает positions_json старых снимков в дельты position_history
+    (ключевой кадр - каждый KEYFRAME_INTERVAL-й снимок) и очищает JSON.
+    Снимки с неразборчивым JSON не трогаются. Идемпотентна.
+    
+    Returns:
+        Количество перенесенных снимков
+    """
+    inspector = inspect(engine)
+    if 'portfolio_snapshots' not in inspector.get_table_names():
+        return 0
+    
+    columns = {column['name'] for column in inspector.get_columns('portfolio_snapshots')}
+    indexes = {idx['name'] for idx in inspector.get_indexes('portfolio_snapshots')}
+    
+    migrated = 0
+    with engine.begin() as conn:
+        if 'account' not in columns:
+            conn.execute(text("ALTER TABLE portfolio_snapshots ADD COLUMN account VARCHAR(20) NOT NULL DEFAULT ''"))
+        if 'keyframe' not in columns:
+            conn.execute(text("ALTER TABLE portfolio_snapshots ADD COLUMN keyframe BOOLEAN NOT NULL DEFAULT FALSE"))
+        if 'idx_portfolio_account_time' not in indexes:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_portfolio_account_time ON portfolio_snapshots (account, timestamp)"
+            ))
+        
+        rows = conn.execute(text(
+            "SELECT id, account, timestamp, positions_json FROM portfolio_snapshots "
+            "WHERE positions_json IS NOT NULL ORDER BY account, id"
+        ).columns(timestamp=DateTime)).fetchall()
+        if not rows:
+            return 0
+        
+        logger.info(f"Миграция portfolio_snapshots: перенос позиций {len(rows)} снимков в position_history")
+        chains = {}
+        history, keyframes, done = [], [], []
+        for snapshot_id, account, timestamp, positions_json in rows:
+            state = parse_positions_json(positions_json)
+            if state is None:
+                logger.warning(f"Миграция portfolio_snapshots: не разобран JSON снимка {snapshot_id}")
+                continue
+            if account not in chains:
+                # Цепочка счета начинается с ключевого кадра поверх уже перенесенной истории
+                chains[account] = (read_position_state(conn, account, timestamp), None)
+            previous, since_keyframe = chains[account]
+            keyframe = since_keyframe is None or since_keyframe + 1 >= KEYFRAME_INTERVAL
+            changes = snapshot_changes(previous, state, keyframe)
+            chains[account] = (state, 0 if keyframe else since_keyframe + 1)
+            
+            history.extend(
+                {'snapshot_id': snapshot_id, 'account': account, 'timestamp': timestamp,
+                 'ticker': ticker, 'quantity': quantity, 'average_price': price}
+                for ticker, (quantity, price) in changes.items()
+            )
+            if keyframe:
+                keyframes.append({'id': snapshot_id})
+            done.append({'id': snapshot_id})
+        
+        if history:
+            conn.execute(text(
+                "INSERT INTO position_history (snapshot_id, account, timestamp, ticker, quantity, average_price) "
+                "VALUES (:snapshot_id, :account, :timestamp, :ticker, :quantity, :average_price)"
+            ), history)
+        if keyframes:
+            conn.execute(text("UPDATE portfolio_snapshots SET keyframe = TRUE WHERE id = :id"), keyframes)
+        if done:
+            conn.execute(text("UPDATE portfolio_snapshots SET positions_json = NULL WHERE id = :id"), done)
+        migrated = len(done)
+    
+    logger.info(f"Миграция portfolio_snapshots: перенесено снимков: {migrated}")
+    return migrated
+
+
+def run_migrations(engine: Engine) -> None:
+    """Применить все миграции (каждая проверяет, нужна ли она)"""
+    migrate_candles_unique_index(engine)
+    migrate_candles_timeframe_length(engine)
+    migrate_portfolio_history(engine)
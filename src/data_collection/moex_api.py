@@ -4,29 +4,89 @@
 """
 
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict
+import os
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Dict, Tuple, Iterator
+import numpy as np
 import pandas as pd
 import requests
-import time
+from requests.adapters import HTTPAdapter
+
+from src.data_collection.response_cache import ISSResponseCache
+from src.utils.constants import MSK
+from src.utils.rate_limiter import RateLimiter, get_rate_limiter
+from src.data_collection.iss_decoder import CANDLE_COLUMNS, ORDERBOOK_COLUMNS, TRADE_COLUMNS, decode_block
 
 logger = logging.getLogger(__name__)
 
+# Адрес ISS можно подменить (например, на локальный стенд scripts/run_iss_stub.py)
+DEFAULT_ISS_URL = "https://iss.moex.com/iss"
+
+# ISS отдает не больше ISS_PAGE_SIZE строк на запрос, остальное - через параметр start
+ISS_PAGE_SIZE = 500
+# Защита от бесконечной пагинации (сервер, игнорирующий start)
+ISS_MAX_PAGES = 10000
+
+
+def is_closed_range(end_date: datetime, now: Optional[datetime] = None) -> bool:
+    """
+    Закончился ли диапазон свечей до текущего торгового дня
+
+    Даты свечей ISS - московские, поэтому "сегодня" берется по Москве, а не
+    по часовому поясу машины: иначе вечером по UTC текущий день биржи
+    считался бы закрытым и его неполные свечи кэшировались бы бессрочно.
+    """
+    today = (now or datetime.now(MSK)).astimezone(MSK).date()
+    return end_date.date() < today
+
 
 class MOEXDataCollector:
     """Коллектор данных с MOEX через REST API"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_workers: int = 8,
+        page_prefetch: int = 4,
+        cache_dir: Optional[str] = None,
+        cache_open_ttl: float = 30.0,
+        base_url: Optional[str] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
         """
         Инициализация коллектора
         
         Args:
             api_key: API ключ MOEX (опционально, для некоторых методов)
+            max_workers: Размер пула потоков/соединений для параллельной загрузки
+            page_prefetch: Сколько страниц ISS запрашивать параллельно для одного тикера
+            cache_dir: Директория дискового кэша свечей (None = без кэша; для загрузки
+                истории передается settings.api.ISS_CACHE_DIR)
+            cache_open_ttl: Время жизни кэша для диапазонов, включающих сегодня (секунды)
+            base_url: Адрес ISS (None = MOEX_ISS_URL из окружения или iss.moex.com)
+            rate_limiter: Ограничитель частоты запросов (None = общий для процесса)
         """
         self.api_key = api_key
-        self.base_url = "https://iss.moex.com/iss"
+        self.base_url = (base_url or os.getenv('MOEX_ISS_URL') or DEFAULT_ISS_URL).rstrip('/')
+        self.max_workers = max_workers
+        self.page_prefetch = max(1, page_prefetch)
         self.session = requests.Session()
+        # Один пул соединений на все потоки: keep-alive к iss.moex.com переиспользуется
+        pool_size = max_workers * self.page_prefetch
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Все запросы идут через общий бюджет хоста с повторами на 429/5xx
+        self.limiter = rate_limiter or get_rate_limiter()
         self.logger = logging.getLogger(__name__)
+        
+        self.cache = None
+        if cache_dir:
+            try:
+                self.cache = ISSResponseCache(cache_dir, open_ttl=cache_open_ttl)
+            except Exception as e:
+                self.logger.warning(f"Кэш ISS недоступен ({cache_dir}): {e}")
         self.logger.info("MOEXDataCollector инициализирован (REST API)")
     
     def test_connection(self) -> bool:
@@ -37,7 +97,7 @@ class MOEXDataCollector:
             True если подключение успешно
         """
         try:
-            response = self.session.get(f"{self.base_url}/engines/stock/markets/shares/boards/TQBR/securities.json", timeout=10)
+            response = self.limiter.get(f"{self.base_url}/engines/stock/markets/shares/boards/TQBR/securities.json", session=self.session, timeout=10)
             return response.status_code == 200
         except Exception as e:
             self.logger.error(f"Ошибка подключения к MOEX: {e}")
@@ -81,85 +141,45 @@ class MOEXDataCollector:
             # Формируем URL для запроса свечей
             url = f"{self.base_url}/engines/stock/markets/shares/boards/TQBR/securities/{ticker}/candles.json"
             
+            # Только нужный блок и колонки, без метаданных
             params = {
                 'from': start_date.strftime('%Y-%m-%d'),
                 'till': end_date.strftime('%Y-%m-%d'),
-                'interval': interval
+                'interval': interval,
+                'iss.meta': 'off',
+                'iss.only': 'candles',
+                'candles.columns': ','.join(CANDLE_COLUMNS)
             }
             
-            all_data = []
-            start = start_date
-            
-            # MOEX API возвращает данные порциями, нужно делать несколько запросов
-            while start < end_date:
-                params['from'] = start.strftime('%Y-%m-%d')
-                params['till'] = min(start + timedelta(days=100), end_date).strftime('%Y-%m-%d')
-                
-                response = self.session.get(url, params=params, timeout=30)
-                
-                if response.status_code != 200:
-                    self.logger.warning(f"Ошибка запроса: {response.status_code}")
-                    break
-                
-                data = response.json()
-                
-                if 'candles' not in data or 'data' not in data['candles']:
-                    break
-                
-                columns = data['candles']['columns']
-                rows = data['candles']['data']
-                
-                if not rows:
-                    break
-                
-                # Конвертируем в DataFrame
-                df_chunk = pd.DataFrame(rows, columns=columns)
-                all_data.append(df_chunk)
-                
-                # Обновляем дату начала для следующего запроса
-                last_date = pd.to_datetime(df_chunk.iloc[-1]['begin'])
-                start = last_date + timedelta(days=1)
-                
-                # Защита от бесконечного цикла
-                if len(all_data) > 50:
-                    break
-                
-                time.sleep(0.1)  # Небольшая задержка между запросами
+            # Прошедшие свечи не меняются: закрытый диапазон кэшируется бессрочно
+            closed = is_closed_range(end_date)
             
-            if not all_data:
-                self.logger.warning(f"Нет данных для {ticker}")
-                return pd.DataFrame()
+            # Весь диапазон одним курсором: страницы по offset, с параллельной предвыборкой
+            columns, pages = self._fetch_paginated(url, params, 'candles', closed=closed)
             
-            # Объединяем все части
-            df = pd.concat(all_data, ignore_index=True)
-            
-            # Переименовываем колонки в стандартный формат
-            column_map = {
-                'begin': 'time',
-                'open': 'open',
-                'high': 'high',
-                'low': 'low',
-                'close': 'close',
-                'volume': 'volume'
-            }
+            arrays = decode_block(columns, pages, CANDLE_COLUMNS)
+            times = arrays.pop('begin', None)
             
-            # Приводим к стандартным названиям колонок
-            df = df.rename(columns=column_map)
+            if times is None or not len(times):
+                self.logger.warning(f"Нет данных для {ticker}")
+                return pd.DataFrame()
             
-            # Оставляем только нужные колонки
-            required_cols = ['time', 'open', 'high', 'low', 'close', 'volume']
-            available_cols = [col for col in required_cols if col in df.columns]
-            df = df[available_cols]
+            times = times.astype('datetime64[ns]')
             
-            # Убеждаемся, что time в формате datetime
-            if 'time' in df.columns:
-                df['time'] = pd.to_datetime(df['time'])
+            # Страницы ISS идут по возрастанию времени без перекрытий;
+            # сортировка и удаление дублей - только если порядок нарушен
+            if len(times) > 1 and not (times[1:] > times[:-1]).all():
+                times, first_idx = np.unique(times, return_index=True)
+                arrays = {name: values[first_idx] for name, values in arrays.items()}
             
-            # Сортируем по времени и удаляем дубликаты
-            df = df.sort_values('time').drop_duplicates(subset=['time']).reset_index(drop=True)
+            # Фильтруем по датам бинарным поиском
+            lo = np.searchsorted(times, np.datetime64(start_date, 'ns'), side='left')
+            hi = np.searchsorted(times, np.datetime64(end_date, 'ns'), side='right')
             
-            # Фильтруем по датам
-            df = df[(df['time'] >= start_date) & (df['time'] <= end_date)]
+            df = pd.DataFrame({'time': times[lo:hi]})
+            for name in ('open', 'high', 'low', 'close', 'volume'):
+                if name in arrays:
+                    df[name] = arrays[name][lo:hi]
             
             self.logger.info(f"Загружено {len(df)} свечей для {ticker}")
             return df
@@ -168,6 +188,212 @@ class MOEXDataCollector:
             self.logger.error(f"Ошибка загрузки свечей для {ticker}: {e}")
             return pd.DataFrame()
     
+    def _fetch_page(
+        self,
+        url: str,
+        params: Dict,
+        start: int,
+        timeout: int = 30,
+        closed: Optional[bool] = None
+    ) -> Optional[Dict]:
+        """
+        Запросить одну страницу ISS со смещением start
+        
+        Args:
+            closed: None - не кэшировать; True/False - кэшировать как закрытый/открытый диапазон
+        """
+        page_params = dict(params, start=start)
+        
+        use_cache = self.cache is not None and closed is not None
+        if use_cache:
+            cached = self.cache.get(url, page_params)
+            if cached is not None:
+                return cached
+        
+        response = self.limiter.get(url, session=self.session, params=page_params, timeout=timeout)
+        
+        if response.status_code != 200:
+            self.logger.warning(f"Ошибка запроса: {response.status_code}")
+            return None
+        
+        data = response.json()
+        if use_cache:
+            self.cache.set(url, page_params, data, closed=closed)
+        return data
+    
+    def _fetch_paginated(
+        self,
+        url: str,
+        params: Dict,
+        block: str,
+        timeout: int = 30,
+        closed: Optional[bool] = None
+    ) -> Tuple[List[str], List[List[list]]]:
+        """
+        Загрузить все страницы блока ISS по курсору start
+        
+        Эндпоинт свечей не отдает блок '<block>.cursor' с общим числом строк,
+        поэтому страницы запрашиваются параллельными пачками по page_prefetch
+        до первой неполной страницы.
+        
+        Args:
+            url: URL эндпоинта
+            params: Параметры запроса (без start)
+            block: Имя блока данных ('candles', 'trades', ...)
+            timeout: Таймаут одного запроса
+            closed: Режим кэширования страниц (см. _fetch_page)
+        
+        Returns:
+            (columns, pages) - колонки блока и непустые страницы строк по порядку
+        """
+        first = self._fetch_page(url, params, 0, timeout, closed)
+        if not first or block not in first or 'data' not in first[block]:
+            return [], []
+        
+        columns = first[block]['columns']
+        rows = first[block]['data']
+        pages = [rows] if rows else []
+        
+        def page_rows(start: int) -> List[list]:
+            data = self._fetch_page(url, params, start, timeout, closed)
+            if data is None:
+                # Пропущенная страница посреди диапазона - ошибка, а не конец данных
+                raise IOError(f"Не удалось получить страницу ISS (start={start})")
+            if block not in data:
+                return []
+            return data[block].get('data', [])
+        
+        # Первая неполная страница - последняя
+        if len(rows) < ISS_PAGE_SIZE:
+            return columns, pages
+        
+        page_size = len(rows)
+        offset = page_size
+        with ThreadPoolExecutor(max_workers=self.page_prefetch) as executor:
+            while offset < page_size * ISS_MAX_PAGES:
+                offsets = [offset + i * page_size for i in range(self.page_prefetch)]
+                done = False
+                for chunk in executor.map(page_rows, offsets):
+                    if chunk:
+                        pages.append(chunk)
+                    if len(chunk) < page_size:
+                        done = True
+                        break
+                if done:
+                    break
+                offset = offsets[-1] + page_size
+        
+        return columns, pages
+    
+    def get_historical_candles_many(
+        self,
+        tickers: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        timeframe: str = '1h',
+        max_workers: Optional[int] = None,
+        start_dates: Optional[Dict[str, datetime]] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Получить исторические свечи сразу для нескольких тикеров
+        
+        Тикеры загружаются параллельно ограниченным пулом потоков, все потоки
+        используют общую сессию с пулом соединений.
+        
+        Args:
+            tickers: Список тикеров
+            start_date: Начальная дата
+            end_date: Конечная дата
+            timeframe: Таймфрейм ('1m', '5m', '1h', '1d')
+            max_workers: Размер пула (None = self.max_workers)
+            start_dates: Индивидуальные начальные даты {ticker: datetime} (перекрывают start_date)
+        
+        Returns:
+            Dict {ticker: DataFrame}; для тикеров без данных - пустой DataFrame
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}
+        
+        workers = min(max_workers or self.max_workers, len(tickers))
+        self.logger.info(f"Параллельная загрузка свечей для {len(tickers)} тикеров ({workers} потоков)")
+        
+        start_dates = start_dates or {}
+        
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='moex') as executor:
+            futures = {
+                executor.submit(
+                    self.get_historical_candles,
+                    ticker,
+                    start_dates.get(ticker, start_date),
+                    end_date,
+                    timeframe
+                ): ticker
+                for ticker in tickers
+            }
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    results[ticker] = future.result()
+                except Exception as e:
+                    self.logger.error(f"Ошибка загрузки свечей для {ticker}: {e}")
+                    results[ticker] = pd.DataFrame()
+        
+        # Сохраняем порядок входного списка
+        return {ticker: results[ticker] for ticker in tickers}
+    
+    def iter_trades(self, ticker: str, since_tradeno: Optional[int] = None) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Потоково получить сделки (тики) текущей сессии постранично
+        
+        Страницы запрашиваются последовательно по курсору номера сделки, в памяти
+        держится только текущая страница.
+        
+        Args:
+            ticker: Тикер акции
+            since_tradeno: Номер последней уже обработанной сделки (None = с начала сессии)
+        
+        Yields:
+            Dict {'TRADENO', 'SYSTIME', 'PRICE', 'QUANTITY'} с массивами NumPy одной страницы
+        """
+        url = f"{self.base_url}/engines/stock/markets/shares/boards/TQBR/securities/{ticker}/trades.json"
+        params = {
+            'iss.meta': 'off',
+            'iss.only': 'trades',
+            'trades.columns': ','.join(TRADE_COLUMNS)
+        }
+        last_tradeno = since_tradeno
+        
+        for _ in range(ISS_MAX_PAGES):
+            if last_tradeno is not None:
+                params['tradeno'] = last_tradeno
+                params['next_trade'] = 1
+            
+            data = self._fetch_page(url, params, 0, timeout=30)
+            if data is None:
+                raise IOError(f"Не удалось получить сделки {ticker} (tradeno={last_tradeno})")
+            if 'trades' not in data:
+                return
+            
+            rows = data['trades'].get('data', [])
+            if not rows:
+                return
+            
+            arrays = decode_block(data['trades']['columns'], [rows], TRADE_COLUMNS)
+            if last_tradeno is not None:
+                # Курсор может включать саму сделку last_tradeno
+                fresh = arrays['TRADENO'] > last_tradeno
+                if not fresh.all():
+                    arrays = {name: values[fresh] for name, values in arrays.items()}
+            
+            if len(arrays['TRADENO']):
+                last_tradeno = int(arrays['TRADENO'][-1])
+                yield arrays
+            
+            if len(rows) < ISS_PAGE_SIZE:
+                return
+    
     def get_orderbook(self, ticker: str) -> Optional[Dict]:
         """
         Получить текущий стакан заявок
@@ -180,7 +406,12 @@ class MOEXDataCollector:
         """
         try:
             url = f"{self.base_url}/engines/stock/markets/shares/boards/TQBR/securities/{ticker}/orderbook.json"
-            response = self.session.get(url, timeout=10)
+            params = {
+                'iss.meta': 'off',
+                'iss.only': 'orderbook',
+                'orderbook.columns': ','.join(ORDERBOOK_COLUMNS)
+            }
+            response = self.limiter.get(url, session=self.session, params=params, timeout=10)
             
             if response.status_code != 200:
                 return None
@@ -196,12 +427,27 @@ class MOEXDataCollector:
             if not rows:
                 return None
             
-            # Конвертируем в DataFrame для удобства
-            df = pd.DataFrame(rows, columns=columns)
+            arrays = decode_block(columns, [rows], ORDERBOOK_COLUMNS)
+            if len(arrays) < len(ORDERBOOK_COLUMNS):
+                return None
+            
+            side = arrays['BUYSELL']
+            prices = arrays['PRICE']
+            quantities = arrays['QUANTITY']
+            
+            def levels(mask: np.ndarray, descending: bool) -> List[Dict]:
+                order = np.argsort(prices[mask])
+                if descending:
+                    order = order[::-1]
+                return [
+                    {'price': float(price), 'quantity': int(quantity)}
+                    for price, quantity in zip(prices[mask][order], quantities[mask][order])
+                ]
             
+            # Лучшие цены первыми: bids по убыванию, asks по возрастанию
             return {
-                'bids': df[df['buy_sell'] == 'B'].to_dict('records') if 'buy_sell' in df.columns else [],
-                'asks': df[df['buy_sell'] == 'S'].to_dict('records') if 'buy_sell' in df.columns else []
+                'bids': levels(side == 'B', descending=True),
+                'asks': levels(side == 'S', descending=False)
             }
             
         except Exception as e:
@@ -220,7 +466,12 @@ class MOEXDataCollector:
         """
         try:
             url = f"{self.base_url}/engines/stock/markets/shares/boards/TQBR/securities.json"
-            response = self.session.get(url, timeout=10)
+            params = {
+                'iss.meta': 'off',
+                'iss.only': 'securities',
+                'securities.columns': 'SECID'
+            }
+            response = self.limiter.get(url, session=self.session, params=params, timeout=10)
             
             if response.status_code != 200:
                 self.logger.warning("Не удалось получить список тикеров, используем fallback")
@@ -235,12 +486,12 @@ class MOEXDataCollector:
             rows = data['securities']['data']
             
             # Извлекаем тикеры (колонка SECID)
-            secid_idx = columns.index('SECID') if 'SECID' in columns else None
+            secids = decode_block(columns, [rows], {'SECID': 'object'}).get('SECID')
             
-            if secid_idx is None:
+            if secids is None:
                 return ['SBER', 'GAZP', 'LKOH', 'YNDX', 'GMKN', 'NVTK', 'PLZL', 'TATN', 'ROSN', 'MGNT']
             
-            tickers = [row[secid_idx] for row in rows if row[secid_idx]]
+            tickers = [secid for secid in secids.tolist() if secid]
             
             if limit:
                 tickers = tickers[:limit]
@@ -253,51 +504,71 @@ class MOEXDataCollector:
             # Возвращаем популярные тикеры как fallback
             return ['SBER', 'GAZP', 'LKOH', 'YNDX', 'GMKN', 'NVTK', 'PLZL', 'TATN', 'ROSN', 'MGNT']
     
-    def get_current_price(self, ticker: str) -> Optional[float]:
+    def get_current_prices(self, tickers: List[str]) -> pd.Series:
         """
-        Получить текущую цену тикера
+        Получить текущие цены сразу для списка тикеров одним запросом
         
         Args:
-            ticker: Тикер акции
+            tickers: Список тикеров
         
         Returns:
-            Текущая цена или None
+            Series {ticker: цена} в порядке tickers; NaN, если цены нет
         """
+        tickers = list(dict.fromkeys(tickers))
+        prices = pd.Series(float('nan'), index=pd.Index(tickers, name='ticker'), dtype='float64')
+        if not tickers:
+            return prices
+        
         try:
-            url = f"{self.base_url}/engines/stock/markets/shares/boards/TQBR/securities/{ticker}.json"
-            response = self.session.get(url, timeout=10)
+            url = f"{self.base_url}/engines/stock/markets/shares/boards/TQBR/securities.json"
+            params = {
+                'securities': ','.join(tickers),
+                'iss.only': 'marketdata',
+                'iss.meta': 'off'
+            }
+            response = self.limiter.get(url, session=self.session, params=params, timeout=10)
             
             if response.status_code != 200:
-                return None
+                return prices
             
             data = response.json()
             
             if 'marketdata' not in data or 'data' not in data['marketdata']:
-                return None
+                return prices
             
             columns = data['marketdata']['columns']
             rows = data['marketdata']['data']
             
-            if not rows:
-                return None
-            
-            # Ищем колонку LAST (последняя цена сделки)
-            last_idx = columns.index('LAST') if 'LAST' in columns else None
+            if not rows or 'SECID' not in columns:
+                return prices
             
-            if last_idx is not None:
-                price = rows[0][last_idx]
-                if price:
-                    return float(price)
+            df = pd.DataFrame(rows, columns=columns).drop_duplicates('SECID').set_index('SECID')
             
-            # Если LAST нет, пробуем CLOSE
-            close_idx = columns.index('CLOSE') if 'CLOSE' in columns else None
-            if close_idx is not None:
-                price = rows[0][close_idx]
-                if price:
-                    return float(price)
+            # LAST (последняя сделка), если ее нет - CLOSE
+            quotes = pd.Series(float('nan'), index=df.index, dtype='float64')
+            for column in ('LAST', 'CLOSE'):
+                if column in df.columns:
+                    values = pd.to_numeric(df[column], errors='coerce')
+                    quotes = quotes.fillna(values.where(values > 0))
             
-            return None
+            prices.update(quotes.reindex(prices.index))
+            return prices
             
         except Exception as e:
-            self.logger.error(f"Ошибка получения цены для {ticker}: {e}")
+            self.logger.error(f"Ошибка получения цен для {len(tickers)} тикеров: {e}")
+            return prices
+    
+    def get_current_price(self, ticker: str) -> Optional[float]:
+        """
+        Получить текущую цену тикера
+        
+        Args:
+            ticker: Тикер акции
+        
+        Returns:
+            Текущая цена или None
+        """
+        price = self.get_current_prices([ticker]).get(ticker)
+        if price is None or pd.isna(price):
             return None
+        return float(price)
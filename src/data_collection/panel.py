@@ -0,0 +1,89 @@
+"""Выровненная панель свечей нескольких тикеров (время x тикер)"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+@dataclass
+class CandlePanel:
+    """
+    Панель свечей: общая шкала времени и 2-D массивы [время, тикер] по каждому полю
+
+    Цены там, где бара нет, - NaN, объем - 0; mask[i, j] = True, если у тикера j
+    есть бар на момент times[i].
+    """
+    times: np.ndarray                 # datetime64[ns], по возрастанию
+    tickers: List[str]
+    fields: Dict[str, np.ndarray]     # поле -> массив (len(times), len(tickers))
+    mask: np.ndarray                  # bool (len(times), len(tickers))
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.fields[field]
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def empty(self) -> bool:
+        return not len(self.times)
+
+    def column(self, ticker: str) -> int:
+        """Номер столбца тикера"""
+        return self.tickers.index(ticker)
+
+    def to_frame(self, field: str) -> pd.DataFrame:
+        """Поле как DataFrame (индекс - время, колонки - тикеры)"""
+        return pd.DataFrame(self.fields[field], index=pd.DatetimeIndex(self.times, name='time'),
+                            columns=pd.Index(self.tickers, name='ticker'))
+
+    def ticker_frame(self, ticker: str) -> pd.DataFrame:
+        """Свечи одного тикера в формате load_candles (только существующие бары)"""
+        j = self.column(ticker)
+        present = self.mask[:, j]
+        data = {'time': self.times[present]}
+        data.update((name, values[present, j]) for name, values in self.fields.items())
+        return pd.DataFrame(data)
+
+
+def build_panel(
+    tickers: Sequence[str],
+    ticker_codes: np.ndarray,
+    times: np.ndarray,
+    values: Dict[str, np.ndarray],
+) -> CandlePanel:
+    """
+    Собрать панель из "длинных" массивов (по строке на бар)
+
+    Args:
+        tickers: Порядок столбцов панели
+        ticker_codes: Номер тикера в tickers для каждой строки
+        times: Время каждой строки (datetime64[ns] или int64 нс)
+        values: Поле -> значение каждой строки
+    """
+    times = np.asarray(times).view('int64')
+    shared, rows = np.unique(times, return_inverse=True)
+    shape = (len(shared), len(tickers))
+
+    mask = np.zeros(shape, dtype=bool)
+    mask[rows, ticker_codes] = True
+
+    fields = {}
+    for name, column in values.items():
+        if name == 'volume':
+            grid = np.zeros(shape, dtype='int64')
+        else:
+            grid = np.full(shape, np.nan, dtype='float64')
+        grid[rows, ticker_codes] = column
+        fields[name] = grid
+
+    return CandlePanel(
+        times=shared.view('datetime64[ns]'),
+        tickers=list(tickers),
+        fields=fields,
+        mask=mask,
+    )
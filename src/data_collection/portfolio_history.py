@@ -0,0 +1,101 @@
+"""Дельта-кодирование истории позиций портфеля (таблица position_history)"""
+
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import Boolean, DateTime, bindparam, text
+
+logger = logging.getLogger(__name__)
+
+# Каждый KEYFRAME_INTERVAL-й снимок счета хранит полное состояние позиций;
+# между ключевыми кадрами пишутся только изменения
+KEYFRAME_INTERVAL = 100
+
+# Состояние позиций: тикер -> (количество, средняя цена)
+PositionState = Dict[str, Tuple[float, float]]
+
+LAST_KEYFRAME_SQL = text(
+    "SELECT MAX(id) FROM portfolio_snapshots "
+    "WHERE account = :account AND keyframe = :keyframe AND timestamp <= :at"
+).bindparams(bindparam('at', type_=DateTime), bindparam('keyframe', type_=Boolean))
+POSITION_DELTAS_SQL = text(
+    "SELECT ticker, quantity, average_price FROM position_history "
+    "WHERE account = :account AND snapshot_id >= :snapshot_id AND timestamp <= :at "
+    "ORDER BY snapshot_id"
+).bindparams(bindparam('at', type_=DateTime))
+
+
+def position_state(positions: Sequence[dict]) -> PositionState:
+    """
+    Позиции брокера (get_portfolio()['positions']) -> состояние
+
+    Нулевые позиции не входят в состояние; повторы тикера складываются.
+    """
+    state: PositionState = {}
+    for pos in positions:
+        ticker = pos.get('ticker')
+        quantity = float(pos.get('quantity') or 0)
+        if not ticker or not quantity:
+            continue
+        price = float(pos.get('average_price', pos.get('average_buy_price')) or 0)
+        if ticker in state:
+            quantity += state[ticker][0]
+        state[ticker] = (quantity, price)
+    return state
+
+
+def parse_positions_json(positions_json: Optional[str]) -> Optional[PositionState]:
+    """positions_json старых снимков -> состояние (None, если JSON не разобрать)"""
+    if not positions_json:
+        return {}
+    try:
+        positions = json.loads(positions_json)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(positions, list):
+        return None
+    return position_state([pos for pos in positions if isinstance(pos, dict)])
+
+
+def position_deltas(previous: PositionState, current: PositionState) -> PositionState:
+    """Изменения между состояниями; закрытая позиция - запись с количеством 0"""
+    deltas = {ticker: value for ticker, value in current.items() if previous.get(ticker) != value}
+    deltas.update((ticker, (0.0, 0.0)) for ticker in previous if ticker not in current)
+    return deltas
+
+
+def snapshot_changes(previous: PositionState, current: PositionState, keyframe: bool) -> PositionState:
+    """
+    Строки position_history для снимка
+
+    Ключевой кадр - полное состояние плюс записи с количеством 0 для позиций,
+    закрытых после предыдущего снимка: история тикера читает только его
+    строки и без такой записи считала бы позицию открытой.
+    """
+    if not keyframe:
+        return position_deltas(previous, current)
+    changes = dict(current)
+    changes.update((ticker, (0.0, 0.0)) for ticker in previous if ticker not in current)
+    return changes
+
+
+def read_position_state(conn, account: str = '', at: Optional[datetime] = None) -> PositionState:
+    """Позиции счета на момент at по ключевому кадру и дельтам после него (conn - соединение SQLAlchemy)"""
+    at = at or datetime.max
+    keyframe_id = conn.execute(LAST_KEYFRAME_SQL, {'account': account, 'keyframe': True, 'at': at}).scalar()
+    if keyframe_id is None:
+        return {}
+    rows = conn.execute(POSITION_DELTAS_SQL, {'account': account, 'snapshot_id': keyframe_id, 'at': at}).fetchall()
+    return apply_deltas({}, rows)
+
+
+def apply_deltas(state: PositionState, rows: Iterable[Tuple[str, float, float]]) -> PositionState:
+    """Применить строки (тикер, количество, средняя цена) к состоянию на месте"""
+    for ticker, quantity, price in rows:
+        if quantity:
+            state[ticker] = (float(quantity), float(price))
+        else:
+            state.pop(ticker, None)
+    return state
@@ -0,0 +1,193 @@
+"""Фоновый опрос котировок MOEX с общим кэшем последних цен и стаканов в памяти"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.data_collection.moex_api import MOEXDataCollector
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteCache:
+    """
+    Потокобезопасный кэш котировок
+
+    Для каждого тикера хранится кольцевой буфер последних цен с временем
+    получения и последний стакан. Чтение не ходит в сеть: устаревшие
+    (старше max_age секунд) значения возвращаются как отсутствующие.
+    """
+
+    def __init__(self, history_size: int = 256, max_age: float = 5.0):
+        """
+        Args:
+            history_size: Сколько последних цен хранить по тикеру
+            max_age: Максимальный возраст значения по умолчанию (секунды)
+        """
+        self.history_size = history_size
+        self.max_age = max_age
+        self._prices: Dict[str, Deque[Tuple[float, float]]] = {}
+        self._orderbooks: Dict[str, Tuple[float, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def update_prices(self, prices: pd.Series, timestamp: Optional[float] = None) -> None:
+        """Записать снимок цен {ticker: price}; NaN пропускаются"""
+        timestamp = timestamp or time.time()
+        with self._lock:
+            for ticker, price in prices.items():
+                if price is None or pd.isna(price):
+                    continue
+                buffer = self._prices.get(ticker)
+                if buffer is None:
+                    buffer = self._prices[ticker] = deque(maxlen=self.history_size)
+                buffer.append((timestamp, float(price)))
+
+    def update_orderbook(self, ticker: str, orderbook: Dict, timestamp: Optional[float] = None) -> None:
+        """Записать стакан тикера"""
+        with self._lock:
+            self._orderbooks[ticker] = (timestamp or time.time(), orderbook)
+
+    def _fresh(self, timestamp: float, max_age: Optional[float]) -> bool:
+        max_age = self.max_age if max_age is None else max_age
+        return time.time() - timestamp <= max_age
+
+    def get_price(self, ticker: str, max_age: Optional[float] = None) -> Optional[float]:
+        """Последняя цена или None, если ее нет или она устарела"""
+        with self._lock:
+            buffer = self._prices.get(ticker)
+            if not buffer:
+                return None
+            timestamp, price = buffer[-1]
+        return price if self._fresh(timestamp, max_age) else None
+
+    def get_prices(self, tickers: List[str], max_age: Optional[float] = None) -> pd.Series:
+        """Последние цены списка тикеров; NaN для отсутствующих и устаревших"""
+        values = [self.get_price(ticker, max_age) for ticker in tickers]
+        return pd.Series(
+            [np.nan if value is None else value for value in values],
+            index=pd.Index(tickers, name='ticker'),
+            dtype='float64'
+        )
+
+    def get_orderbook(self, ticker: str, max_age: Optional[float] = None) -> Optional[Dict]:
+        """Последний стакан или None, если его нет или он устарел"""
+        with self._lock:
+            entry = self._orderbooks.get(ticker)
+        if entry is None or not self._fresh(entry[0], max_age):
+            return None
+        return entry[1]
+
+    def get_age(self, ticker: str) -> Optional[float]:
+        """Возраст последней цены в секундах (None - цены не было)"""
+        with self._lock:
+            buffer = self._prices.get(ticker)
+            if not buffer:
+                return None
+            timestamp = buffer[-1][0]
+        return time.time() - timestamp
+
+    def get_history(self, ticker: str) -> np.ndarray:
+        """История цен из буфера: массив (N, 2) [timestamp, price]"""
+        with self._lock:
+            buffer = list(self._prices.get(ticker, ()))
+        return np.array(buffer, dtype='float64').reshape(-1, 2)
+
+
+class QuotePoller:
+    """
+    Фоновый поток, опрашивающий MOEX и наполняющий QuoteCache
+
+    Цены всего набора тикеров запрашиваются одним bulk-запросом каждые interval
+    секунд; стаканы (если включены) - параллельно раз в orderbook_interval секунд.
+    """
+
+    def __init__(
+        self,
+        collector: MOEXDataCollector,
+        cache: QuoteCache,
+        tickers: List[str],
+        interval: float = 1.0,
+        orderbook_interval: Optional[float] = None
+    ):
+        """
+        Args:
+            collector: Коллектор MOEX
+            cache: Кэш, который наполняет поллер
+            tickers: Активный набор тикеров
+            interval: Период опроса цен (секунды)
+            orderbook_interval: Период опроса стаканов (None = не опрашивать)
+        """
+        self.collector = collector
+        self.cache = cache
+        self.interval = interval
+        self.orderbook_interval = orderbook_interval
+        self._tickers = list(dict.fromkeys(tickers))
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_orderbook_poll = 0.0
+
+    @property
+    def tickers(self) -> List[str]:
+        with self._lock:
+            return list(self._tickers)
+
+    def set_tickers(self, tickers: List[str]) -> None:
+        """Заменить активный набор тикеров (применяется со следующего опроса)"""
+        with self._lock:
+            self._tickers = list(dict.fromkeys(tickers))
+
+    def add_tickers(self, tickers: List[str]) -> None:
+        """Добавить тикеры в активный набор"""
+        with self._lock:
+            self._tickers = list(dict.fromkeys(self._tickers + list(tickers)))
+
+    def poll_once(self) -> None:
+        """Один цикл опроса (цены и, по расписанию, стаканы)"""
+        tickers = self.tickers
+        if not tickers:
+            return
+
+        prices = self.collector.get_current_prices(tickers)
+        self.cache.update_prices(prices)
+
+        now = time.time()
+        if self.orderbook_interval is not None and now - self._last_orderbook_poll >= self.orderbook_interval:
+            self._last_orderbook_poll = now
+            workers = min(self.collector.max_workers, len(tickers))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='orderbook') as executor:
+                for ticker, orderbook in zip(tickers, executor.map(self.collector.get_orderbook, tickers)):
+                    if orderbook is not None:
+                        self.cache.update_orderbook(ticker, orderbook)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning(f"Ошибка опроса котировок: {e}")
+            self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self) -> None:
+        """Запустить фоновый опрос"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='quote-poller', daemon=True)
+        self._thread.start()
+        logger.info(f"Опрос котировок запущен: {len(self.tickers)} тикеров, каждые {self.interval} с")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Остановить фоновый опрос"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        logger.info("Опрос котировок остановлен")
@@ -0,0 +1,107 @@
+"""Дисковый кэш ответов MOEX ISS для закрытых исторических окон"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ISSResponseCache:
+    """
+    Кэш JSON-ответов ISS на диске
+    
+    Ключ - эндпоинт (URL с тикером) и все параметры запроса (interval, from, till,
+    start, ...). Ответы для полностью закрытых диапазонов дат не меняются и хранятся
+    бессрочно, ответы для диапазонов, включающих сегодняшний день, - open_ttl секунд.
+    """
+    
+    def __init__(self, cache_dir: str, open_ttl: float = 30.0):
+        """
+        Args:
+            cache_dir: Директория кэша
+            open_ttl: Время жизни ответа для открытого диапазона (секунды)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.open_ttl = open_ttl
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict] = None) -> str:
+        """Ключ кэша по URL и параметрам запроса"""
+        items = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        raw = url + '?' + '&'.join(f'{k}={v}' for k, v in items)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.json.gz'
+    
+    def get(self, url: str, params: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Получить ответ из кэша
+        
+        Returns:
+            Распарсенный JSON или None (нет в кэше / устарел / поврежден)
+        """
+        path = self._path(self.make_key(url, params))
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Поврежденная запись кэша ISS {path.name}: {e}")
+            return None
+        
+        expires_at = entry.get('expires_at')
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return entry.get('payload')
+    
+    def set(self, url: str, params: Optional[Dict], payload: Dict, closed: bool) -> None:
+        """
+        Сохранить ответ в кэш
+        
+        Args:
+            url: URL запроса
+            params: Параметры запроса
+            payload: Распарсенный JSON-ответ
+            closed: True - диапазон закрыт (хранить бессрочно), False - open_ttl
+        """
+        if not closed and self.open_ttl <= 0:
+            return
+        
+        path = self._path(self.make_key(url, params))
+        entry = {
+            'url': url,
+            'params': {str(k): str(v) for k, v in (params or {}).items()},
+            'expires_at': None if closed else time.time() + self.open_ttl,
+            'payload': payload,
+        }
+        
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Пишем во временный файл и атомарно подменяем: безопасно для параллельных потоков
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Не удалось записать кэш ISS: {e}")
+    
+    def clear(self) -> int:
+        """Удалить все записи кэша; возвращает число удаленных файлов"""
+        removed = 0
+        for path in self.cache_dir.glob('*/*.json.gz'):
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        return removed
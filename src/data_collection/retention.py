@@ -0,0 +1,128 @@
+"""Политика хранения свечей: архивирование, вытеснение из candles и обслуживание БД"""
+
+import logging
+from datetime import datetime, time, timedelta
+from typing import Dict, Optional, Tuple
+
+from config.settings import settings
+from src.data_collection.database import DatabaseManager
+from src.utils.constants import MSK
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retention_policy(policy: str) -> Dict[str, int]:
+    """'1m:90,5m:365' -> {'1m': 90, '5m': 365} (таймфрейм -> дней хранения в candles)"""
+    result = {}
+    for item in policy.replace(';', ',').split(','):
+        if not item.strip():
+            continue
+        timeframe, days = item.split(':')
+        result[timeframe.strip()] = int(days)
+    return result
+
+
+def parse_window(window: str) -> Tuple[time, time]:
+    """'01:00-06:00' -> (01:00, 06:00)"""
+    start, end = window.split('-')
+    return time.fromisoformat(start.strip()), time.fromisoformat(end.strip())
+
+
+class RetentionManager:
+    """
+    Ограничивает рабочий набор таблицы candles
+
+    Для каждого таймфрейма политики свечи старше срока хранения:
+    1. сворачиваются в candle_rollups (старшие таймфреймы остаются в БД);
+    2. при archive=True дописываются в сжатый архив DatabaseManager.archive,
+       откуда их прозрачно дочитывает load_candles;
+    3. удаляются из candles.
+    Затем ANALYZE и VACUUM. Все это - только в окне обслуживания (МСК).
+    """
+
+    def __init__(
+        self,
+        db: DatabaseManager,
+        policy: Optional[Dict[str, int]] = None,
+        archive: Optional[bool] = None,
+        window: Optional[str] = None
+    ):
+        """
+        Args:
+            db: Менеджер БД
+            policy: Таймфрейм -> дней хранения (по умолчанию settings.db.RETENTION_POLICY)
+            archive: Архивировать вытесняемые свечи (по умолчанию settings.db.ARCHIVE_ENABLED)
+            window: Окно обслуживания 'ЧЧ:ММ-ЧЧ:ММ' по Москве (по умолчанию settings.db.MAINTENANCE_WINDOW)
+        """
+        self.db = db
+        self.policy = policy if policy is not None else parse_retention_policy(settings.db.RETENTION_POLICY)
+        self.archive = settings.db.ARCHIVE_ENABLED if archive is None else archive
+        self.window = parse_window(window or settings.db.MAINTENANCE_WINDOW)
+        self.last_run: Optional[datetime] = None
+
+    def in_window(self, now: Optional[datetime] = None) -> bool:
+        """Попадает ли now (по умолчанию - текущее время) в окно обслуживания по Москве"""
+        current = (now or datetime.now(MSK)).astimezone(MSK).time()
+        start, end = self.window
+        if start <= end:
+            return start <= current < end
+        return current >= start or current < end
+
+    def compact(self, now: Optional[datetime] = None) -> Dict[Tuple[str, str], int]:
+        """
+        Архивировать и удалить из candles свечи старше срока хранения
+
+        Граница округляется до начала суток, чтобы ни один агрегат (вплоть до 1d)
+        не оказался наполовину из удаленных свечей.
+
+        Returns:
+            Dict: (тикер, таймфрейм) -> удалено свечей
+        """
+        now = now or datetime.now()
+        pruned = {}
+        for timeframe, days in self.policy.items():
+            cutoff = datetime.combine((now - timedelta(days=days)).date(), time.min)
+            for ticker in self.db.candle_tickers_before(timeframe, cutoff):
+                if self.archive:
+                    arrays = self.db.load_candle_arrays(
+                        ticker, timeframe, datetime.min, cutoff - timedelta(microseconds=1),
+                        include_archive=False,
+                    )
+                    self.db.archive.write(ticker, timeframe, arrays)
+                removed = self.db.prune_candles(ticker, timeframe, cutoff)
+                pruned[(ticker, timeframe)] = removed
+                logger.info(f"Хранение: {ticker} {timeframe} до {cutoff:%Y-%m-%d} - вытеснено {removed} свечей")
+        return pruned
+
+    def run(self, now: Optional[datetime] = None, force: bool = False) -> bool:
+        """
+        Вытеснение и обслуживание БД, не чаще раза в сутки и только в окне обслуживания
+
+        Args:
+            now: Текущее время (aware; по умолчанию - сейчас)
+            force: Выполнить вне окна и независимо от предыдущего запуска
+
+        Returns:
+            True, если обслуживание выполнено
+        """
+        now = now or datetime.now(MSK)
+        if not force:
+            if not self.in_window(now):
+                return False
+            if self.last_run is not None and self.last_run.date() == now.astimezone(MSK).date():
+                return False
+
+        started = datetime.now()
+        try:
+            pruned = self.compact(now.astimezone(MSK).replace(tzinfo=None))
+            self.db.optimize(vacuum=bool(pruned) or force)
+        except Exception as e:
+            logger.error(f"Ошибка обслуживания БД: {e}")
+            return False
+
+        self.last_run = now.astimezone(MSK)
+        logger.info(
+            f"Обслуживание БД завершено за {(datetime.now() - started).total_seconds():.1f} с, "
+            f"вытеснено свечей: {sum(pruned.values())}"
+        )
+        return True
@@ -0,0 +1,366 @@
+"""Потоковая агрегация ленты сделок MOEX в OHLCV-бары"""
+
+import copy
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.data_collection.candle_sync import TIMEFRAME_DELTAS
+from src.data_collection.database import DatabaseManager
+from src.data_collection.moex_api import MOEXDataCollector
+
+logger = logging.getLogger(__name__)
+
+BAR_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume']
+# Временные бары из сделок хранятся отдельной серией ('tr1h'), а не поверх свечей ISS ('1h')
+TRADE_BAR_PREFIX = 'tr'
+# Сдвиг времени тиковых/объемных баров, начавшихся в одну секунду (точность хранения DateTime)
+UNIQUE_TIME_STEP_NS = 1000
+
+
+class BarAggregator:
+    """
+    Базовый потоковый агрегатор сделок в бары
+
+    Сделки подаются порциями в update(); закрытые бары возвращаются сразу,
+    в памяти хранится только текущий формирующийся бар. Подклассы определяют
+    только правило разбиения сделок на бары (_assign).
+
+    Время бара - время его первой сделки. При unique_times оно строго
+    возрастает от бара к бару, чтобы ключ (тикер, таймфрейм, время) в
+    таблице candles был уникален.
+    """
+
+    timeframe: str = ''
+    unique_times: bool = False
+
+    def __init__(self):
+        self._bar: Optional[Dict] = None  # Формирующийся бар
+        self._last_time: Optional[int] = None  # Время последнего начатого бара (нс), при unique_times
+
+    def _assign(self, times: np.ndarray, quantities: np.ndarray) -> np.ndarray:
+        """Ключ бара (int64, неубывающий) для каждой сделки порции"""
+        raise NotImplementedError
+
+    def _is_complete(self, bar: Dict) -> bool:
+        """Закрыт ли последний бар порции без ожидания следующей сделки"""
+        return False
+
+    def update(self, times: np.ndarray, prices: np.ndarray, quantities: np.ndarray) -> pd.DataFrame:
+        """
+        Добавить порцию сделок (в хронологическом порядке)
+
+        Args:
+            times: Время сделок (datetime64)
+            prices: Цены
+            quantities: Объемы
+
+        Returns:
+            DataFrame закрытых баров (time, open, high, low, close, volume)
+        """
+        if not len(times):
+            return pd.DataFrame(columns=BAR_COLUMNS)
+
+        times = np.asarray(times, dtype='datetime64[ns]')
+        prices = np.asarray(prices, dtype='float64')
+        quantities = np.asarray(quantities, dtype='int64')
+
+        keys = self._assign(times, quantities)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)] - 1
+
+        bars = {
+            'key': keys[starts],
+            'time': times[starts],
+            'open': prices[starts],
+            'high': np.maximum.reduceat(prices, starts),
+            'low': np.minimum.reduceat(prices, starts),
+            'close': prices[ends],
+            'volume': np.add.reduceat(quantities, starts),
+            'ticks': np.diff(np.r_[starts, len(keys)]),
+        }
+
+        # Склейка первого бара порции с формирующимся баром прошлой порции
+        closed = []
+        continued = self._bar is not None and self._bar['key'] == bars['key'][0]
+        if self._bar is not None:
+            if continued:
+                bars['time'][0] = self._bar['time']
+                bars['open'][0] = self._bar['open']
+                bars['high'][0] = max(bars['high'][0], self._bar['high'])
+                bars['low'][0] = min(bars['low'][0], self._bar['low'])
+                bars['volume'][0] += self._bar['volume']
+                bars['ticks'][0] += self._bar['ticks']
+            else:
+                closed.append(self._bar)
+        if self.unique_times:
+            bars['time'] = self._unique_times(bars['time'], continued)
+
+        n = len(starts)
+        records = [{name: values[i] for name, values in bars.items()} for i in range(n)]
+
+        last = records[-1]
+        if self._is_complete(last):
+            closed.extend(records)
+            self._bar = None
+        else:
+            closed.extend(records[:-1])
+            self._bar = last
+
+        return self._to_frame(closed)
+
+    def _unique_times(self, times: np.ndarray, continued: bool) -> np.ndarray:
+        """
+        Строго возрастающее время баров порции
+
+        Время сделок ISS - с точностью до секунды, и несколько баров могут
+        начаться в одну секунду: бар сдвигается на UNIQUE_TIME_STEP_NS после
+        предыдущего, t'[i] = max(t[i], t'[i-1] + шаг) (накопленный максимум).
+        """
+        ns = times.astype('datetime64[ns]').view('int64')
+        # Продолженный бар уже имеет свое время; иначе опорой служит последний начатый бар
+        anchored = self._last_time is not None and not continued
+        if anchored:
+            ns = np.r_[self._last_time, ns]
+        steps = np.arange(len(ns), dtype='int64') * UNIQUE_TIME_STEP_NS
+        unique = np.maximum.accumulate(ns - steps) + steps
+        if anchored:
+            unique = unique[1:]
+        self._last_time = int(unique[-1])
+        return unique.view('datetime64[ns]')
+
+    def flush(self) -> pd.DataFrame:
+        """Закрыть и вернуть формирующийся бар (конец сессии / остановка)"""
+        bar, self._bar = self._bar, None
+        return self._to_frame([bar] if bar is not None else [])
+
+    @property
+    def current_bar(self) -> pd.DataFrame:
+        """Формирующийся бар (может еще измениться)"""
+        return self._to_frame([self._bar] if self._bar is not None else [])
+
+    @staticmethod
+    def _to_frame(records: List[Dict]) -> pd.DataFrame:
+        if not records:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        df = pd.DataFrame(records)
+        df['time'] = pd.to_datetime(df['time'])
+        df['volume'] = df['volume'].astype('int64')
+        return df[BAR_COLUMNS]
+
+
+class TimeBarAggregator(BarAggregator):
+    """
+    Бары фиксированной длительности ('1m', '5m', '1h', ...)
+
+    Сохраняются под таймфреймом с префиксом TRADE_BAR_PREFIX ('tr1h'): у свечей
+    ISS того же таймфрейма другие границы объема и задержка, и общая серия
+    перезаписывалась бы обоими источниками.
+    """
+
+    def __init__(self, timeframe: str):
+        super().__init__()
+        if timeframe not in TIMEFRAME_DELTAS:
+            raise ValueError(f"Неизвестный таймфрейм: {timeframe}")
+        self.timeframe = TRADE_BAR_PREFIX + timeframe
+        self._bar_ns = int(TIMEFRAME_DELTAS[timeframe].total_seconds() * 1e9)
+
+    def _assign(self, times: np.ndarray, quantities: np.ndarray) -> np.ndarray:
+        # Ключ - номер интервала с начала эпохи, время бара - его начало
+        return times.view('int64') // self._bar_ns
+
+    def update(self, times: np.ndarray, prices: np.ndarray, quantities: np.ndarray) -> pd.DataFrame:
+        closed = super().update(times, prices, quantities)
+        if not closed.empty:
+            closed['time'] = closed['time'].dt.floor(pd.Timedelta(self._bar_ns, unit='ns'))
+        return closed
+
+    def flush(self) -> pd.DataFrame:
+        return self._floor(super().flush())
+
+    @property
+    def current_bar(self) -> pd.DataFrame:
+        return self._floor(super().current_bar)
+
+    def close_until(self, now: datetime) -> pd.DataFrame:
+        """Закрыть формирующийся бар, если его интервал уже истек к моменту now"""
+        if self._bar is None:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        if np.datetime64(now, 'ns').astype('int64') // self._bar_ns > self._bar['key']:
+            return self.flush()
+        return pd.DataFrame(columns=BAR_COLUMNS)
+
+    def _floor(self, df: pd.DataFrame) -> pd.DataFrame:
+        if not df.empty:
+            df['time'] = df['time'].dt.floor(pd.Timedelta(self._bar_ns, unit='ns'))
+        return df
+
+
+class TickBarAggregator(BarAggregator):
+    """Бары из фиксированного числа сделок ('t500')"""
+
+    unique_times = True
+
+    def __init__(self, ticks: int):
+        super().__init__()
+        if ticks <= 0:
+            raise ValueError("Число сделок в баре должно быть положительным")
+        self.ticks = ticks
+        self.timeframe = f't{ticks}'
+        self._count = 0  # Сделок обработано всего
+
+    def _assign(self, times: np.ndarray, quantities: np.ndarray) -> np.ndarray:
+        keys = (self._count + np.arange(len(times), dtype='int64')) // self.ticks
+        self._count += len(times)
+        return keys
+
+    def _is_complete(self, bar: Dict) -> bool:
+        return self._count % self.ticks == 0
+
+
+class VolumeBarAggregator(BarAggregator):
+    """Бары фиксированного объема ('v100000'): сделка, добравшая объем, закрывает бар"""
+
+    unique_times = True
+
+    def __init__(self, volume: int):
+        super().__init__()
+        if volume <= 0:
+            raise ValueError("Объем бара должен быть положительным")
+        self.volume = volume
+        self.timeframe = f'v{volume}'
+        self._cum_volume = 0  # Накопленный объем всех сделок
+
+    def _assign(self, times: np.ndarray, quantities: np.ndarray) -> np.ndarray:
+        # Бар определяется объемом до сделки: сделка, перешедшая порог, остается в баре
+        cum = self._cum_volume + np.cumsum(quantities)
+        keys = (cum - quantities) // self.volume
+        self._cum_volume = int(cum[-1])
+        return keys
+
+    def _is_complete(self, bar: Dict) -> bool:
+        return self._cum_volume >= (int(bar['key']) + 1) * self.volume
+
+
+def make_aggregator(spec: str) -> BarAggregator:
+    """
+    Создать агрегатор по строке-спецификации
+
+    Args:
+        spec: '1m', '5m', '1h', ... - временные бары (таймфрейм 'tr1m', ...);
+            't500' - тиковые; 'v100000' - объемные
+    """
+    if spec in TIMEFRAME_DELTAS:
+        return TimeBarAggregator(spec)
+    if spec[:1] == 't' and spec[1:].isdigit():
+        return TickBarAggregator(int(spec[1:]))
+    if spec[:1] == 'v' and spec[1:].isdigit():
+        return VolumeBarAggregator(int(spec[1:]))
+    raise ValueError(f"Неизвестная спецификация бара: {spec}")
+
+
+class TradesIngestor:
+    """
+    Загрузка ленты сделок ISS с агрегацией в бары и сохранением в таблицу candles
+
+    Каждый poll() докачивает сделки после последнего обработанного номера,
+    прогоняет их через агрегаторы и сохраняет закрытые бары постранично, а в
+    конце - текущий формирующийся (save_candles делает upsert по времени,
+    поэтому бар обновляется на месте).
+    """
+
+    def __init__(
+        self,
+        collector: MOEXDataCollector,
+        db: DatabaseManager,
+        tickers: List[str],
+        bar_specs: Optional[List[str]] = None,
+        save_partial: bool = True
+    ):
+        """
+        Args:
+            collector: Коллектор MOEX
+            db: Менеджер БД
+            tickers: Тикеры для загрузки сделок
+            bar_specs: Какие бары строить (см. make_aggregator), по умолчанию 1m/5m/1h
+                (серии tr1m/tr5m/tr1h, отдельно от свечей ISS)
+            save_partial: Сохранять ли формирующийся бар после каждого poll()
+        """
+        self.collector = collector
+        self.db = db
+        self.bar_specs = bar_specs or ['1m', '5m', '1h']
+        self.save_partial = save_partial
+        self.last_tradeno: Dict[str, Optional[int]] = {}
+        self.aggregators: Dict[str, List[BarAggregator]] = {}
+        for ticker in tickers:
+            self.add_ticker(ticker)
+
+    def add_ticker(self, ticker: str) -> None:
+        """Начать загрузку сделок по тикеру"""
+        if ticker in self.aggregators:
+            return
+        self.aggregators[ticker] = [make_aggregator(spec) for spec in self.bar_specs]
+        self.last_tradeno[ticker] = None
+
+    def poll_ticker(self, ticker: str) -> int:
+        """
+        Обработать новые сделки по тикеру
+
+        Бары, закрытые страницей сделок, сохраняются сразу, и только после
+        этого номер последней сделки сдвигается. Если страница не загрузилась
+        или ее бары не сохранились, агрегаторы возвращаются к состоянию до нее,
+        и следующий poll() продолжает с этой же страницы.
+
+        Returns:
+            Количество обработанных сделок
+        """
+        processed = 0
+
+        for page in self.collector.iter_trades(ticker, since_tradeno=self.last_tradeno[ticker]):
+            aggregators = self.aggregators[ticker]
+            committed = copy.deepcopy(aggregators)
+            try:
+                for agg in aggregators:
+                    bars = agg.update(page['SYSTIME'], page['PRICE'], page['QUANTITY'])
+                    if not bars.empty:
+                        self.db.save_candles(bars, ticker, agg.timeframe)
+            except Exception:
+                self.aggregators[ticker] = committed
+                raise
+            self.last_tradeno[ticker] = int(page['TRADENO'][-1])
+            processed += len(page['TRADENO'])
+
+        if self.save_partial:
+            for agg in self.aggregators[ticker]:
+                partial = agg.current_bar
+                if not partial.empty:
+                    self.db.save_candles(partial, ticker, agg.timeframe)
+
+        return processed
+
+    def poll(self) -> Dict[str, int]:
+        """
+        Обработать новые сделки по всем тикерам
+
+        Returns:
+            Dict {ticker: количество обработанных сделок}
+        """
+        processed = {}
+        for ticker in self.aggregators:
+            try:
+                processed[ticker] = self.poll_ticker(ticker)
+            except Exception as e:
+                logger.warning(f"Ошибка загрузки сделок для {ticker}: {e}")
+                processed[ticker] = 0
+        return processed
+
+    def flush(self) -> None:
+        """Закрыть и сохранить все формирующиеся бары"""
+        for ticker, aggregators in self.aggregators.items():
+            for agg in aggregators:
+                bars = agg.flush()
+                if not bars.empty:
+                    self.db.save_candles(bars, ticker, agg.timeframe)
@@ -0,0 +1,268 @@
+"""Фоновая пакетная запись в БД (write-behind) для торгового цикла"""
+
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from src.data_collection.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+_FLUSH = 'flush'
+_STOP = 'stop'
+
+
+class WriteAck:
+    """Подтверждение записи: ждать можно через wait()"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.error: Optional[Exception] = None
+
+    def _set(self, error: Optional[Exception] = None) -> None:
+        self.error = error
+        self._event.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Дождаться записи
+
+        Returns:
+            True, если запись зафиксирована; False - таймаут или ошибка записи
+        """
+        return self._event.wait(timeout) and self.error is None
+
+
+class WriteBehindQueue:
+    """
+    Очередь записей в БД с фоновым писателем
+
+    Свечи, сделки и снимки портфеля принимаются в ограниченную очередь и
+    пишутся пачками в одной транзакции: при накоплении batch_size записей,
+    раз в flush_interval секунд и при остановке. Свечи одного (тикер, таймфрейм)
+    внутри пачки склеиваются в один upsert. Вызывающий поток не ждет диска;
+    исключение - сделки при durable_trades, которые подтверждаются только после
+    commit с синхронным сбросом на диск. Ошибка записи не теряет пачку: она
+    повторяется, а затем пишется по частям, и отклоняются только записи,
+    которые не удается записать по отдельности.
+    """
+
+    def __init__(
+        self,
+        db: DatabaseManager,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        durable_trades: bool = True,
+        trade_ack_timeout: float = 10.0,
+        retries: int = 2,
+        retry_delay: float = 0.1
+    ):
+        """
+        Args:
+            db: Менеджер БД
+            max_queue: Размер очереди (при заполнении отправитель ждет)
+            batch_size: Записей в пачке, после которого пачка пишется сразу
+            flush_interval: Максимальная задержка записи (секунды)
+            durable_trades: Сделки подтверждаются только после записи на диск
+            trade_ack_timeout: Сколько ждать подтверждения сделки (секунды)
+            retries: Повторов пачки при ошибке записи до разбиения по записям
+            retry_delay: Пауза перед первым повтором (секунды), далее удваивается
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durable_trades = durable_trades
+        self.trade_ack_timeout = trade_ack_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self.stats = {
+            'written': 0, 'batches': 0, 'errors': 0, 'rejected': 0, 'max_depth': 0, 'last_batch_seconds': 0.0
+        }
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        """Текущая глубина очереди"""
+        return self._queue.qsize()
+
+    def _put(self, item: Tuple) -> None:
+        if self._closed:
+            raise RuntimeError("Очередь записи закрыта")
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning(f"Очередь записи в БД заполнена ({self._queue.maxsize}), ожидание писателя")
+            self._queue.put(item)
+        self.stats['max_depth'] = max(self.stats['max_depth'], self._queue.qsize())
+
+    def save_candles(self, df: pd.DataFrame, ticker: str, timeframe: str) -> int:
+        """Поставить свечи в очередь (интерфейс DatabaseManager.save_candles)"""
+        if df.empty:
+            return 0
+        self._put(('candles', (df, ticker, timeframe), None))
+        return len(df)
+
+    def save_trade(self, trade_data: dict) -> WriteAck:
+        """
+        Поставить сделку в очередь
+
+        При durable_trades ждет фиксации сделки на диске (до trade_ack_timeout)
+        и бросает исключение, если запись не удалась.
+        """
+        ack = WriteAck()
+        self._put(('trade', dict(trade_data), ack))
+        if self.durable_trades:
+            if not ack.wait(self.trade_ack_timeout):
+                raise IOError(f"Сделка не записана в БД: {ack.error or 'таймаут'}")
+        return ack
+
+    def save_snapshot(self, total_value: float, cash: float, positions: Sequence[dict] = (),
+                      account: str = '', timestamp: Optional[datetime] = None) -> None:
+        """Поставить снимок портфеля в очередь (интерфейс DatabaseManager.save_snapshot)"""
+        self._put(('snapshot', {
+            'timestamp': timestamp or datetime.utcnow(),
+            'account': account,
+            'total_value': float(total_value),
+            'cash': float(cash),
+            'positions': [dict(pos) for pos in positions],
+        }, None))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Записать все, что уже в очереди, и дождаться записи"""
+        ack = WriteAck()
+        self._put((_FLUSH, None, ack))
+        return ack.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 30.0) -> None:
+        """Записать остаток очереди и остановить писателя"""
+        if self._closed:
+            return
+        self._queue.put((_STOP, None, None))
+        self._closed = True
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Писатель БД не завершился за {timeout} с, в очереди {self.depth} записей")
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Tuple] = []
+            flush_acks: List[WriteAck] = []
+            stop = False
+            deadline = None
+
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    kind, payload, ack = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if kind == _STOP:
+                    stop = True
+                    break
+                if kind == _FLUSH:
+                    flush_acks.append(ack)
+                    break
+                batch.append((kind, payload, ack))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                # Сделка с ожидающим подтверждением не ждет flush_interval
+                if kind == 'trade' and self.durable_trades:
+                    deadline = time.monotonic()
+
+            errors = self._write(batch) if batch else {}
+            for i, (_, _, ack) in enumerate(batch):
+                if ack is not None:
+                    ack._set(errors.get(i))
+            # flush подтверждается ошибкой, если хоть одна запись пачки отклонена
+            flush_error = next(iter(errors.values()), None)
+            for ack in flush_acks:
+                ack._set(flush_error)
+            if stop:
+                return
+
+    def _write(self, batch: List[Tuple]) -> Dict[int, Exception]:
+        """
+        Записать пачку
+
+        Пачка целиком повторяется до retries раз; если запись так и не
+        удалась, она делится по типам записей, а неудавшийся тип - по одной
+        записи, чтобы отклонить только записи, которые не пишутся сами по себе.
+
+        Returns:
+            Индекс записи в пачке -> ошибка для отклоненных записей
+        """
+        started = time.monotonic()
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            error = self._commit(batch, range(len(batch)))
+            if error is None:
+                self._written(len(batch), started)
+                return {}
+            logger.warning(f"Ошибка фоновой записи пачки из {len(batch)} записей (попытка {attempt + 1}): {error}")
+
+        errors: Dict[int, Exception] = {}
+        for kind in ('candles', 'trade', 'snapshot'):
+            indexes = [i for i, item in enumerate(batch) if item[0] == kind]
+            if not indexes:
+                continue
+            if self._commit(batch, indexes) is None:
+                self._written(len(indexes), started)
+                continue
+            for i in indexes:
+                error = self._commit(batch, [i])
+                if error is None:
+                    self._written(1, started)
+                else:
+                    logger.error(f"Запись отклонена ({kind}): {error}")
+                    errors[i] = error
+        self.stats['rejected'] += len(errors)
+        return errors
+
+    def _commit(self, batch: List[Tuple], indexes: Sequence[int]) -> Optional[Exception]:
+        """Записать записи пачки с индексами indexes одной транзакцией"""
+        # Склейка свечей одного (тикер, таймфрейм) в порядке поступления
+        candles: Dict[Tuple[str, str], List[pd.DataFrame]] = OrderedDict()
+        trades, snapshots = [], []
+        for i in indexes:
+            kind, payload, _ = batch[i]
+            if kind == 'candles':
+                df, ticker, timeframe = payload
+                candles.setdefault((ticker, timeframe), []).append(df)
+            elif kind == 'trade':
+                trades.append(payload)
+            else:
+                snapshots.append(payload)
+
+        merged = [
+            (frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True), ticker, timeframe)
+            for (ticker, timeframe), frames in candles.items()
+        ]
+
+        try:
+            self.db.write_batch(
+                candles=merged,
+                trades=trades,
+                snapshots=snapshots,
+                durable=bool(trades) and self.durable_trades
+            )
+        except Exception as e:
+            self.stats['errors'] += 1
+            return e
+        return None
+
+    def _written(self, count: int, started: float) -> None:
+        self.stats['written'] += count
+        self.stats['batches'] += 1
+        self.stats['last_batch_seconds'] = time.monotonic() - started
@@ -1 +1,511 @@
-﻿
+﻿"""Создание признаков для ML-моделей по свечам"""
+
+import logging
+import pickle
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.data_collection.panel import CandlePanel
+from src.ml_models.features import technical_indicators as ti
+from src.ml_models.features.parallel import SharedArrays, column_chunks, output, resolve_workers, run_chunks, shared_output
+
+logger = logging.getLogger(__name__)
+
+SMA_PERIODS = [5, 10, 20, 50, 100]
+LAG_PERIODS = [1, 2, 3, 5, 10]
+VOLATILITY_WINDOWS = [5, 10, 20, 50]
+MOMENTUM_PERIODS = [5, 10, 20]
+# Пересечение SMA - превышение больше относительного допуска: равные средние (флэт)
+# не должны давать 0/1 в зависимости от ошибки округления
+CROSS_TOLERANCE = 1e-9
+# Версия формул признаков: увеличивать при любом изменении расчета,
+# чтобы FeatureStore не отдавал признаки, посчитанные по-старому
+FEATURE_VERSION = 1
+
+# Порядок признаков моделей в data/models (без признаков тикера is_<TICKER>)
+FEATURE_NAMES = (
+    ['open', 'high', 'low', 'close', 'volume', 'value',
+     'returns', 'log_returns', 'high_low_ratio', 'close_open_ratio',
+     'candle_range', 'body_size', 'upper_shadow', 'lower_shadow',
+     'rsi', 'rsi_7', 'rsi_21', 'macd', 'macd_signal', 'macd_histogram',
+     'bb_upper', 'bb_middle', 'bb_lower', 'bb_width', 'bb_position',
+     'bb_breakout_upper', 'bb_breakout_lower', 'atr', 'stoch_k', 'stoch_d']
+    + [name for n in SMA_PERIODS for name in
+       [f'sma_{n}', f'ema_{n}', f'price_sma_{n}_ratio'] + ([f'sma_cross_{n}'] if n != 5 else [])]
+    + ['volume_ma', 'volume_ratio', 'volume_change', 'volume_on_up', 'volume_on_down']
+    + [f'{name}_lag_{n}' for n in LAG_PERIODS for name in ('close', 'returns', 'volume', 'rsi')]
+    + [f'volatility_{n}' for n in VOLATILITY_WINDOWS]
+    + ['volatility_change']
+    + [name for n in MOMENTUM_PERIODS for name in (f'momentum_{n}', f'roc_{n}')]
+    + ['hour', 'day_of_week', 'is_morning', 'is_afternoon', 'hammer', 'doji']
+)
+
+
+# Признаки, которые берутся из свечей как есть
+BASE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class _LazyFeatures(dict):
+    """
+    Признаки по требованию: обращение к отсутствующему признаку вызывает его
+    производителя из _PRODUCERS (зависимости подтягиваются так же)
+
+    Группа (RSI, EMA, Боллинджер...) считает за один проход все свои признаки
+    из wanted, а не только запрошенный. Промежуточные значения - ключи с '_'.
+    """
+
+    def __init__(self, base: Dict[str, np.ndarray], wanted: Sequence[str]):
+        super().__init__(base)
+        self.wanted = set(wanted)
+
+    def __missing__(self, name: str) -> np.ndarray:
+        producer = _PRODUCERS.get(name)
+        if producer is None:
+            raise KeyError(f"Неизвестный признак: {name}")
+        producer(self, name)
+        return dict.__getitem__(self, name)
+
+    def members(self, name: str, group: Sequence[str]) -> List[str]:
+        """Признаки группы, которые нужно посчитать сейчас: запрошенный и ожидаемые из wanted"""
+        return [member for member in group if member == name or (member in self.wanted and member not in self)]
+
+
+def _set(f: _LazyFeatures, names: Sequence[str], values: Sequence[np.ndarray]) -> None:
+    f.update(zip(names, values))
+
+
+def _rsi(f: _LazyFeatures, name: str) -> None:
+    periods = {'rsi': 14, 'rsi_7': 7, 'rsi_21': 21}
+    names = f.members(name, list(periods))
+    _set(f, names, ti.rsi_many(f['close'], [periods[member] for member in names]))
+
+
+def _ema(f: _LazyFeatures, name: str) -> None:
+    # Периоды EMA независимы в ema_many: подмножество дает те же числа
+    names = f.members(name, [f'ema_{n}' for n in SMA_PERIODS])
+    _set(f, names, ti.ema_many(f['close'], [int(member[4:]) for member in names]))
+
+
+def _bollinger(f: _LazyFeatures, name: str) -> None:
+    _set(f, ['bb_upper', 'bb_middle', 'bb_lower'], ti.bollinger(f['close'], 20, 2.0, prefix=f['_close_sums']))
+
+
+def _hour(f: _LazyFeatures) -> np.ndarray:
+    stamps = f['_times'].astype('datetime64[ns]')
+    return (stamps.astype('datetime64[h]') - stamps.astype('datetime64[D]')).astype('int64')
+
+
+def _day_of_week(f: _LazyFeatures) -> np.ndarray:
+    # 1970-01-01 - четверг; понедельник = 0, как dt.dayofweek
+    return ((f['_times'].astype('datetime64[ns]').astype('datetime64[D]').astype('int64') + 3) % 7).astype('float64')
+
+
+def _sma_cross(n: int) -> Callable[[_LazyFeatures], np.ndarray]:
+    return lambda f: (f['sma_5'] - f[f'sma_{n}'] > CROSS_TOLERANCE * np.abs(f[f'sma_{n}'])).astype('float64')
+
+
+def _build_producers() -> Dict[str, Callable[[_LazyFeatures, str], None]]:
+    """Признак -> производитель (f, имя); одиночные формулы оборачиваются в запись f[имя]"""
+    single: Dict[str, Callable[[_LazyFeatures], np.ndarray]] = {
+        # Оборот в рублях, если его нет в данных - оценка close * volume
+        'value': lambda f: f['close'] * f['volume'],
+        'returns': lambda f: ti.pct_change(f['close']),
+        'log_returns': lambda f: np.log(f['close'] / ti.shift(f['close'])),
+        'high_low_ratio': lambda f: f['high'] / f['low'],
+        'close_open_ratio': lambda f: f['close'] / f['open'],
+        'candle_range': lambda f: f['high'] - f['low'],
+        'body_size': lambda f: np.abs(f['close'] - f['open']),
+        'upper_shadow': lambda f: f['high'] - np.fmax(f['open'], f['close']),
+        'lower_shadow': lambda f: np.fmin(f['open'], f['close']) - f['low'],
+        # Префиксные суммы считаются один раз на все окна
+        '_close_sums': lambda f: ti.PrefixSums(f['close'], squares=True),
+        '_returns_sums': lambda f: ti.PrefixSums(f['returns'], squares=True),
+        'bb_width': lambda f: (f['bb_upper'] - f['bb_lower']) / f['bb_middle'],
+        'bb_position': lambda f: ti.bollinger_position(f['close'], f['bb_upper'], f['bb_lower']),
+        'bb_breakout_upper': lambda f: (f['close'] > f['bb_upper']).astype('float64'),
+        'bb_breakout_lower': lambda f: (f['close'] < f['bb_lower']).astype('float64'),
+        'atr': lambda f: ti.atr(f['high'], f['low'], f['close'], 14),
+        'volume_ma': lambda f: ti.rolling_mean(f['volume'], 20),
+        'volume_ratio': lambda f: f['volume'] / f['volume_ma'],
+        'volume_change': lambda f: ti.pct_change(f['volume']),
+        'volume_on_up': lambda f: f['volume'] * (f['returns'] > 0),
+        'volume_on_down': lambda f: f['volume'] * (f['returns'] < 0),
+        'volatility_change': lambda f: f['volatility_5'] / f['volatility_20'],
+        '_hour': _hour,
+        'hour': lambda f: f['_hour'].astype('float64'),
+        'day_of_week': _day_of_week,
+        'is_morning': lambda f: ((f['_hour'] >= 10) & (f['_hour'] < 14)).astype('float64'),
+        'is_afternoon': lambda f: ((f['_hour'] >= 14) & (f['_hour'] < 19)).astype('float64'),
+        'hammer': lambda f: ((f['lower_shadow'] > 2 * f['body_size']) & (f['upper_shadow'] < f['body_size'])).astype('float64'),
+        'doji': lambda f: (f['body_size'] <= 0.1 * f['candle_range']).astype('float64'),
+    }
+    for n in SMA_PERIODS:
+        single[f'sma_{n}'] = lambda f, n=n: f['_close_sums'].mean(n)
+        single[f'price_sma_{n}_ratio'] = lambda f, n=n: f['close'] / f[f'sma_{n}']
+        if n != 5:
+            single[f'sma_cross_{n}'] = _sma_cross(n)
+    for n in LAG_PERIODS:
+        for source in ('close', 'returns', 'volume', 'rsi'):
+            single[f'{source}_lag_{n}'] = lambda f, source=source, n=n: ti.shift(f[source], n)
+    for n in VOLATILITY_WINDOWS:
+        single[f'volatility_{n}'] = lambda f, n=n: f['_returns_sums'].std(n)
+    for n in MOMENTUM_PERIODS:
+        single[f'momentum_{n}'] = lambda f, n=n: ti.momentum(f['close'], n)
+        single[f'roc_{n}'] = lambda f, n=n: ti.roc(f['close'], n)
+
+    def store(formula: Callable[[_LazyFeatures], np.ndarray]) -> Callable[[_LazyFeatures, str], None]:
+        def produce(f: _LazyFeatures, name: str) -> None:
+            f[name] = formula(f)
+        return produce
+
+    producers = {name: store(formula) for name, formula in single.items()}
+    groups = {
+        ('rsi', 'rsi_7', 'rsi_21'): _rsi,
+        tuple(f'ema_{n}' for n in SMA_PERIODS): _ema,
+        ('bb_upper', 'bb_middle', 'bb_lower'): _bollinger,
+        ('macd', 'macd_signal', 'macd_histogram'):
+            lambda f, name: _set(f, ['macd', 'macd_signal', 'macd_histogram'], ti.macd(f['close'])),
+        ('stoch_k', 'stoch_d'):
+            lambda f, name: _set(f, ['stoch_k', 'stoch_d'], ti.stochastic(f['high'], f['low'], f['close'], 14, 3)),
+    }
+    for names, producer in groups.items():
+        producers.update((name, producer) for name in names)
+    return producers
+
+
+_PRODUCERS = _build_producers()
+
+class FeatureEngineer:
+    """
+    Признаки технического анализа для модели
+
+    Все индикаторы считаются векторно по панели (бары x тикеры): один проход
+    NumPy на весь набор тикеров, скользящие окна - через кумулятивные суммы.
+    create_features - обертка для одного тикера. При workers > 1 тикеры панели
+    делятся между процессами (см. create_panel_features).
+
+    Считаются только feature_names и их зависимости; from_model оставляет
+    признаки, которые использует бустер, а create_model_matrix отдает их
+    float32-матрицей в порядке столбцов модели.
+    """
+
+    def __init__(self, feature_names: Optional[List[str]] = None, workers: int = 1):
+        """
+        Args:
+            feature_names: Порядок колонок результата (по умолчанию FEATURE_NAMES)
+            workers: Процессов для панели (1 - в текущем процессе, 0 - по числу ядер)
+        """
+        self.feature_names = list(feature_names if feature_names is not None else FEATURE_NAMES)
+        self.workers = resolve_workers(workers)
+        # Столбцы модели (from_model): feature_names плюс is_<TICKER> и неиспользуемые бустером
+        self.model_features: Optional[List[str]] = None
+        # Столбцы is_<TICKER>, которые перечислены в модели и читаются бустером
+        self.ticker_flags: List[str] = []
+
+    @classmethod
+    def from_model(cls, artifact: Union[dict, str, Path], workers: int = 1) -> 'FeatureEngineer':
+        """
+        Признаки для загруженной модели: считаются только используемые бустером
+
+        Args:
+            artifact: Артефакт модели (dict с model и feature_names, как в data/models) или путь к .pkl
+
+        Столбцы is_<TICKER> не считаются: create_model_matrix заполняет их по тикеру,
+        и только если модель их перечисляет и бустер по ним делит. Признаки без
+        разбиений в деревьях пропускаются (в матрице - NaN, модель их не читает).
+        """
+        if not isinstance(artifact, dict):
+            with open(artifact, 'rb') as f:
+                artifact = pickle.load(f)
+        model_features = list(artifact['feature_names'])
+        unknown = [name for name in model_features if not is_ticker_flag(name) and name not in _PRODUCERS and name not in BASE_FIELDS]
+        if unknown:
+            raise ValueError(f"Модель использует неизвестные признаки: {unknown}")
+
+        used = model_used_features(artifact.get('model'), model_features)
+        selected = [name for name in model_features if used is None or name in used]
+        names = [name for name in selected if not is_ticker_flag(name)]
+        engineer = cls(names, workers)
+        engineer.model_features = model_features
+        engineer.ticker_flags = [name for name in selected if is_ticker_flag(name)]
+        logger.info(f"Признаки модели: считается {len(names)} из {len(model_features)}")
+        return engineer
+
+    def create_model_matrix(self, data: pd.DataFrame, ticker: Optional[str] = None) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+        """
+        Матрица признаков одного тикера для модели
+
+        Args:
+            data: Свечи (time, open, high, low, close, volume[, value])
+            ticker: Тикер для столбцов is_<TICKER>
+
+        Returns:
+            (время строк, непрерывная float32-матрица строки x model_features);
+            строки с пропусками в посчитанных признаках отброшены
+        """
+        columns = self.model_features or self.feature_names
+        if data.empty:
+            return pd.DatetimeIndex([], name='time'), np.empty((0, len(columns)), dtype='float32')
+        fields, stamps = self._single(data)
+        features = self.compute(fields, stamps)
+        valid = np.ones(len(stamps), dtype=bool)
+        for values in features.values():
+            valid &= np.isfinite(values[:, 0])
+
+        # Бустер XGBoost работает во float32 - меньшая точность на предсказание не влияет
+        matrix = np.full((int(valid.sum()), len(columns)), np.nan, dtype='float32')
+        for j, name in enumerate(columns):
+            if name in features:
+                matrix[:, j] = features.pop(name)[valid, 0]
+            elif name in self.ticker_flags:
+                matrix[:, j] = float(name == f'is_{ticker}')
+        index = pd.DatetimeIndex(stamps[valid, 0].astype('datetime64[ns]'), name='time')
+        return index, matrix
+
+    def _single(self, data: pd.DataFrame) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """Свечи одного тикера -> (поле -> столбец (бары x 1), время (бары x 1, int64 нс))"""
+        times = pd.to_datetime(data['time'] if 'time' in data.columns else data.index)
+        fields = {
+            name: data[name].to_numpy(dtype='float64')[:, None]
+            for name in ('open', 'high', 'low', 'close', 'volume', 'value')
+            if name in data.columns
+        }
+        return fields, np.asarray(times, dtype='datetime64[ns]').view('int64')[:, None]
+
+    @staticmethod
+    def pack_panel(panel: CandlePanel) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+        """
+        Панель на общей шкале времени -> плотные ряды тикеров
+
+        В каждом столбце бары тикера идут подряд с первой строки (индикаторы
+        считаются по барам тикера, а не по общей шкале); хвост короче самого
+        длинного ряда заполнен NaN.
+
+        Returns:
+            (поле -> массив (бары x тикеры), время (бары x тикеры, int64 нс), число баров тикера)
+        """
+        counts = panel.mask.sum(axis=0)
+        rows, cols = np.nonzero(panel.mask)
+        ranks = (np.cumsum(panel.mask, axis=0) - 1)[rows, cols]
+        shape = (int(counts.max()) if len(counts) else 0, len(panel.tickers))
+
+        fields = {}
+        for name, values in panel.fields.items():
+            packed = np.full(shape, np.nan)
+            packed[ranks, cols] = values[rows, cols]
+            fields[name] = packed
+        times = np.zeros(shape, dtype='int64')
+        times[ranks, cols] = panel.times.view('int64')[rows]
+        return fields, times, counts
+
+    def compute(
+        self, fields: Dict[str, np.ndarray], times: np.ndarray, names: Optional[Sequence[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Признаки по плотным рядам (см. pack_panel)
+
+        Считаются только names (по умолчанию feature_names) и то, от чего они
+        зависят: модели, использующей 20 признаков, не нужны остальные 70.
+
+        Args:
+            fields: open/high/low/close/volume (и value, если есть) - массивы (бары x тикеры)
+            times: Время баров (int64 нс), той же формы
+            names: Нужные признаки
+
+        Returns:
+            Dict: признак -> массив (бары x тикеры)
+        """
+        names = self.feature_names if names is None else names
+        base = {name: np.asarray(fields[name], dtype='float64') for name in BASE_FIELDS}
+        if 'value' in fields:
+            base['value'] = np.asarray(fields['value'], dtype='float64')
+        base['_times'] = times
+        f = _LazyFeatures(base, names)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {name: f[name] for name in names}
+
+    def _fill(self, features: Dict[str, np.ndarray], block: np.ndarray, invalid: np.ndarray) -> None:
+        """
+        Сложить признаки в блок (признак, бар, тикер) и отметить строки с пропусками
+
+        features расходуется: массив признака освобождается сразу после копирования.
+        """
+        for k, name in enumerate(self.feature_names):
+            block[k] = features.pop(name)
+            invalid |= ~np.isfinite(block[k])
+
+    def _frames(
+        self, parts: List[Tuple[int, np.ndarray, np.ndarray]], times: np.ndarray, tickers: List[str], counts: np.ndarray
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Признаки по тикерам: индекс - время, строки с пропусками отброшены
+
+        Args:
+            parts: (первый столбец, блок признак x бар x тикер, строки с пропусками)
+                для смежных групп тикеров
+
+        Кадр тикера - представление среза блока (pandas хранит колонки в той же
+        раскладке), без копирования по колонкам.
+        """
+        frames = {}
+        for lo, block, invalid in parts:
+            valid = ~invalid.T
+            for k in range(block.shape[2]):
+                j = lo + k
+                count = int(counts[j])
+                if not count:
+                    continue
+                rows = np.flatnonzero(valid[k, :count])
+                # Обычно пропуски только в начале (прогрев окон) - тогда срез, а не выборка
+                if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+                    rows = slice(rows[0], rows[-1] + 1)
+                frames[tickers[j]] = pd.DataFrame(
+                    block[:, rows, k].T,
+                    index=pd.DatetimeIndex(times[rows, j].astype('datetime64[ns]'), name='time'),
+                    columns=self.feature_names,
+                    copy=False,
+                )
+        return frames
+
+    def _compute_block(self, fields: Dict[str, np.ndarray], times: np.ndarray) -> List[Tuple[int, np.ndarray, np.ndarray]]:
+        """Признаки в текущем процессе: [(0, блок признак x бар x тикер, строки с пропусками)]"""
+        block = np.empty((len(self.feature_names),) + times.shape)
+        invalid = np.zeros(times.shape, dtype=bool)
+        self._fill(self.compute(fields, times), block, invalid)
+        return [(0, block, invalid)]
+
+    def _compute_parallel(
+        self, fields: Dict[str, np.ndarray], times: np.ndarray, counts: np.ndarray
+    ) -> List[Tuple[int, np.ndarray, np.ndarray]]:
+        """
+        То же, что _compute_block, в пуле процессов
+
+        Свечи лежат в shared_memory, выход предвыделен общим для воркеров
+        (shared_output): воркер получает только имена сегментов и диапазон
+        столбцов-тикеров и пишет признаки прямо в свой непрерывный участок
+        выхода, не задевая страниц соседей. Тикеры делятся по числу баров.
+        """
+        bars, width = times.shape
+        block = shared_output((len(self.feature_names) * bars * width,), 'float64')
+        invalid = shared_output((bars * width,), 'bool')
+        chunks = column_chunks(counts, self.workers)
+        layout = {name: (times.shape, 'float64') for name in fields}
+        layout['times'] = (times.shape, 'int64')
+        with SharedArrays(layout, sources=dict(fields, times=times)) as shared:
+            tasks = [(shared.specs, self.feature_names, list(fields), lo, hi) for lo, hi in chunks]
+            run_chunks(_compute_columns, tasks, self.workers, outputs={'block': block, 'invalid': invalid})
+        return [_chunk_views(block, invalid, len(self.feature_names), bars, lo, hi) for lo, hi in chunks]
+
+    def create_panel_features(self, panel: CandlePanel) -> Dict[str, pd.DataFrame]:
+        """
+        Признаки всех тикеров панели за один векторный проход
+
+        При workers > 1 тикеры делятся между процессами (см. _compute_parallel).
+
+        Returns:
+            Dict: тикер -> DataFrame признаков (как create_features); тикеры без баров пропускаются
+        """
+        if panel.empty:
+            return {}
+        fields, times, counts = self.pack_panel(panel)
+        if self.workers > 1 and len(panel.tickers) > 1:
+            parts = self._compute_parallel(fields, times, counts)
+        else:
+            parts = self._compute_block(fields, times)
+        return self._frames(parts, times, panel.tickers, counts)
+
+    def create_features(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Признаки одного тикера
+
+        Args:
+            data: Свечи (time, open, high, low, close, volume[, value])
+
+        Returns:
+            DataFrame признаков с индексом time, без строк с пропусками
+        """
+        if data.empty:
+            return pd.DataFrame(columns=self.feature_names)
+        fields, stamps = self._single(data)
+        parts = self._compute_block(fields, stamps)
+        return self._frames(parts, stamps, ['_'], np.array([len(data)]))['_']
+
+    def create_labels(self, data: pd.DataFrame, horizon: int = 5, threshold: float = 0.0) -> pd.Series:
+        """
+        Целевая переменная: рост цены за horizon баров больше threshold
+
+        Returns:
+            Series 0/1 с индексом time (последние horizon баров отброшены)
+        """
+        close = data.set_index('time')['close'] if 'time' in data.columns else data['close']
+        future_returns = close.shift(-horizon) / close - 1
+        return (future_returns[:-horizon] > threshold).astype(int) if horizon else (future_returns > threshold).astype(int)
+
+
+def is_ticker_flag(name: str) -> bool:
+    """Столбец-признак тикера is_<TICKER> (is_morning/is_afternoon - обычные признаки)"""
+    return name.startswith('is_') and name[3:].isupper() and name not in _PRODUCERS
+
+
+def ticker_flags(features: pd.DataFrame, ticker: str, tickers: Sequence[str]) -> pd.DataFrame:
+    """Признаки тикера со столбцами is_<TICKER> для всех tickers, добавленными одним блоком"""
+    flags = np.zeros((len(features), len(tickers)), dtype='int64')
+    if ticker in tickers:
+        flags[:, list(tickers).index(ticker)] = 1
+    return pd.concat(
+        [features, pd.DataFrame(flags, index=features.index, columns=[f'is_{t}' for t in tickers])], axis=1
+    )
+
+
+def model_used_features(model, feature_names: Sequence[str]) -> Optional[set]:
+    """
+    Признаки, по которым в деревьях бустера есть разбиения
+
+    Returns:
+        Множество имен из feature_names или None, если модель не дает этих сведений
+    """
+    try:
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        scores = booster.get_score(importance_type='weight')
+    except Exception as e:
+        logger.debug(f"Не удалось получить признаки бустера: {e}")
+        return None
+
+    used = set()
+    for key in scores:
+        if key in feature_names:
+            used.add(key)
+        elif key[:1] == 'f' and key[1:].isdigit() and int(key[1:]) < len(feature_names):
+            # Бустер без имен признаков: f<номер столбца>
+            used.add(feature_names[int(key[1:])])
+    return used
+
+def _chunk_views(
+    block: np.ndarray, invalid: np.ndarray, features: int, bars: int, lo: int, hi: int
+) -> Tuple[int, np.ndarray, np.ndarray]:
+    """Участок плоского выхода _compute_parallel для тикеров [lo, hi): (lo, блок, строки с пропусками)"""
+    return (
+        lo,
+        block[features * bars * lo:features * bars * hi].reshape(features, bars, hi - lo),
+        invalid[bars * lo:bars * hi].reshape(bars, hi - lo),
+    )
+
+
+def _compute_columns(specs: dict, feature_names: List[str], field_names: List[str], lo: int, hi: int) -> None:
+    """Воркер _compute_parallel: признаки тикеров [lo, hi) из shared_memory в свой участок выхода"""
+    arrays, segments = SharedArrays.attach(specs)
+    try:
+        engineer = FeatureEngineer(feature_names)
+        # Копии столбцов: расчет идет по непрерывным массивам, а не по срезам общей памяти
+        fields = {name: np.array(arrays[name][:, lo:hi]) for name in field_names}
+        times = np.array(arrays['times'][:, lo:hi])
+        _, block, invalid = _chunk_views(output('block'), output('invalid'), len(feature_names), len(times), lo, hi)
+        engineer._fill(engineer.compute(fields, times), block, invalid)
+    finally:
+        # Представления общей памяти должны исчезнуть до закрытия сегментов
+        arrays.clear()
+        for segment in segments:
+            segment.close()
@@ -0,0 +1,311 @@
+"""Хранилище рассчитанных признаков: пересчет только для новых баров"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.data_collection.candle_archive import datetime_to_ns
+from src.data_collection.panel import CandlePanel
+from src.ml_models.features import feature_engineering as fe
+from src.ml_models.features.parallel import SharedArrays, column_chunks, resolve_workers, run_chunks
+from src.ml_models.features.streaming_indicators import StreamingFeatureEngineer
+
+logger = logging.getLogger(__name__)
+
+
+def feature_set_hash(feature_names: Sequence[str]) -> str:
+    """Хэш определения набора признаков: список, параметры окон и версия формул"""
+    definition = {
+        'version': fe.FEATURE_VERSION,
+        'features': list(feature_names),
+        'sma': fe.SMA_PERIODS,
+        'lags': fe.LAG_PERIODS,
+        'volatility': fe.VOLATILITY_WINDOWS,
+        'momentum': fe.MOMENTUM_PERIODS,
+        'cross_tolerance': fe.CROSS_TOLERANCE,
+    }
+    return hashlib.sha1(json.dumps(definition, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class FeatureStore:
+    """
+    Признаки по сериям (тикер, таймфрейм) для набора признаков с хэшем feature_set_hash
+
+    Серия - <root>/<хэш>/<тикер>/<таймфрейм>/: time.i8 (время баров), values.f8
+    (строка признаков на бар, включая строки прогрева с NaN) и state.json -
+    число строк и состояние StreamingFeatureEngineer после всех баров, кроме
+    последнего. Последний бар мог быть сохранен еще формирующимся, поэтому его
+    строка предварительная и пересчитывается при следующем обновлении.
+
+    Обновление сверяет последний подтвержденный бар (время и close) со свечами
+    и дописывает признаки только для баров новее него; если бар изменился или
+    появилась более ранняя история - серия строится заново. Свечи, которые
+    кончаются раньше подтвержденного бара, ничего не меняют. Построение с нуля
+    идет векторным FeatureEngineer, потоковое состояние задается по той же
+    истории (StreamingFeatureEngineer.seed); по бару считаются только новые бары.
+    """
+
+    def __init__(
+        self, root: str = 'data/features', feature_names: Optional[Sequence[str]] = None, workers: int = 1
+    ):
+        """
+        Args:
+            root: Корневая директория хранилища
+            feature_names: Порядок признаков (по умолчанию FEATURE_NAMES)
+            workers: Процессов для обновления серий панели (0 - по числу ядер)
+        """
+        self.feature_names = list(feature_names or fe.FEATURE_NAMES)
+        self.workers = resolve_workers(workers)
+        self.key = feature_set_hash(self.feature_names)
+        self.base = Path(root)
+        self.root = self.base / self.key
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _series_lock(self, ticker: str, timeframe: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault((ticker, timeframe), threading.Lock())
+
+    def _series_dir(self, ticker: str, timeframe: str) -> Path:
+        return self.root / ticker / timeframe
+
+    def _read_state(self, path: Path) -> Optional[dict]:
+        try:
+            return json.loads((path / 'state.json').read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Хранилище признаков: поврежден {path / 'state.json'} ({e}), серия будет перестроена")
+            return None
+
+    def _read_rows(self, path: Path, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        width = len(self.feature_names)
+        times = np.fromfile(path / 'time.i8', dtype='int64', count=count)
+        values = np.fromfile(path / 'values.f8', dtype='float64', count=count * width).reshape(count, width)
+        return times, values
+
+    def _write_rows(self, path: Path, position: int, times: np.ndarray, values: np.ndarray) -> None:
+        """Записать строки с позиции position, отбросив прежний хвост"""
+        for name, array in (('time.i8', times), ('values.f8', values)):
+            file = path / name
+            row_size = array.itemsize * (array.shape[1] if array.ndim > 1 else 1)
+            with open(file, 'r+b' if file.exists() else 'wb') as f:
+                f.seek(position * row_size)
+                f.write(np.ascontiguousarray(array).tobytes())
+                f.truncate((position + len(array)) * row_size)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def update(self, ticker: str, timeframe: str, times: np.ndarray, fields: Dict[str, np.ndarray]) -> int:
+        """
+        Дописать признаки новых баров серии
+
+        Args:
+            times: Время баров по возрастанию (int64 нс или datetime64[ns])
+            fields: open/high/low/close/volume[/value] тех же баров
+
+        Returns:
+            Количество пересчитанных баров
+        """
+        times = np.asarray(times).view('int64')
+        if not len(times):
+            return 0
+
+        path = self._series_dir(ticker, timeframe)
+        with self._series_lock(ticker, timeframe):
+            state = self._read_state(path)
+            if _ends_before_committed(state, times):
+                return 0
+            engine = self._resume(state, times, fields)
+            if engine is None:
+                if state is not None:
+                    logger.info(f"Хранилище признаков: история {ticker} {timeframe} изменилась, серия строится заново")
+                position, first_time, new_times = 0, int(times[0]), times
+                values = self._batch_values(times, fields)
+                # Последний бар может еще формироваться: состояние фиксируется до него
+                engine = StreamingFeatureEngineer(self.feature_names)
+                engine.seed(times[:-1], {name: column[:-1] for name, column in fields.items()})
+                committed_state = engine.to_dict()
+                committed_close = float(fields['close'][-2]) if len(times) > 1 else None
+            else:
+                first_time, committed_close = state['first_time'], state['committed_close']
+                # Подтвержденные бары - строки [0, engine.bars); дальше пишутся новые
+                position = engine.bars
+                start = int(np.searchsorted(times, engine.last_time, side='right'))
+                columns = [name for name in ('open', 'high', 'low', 'close', 'volume', 'value') if name in fields]
+                new_times = times[start:]
+                values = np.empty((len(new_times), len(self.feature_names)))
+                committed_state = engine.to_dict()
+                for k, i in enumerate(range(start, len(times))):
+                    if k == len(new_times) - 1:
+                        committed_state = engine.to_dict()
+                        committed_close = float(fields['close'][i - 1])
+                    bar = {name: fields[name][i] for name in columns}
+                    bar['time'] = times[i]
+                    values[k] = engine.update(bar)
+
+            path.mkdir(parents=True, exist_ok=True)
+            self._write_rows(path, position, new_times, values)
+            _atomic_write(path / 'state.json', json.dumps({
+                'count': position + len(new_times),
+                'first_time': first_time,
+                'committed_close': committed_close,
+                'engine': committed_state,
+            }).encode())
+
+        logger.debug(f"Хранилище признаков: {ticker} {timeframe} пересчитано баров: {len(new_times)}")
+        return len(new_times)
+
+    def _batch_values(self, times: np.ndarray, fields: Dict[str, np.ndarray]) -> np.ndarray:
+        """Строки признаков всех баров (включая прогрев с NaN) векторным FeatureEngineer"""
+        columns = {name: np.asarray(values, dtype='float64')[:, None] for name, values in fields.items()}
+        features = fe.FeatureEngineer(self.feature_names).compute(columns, times[:, None])
+        values = np.empty((len(times), len(self.feature_names)))
+        for k, name in enumerate(self.feature_names):
+            values[:, k] = features.pop(name)[:, 0]
+        return values
+
+    def _resume(
+        self, state: Optional[dict], times: np.ndarray, fields: Dict[str, np.ndarray]
+    ) -> Optional[StreamingFeatureEngineer]:
+        """Состояние серии, если свечи продолжают сохраненную историю, иначе None"""
+        if state is None:
+            return None
+        committed = state['engine']['last_time']
+        if committed is None:
+            return None
+        i = int(np.searchsorted(times, committed))
+        if times[0] < state['first_time'] or i == len(times) or times[i] != committed:
+            return None
+        if float(fields['close'][i]) != state['committed_close']:
+            return None
+        return StreamingFeatureEngineer.from_dict(state['engine'])
+
+    def load(
+        self,
+        ticker: str,
+        timeframe: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> pd.DataFrame:
+        """
+        Признаки серии (как FeatureEngineer.create_features): индекс time,
+        строки с пропусками (прогрев окон) отброшены
+        """
+        path = self._series_dir(ticker, timeframe)
+        with self._series_lock(ticker, timeframe):
+            state = self._read_state(path)
+            count = state['count'] if state else 0
+            times, values = self._read_rows(path, count) if count else (
+                np.empty(0, dtype='int64'), np.empty((0, len(self.feature_names)))
+            )
+
+        lo = int(np.searchsorted(times, datetime_to_ns(start_date), side='left')) if start_date else 0
+        hi = int(np.searchsorted(times, datetime_to_ns(end_date), side='right')) if end_date else len(times)
+        times, values = times[lo:hi], values[lo:hi]
+        valid = np.isfinite(values).all(axis=1)
+        return pd.DataFrame(
+            values[valid],
+            index=pd.DatetimeIndex(times[valid].astype('datetime64[ns]'), name='time'),
+            columns=self.feature_names,
+            copy=False,
+        )
+
+    def panel_features(self, panel: CandlePanel, timeframe: str) -> Dict[str, pd.DataFrame]:
+        """
+        Признаки всех тикеров панели (замена FeatureEngineer.create_panel_features)
+
+        Серии сначала догоняют свечи панели (при workers > 1 - в пуле
+        процессов), затем читаются за ее диапазон.
+
+        Returns:
+            Dict: тикер -> DataFrame признаков; тикеры без баров пропускаются
+        """
+        if panel.empty:
+            return {}
+        present = panel.mask.any(axis=0)
+        if self.workers > 1 and present.sum() > 1:
+            self._update_parallel(panel, timeframe)
+        else:
+            for j, ticker in enumerate(panel.tickers):
+                rows = panel.mask[:, j]
+                if present[j]:
+                    self.update(
+                        ticker,
+                        timeframe,
+                        panel.times[rows],
+                        {name: values[rows, j] for name, values in panel.fields.items()},
+                    )
+
+        start = pd.Timestamp(panel.times[0]).to_pydatetime()
+        end = pd.Timestamp(panel.times[-1]).to_pydatetime()
+        return {
+            ticker: self.load(ticker, timeframe, start, end)
+            for j, ticker in enumerate(panel.tickers)
+            if present[j]
+        }
+
+    def _update_parallel(self, panel: CandlePanel, timeframe: str) -> None:
+        """
+        Обновить серии панели в пуле процессов
+
+        Плотные ряды тикеров (FeatureEngineer.pack_panel) кладутся в общую
+        память; воркер получает имена сегментов и диапазон тикеров, а признаки
+        пишет в файлы своих серий - обратно ничего не передается.
+        """
+        fields, times, counts = fe.FeatureEngineer.pack_panel(panel)
+        layout = {name: (times.shape, 'float64') for name in fields}
+        layout['times'] = (times.shape, 'int64')
+        with SharedArrays(layout, sources=dict(fields, times=times)) as shared:
+            tasks = [
+                (shared.specs, str(self.base), self.feature_names, timeframe, panel.tickers[lo:hi], lo, counts[lo:hi].tolist())
+                for lo, hi in column_chunks(counts, self.workers)
+            ]
+            run_chunks(_update_columns, tasks, self.workers)
+
+
+def _ends_before_committed(state: Optional[dict], times: np.ndarray) -> bool:
+    """Свечи - часть сохраненной истории, не доходящая до подтвержденного бара (новых баров нет)"""
+    committed = state['engine']['last_time'] if state is not None else None
+    return committed is not None and times[0] >= state['first_time'] and times[-1] < committed
+
+
+def _update_columns(
+    specs: dict, root: str, feature_names: List[str], timeframe: str, tickers: List[str], lo: int, counts: List[int]
+) -> None:
+    """Воркер FeatureStore._update_parallel: обновить серии тикеров со столбцов lo.. общей памяти"""
+    arrays, segments = SharedArrays.attach(specs)
+    try:
+        store = FeatureStore(root, feature_names)
+        for k, (ticker, count) in enumerate(zip(tickers, counts)):
+            if not count:
+                continue
+            column = lo + k
+            store.update(
+                ticker,
+                timeframe,
+                np.array(arrays['times'][:count, column]),
+                {name: np.array(values[:count, column]) for name, values in arrays.items() if name != 'times'},
+            )
+    finally:
+        # Представления общей памяти должны исчезнуть до закрытия сегментов
+        arrays.clear()
+        for segment in segments:
+            segment.close()
@@ -0,0 +1,147 @@
+"""Расчет признаков в нескольких процессах над массивами в общей памяти"""
+
+import logging
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Выходные массивы наследуются воркерами при fork (см. shared_output)
+PARALLEL_AVAILABLE = 'fork' in multiprocessing.get_all_start_methods()
+
+# Описание массива в общей памяти: (имя сегмента, форма, dtype) - передается воркерам вместо данных
+ArraySpec = Tuple[str, Tuple[int, ...], str]
+
+# Выходные массивы текущего run_chunks: воркеры получают их копией словаря при fork
+_outputs: Dict[str, np.ndarray] = {}
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """Число процессов: 0 или None - по числу ядер; без fork (Windows) - всегда 1"""
+    workers = max(1, workers or os.cpu_count() or 1)
+    if workers > 1 and not PARALLEL_AVAILABLE:
+        logger.warning("Параллельный расчет признаков требует fork, используется один процесс")
+        return 1
+    return workers
+
+
+def shared_output(shape: Tuple[int, ...], dtype: str) -> np.ndarray:
+    """
+    Предвыделенный выходной массив, общий с воркерами run_chunks
+
+    Анонимное отображение MAP_SHARED: воркеры, порожденные fork, пишут в те же
+    страницы. Массив сам владеет отображением, поэтому результат используется
+    без копирования и освобождается вместе с последним представлением
+    (сегмент shared_memory нельзя закрыть, пока на него есть ссылки).
+    """
+    size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+    return np.frombuffer(mmap.mmap(-1, size), dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+
+def output(name: str) -> np.ndarray:
+    """Выходной массив run_chunks в процессе-воркере"""
+    return _outputs[name]
+
+
+class SharedArrays:
+    """
+    Набор numpy-массивов в multiprocessing.shared_memory
+
+    Создается в родительском процессе (с копированием исходных данных или
+    нулями), воркеры подключаются по specs через attach() и пишут/читают без
+    сериализации. close() освобождает сегменты; массивы после этого недоступны.
+    """
+
+    def __init__(self, arrays: Dict[str, Tuple[Tuple[int, ...], str]], sources: Optional[Dict[str, np.ndarray]] = None):
+        """
+        Args:
+            arrays: Имя -> (форма, dtype)
+            sources: Имя -> данные для начального заполнения (остальные массивы - нули)
+        """
+        self._segments: List[shared_memory.SharedMemory] = []
+        self.specs: Dict[str, ArraySpec] = {}
+        self.arrays: Dict[str, np.ndarray] = {}
+        sources = sources or {}
+        try:
+            for name, (shape, dtype) in arrays.items():
+                size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+                segment = shared_memory.SharedMemory(create=True, size=size)
+                self._segments.append(segment)
+                # Новый сегмент уже заполнен нулями
+                array = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+                if name in sources:
+                    array[...] = sources[name]
+                self.specs[name] = (segment.name, tuple(shape), np.dtype(dtype).str)
+                self.arrays[name] = array
+        except Exception:
+            self.close()
+            raise
+
+    @staticmethod
+    def attach(specs: Dict[str, ArraySpec]) -> Tuple[Dict[str, np.ndarray], List[shared_memory.SharedMemory]]:
+        """
+        Подключиться к массивам в процессе-воркере
+
+        Returns:
+            (имя -> массив, сегменты для close() по окончании работы)
+        """
+        segments, arrays = [], {}
+        for name, (segment_name, shape, dtype) in specs.items():
+            segment = shared_memory.SharedMemory(name=segment_name)
+            segments.append(segment)
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+        return arrays, segments
+
+    def close(self) -> None:
+        self.arrays.clear()
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = []
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def column_chunks(counts: Sequence[int], parts: int) -> List[Tuple[int, int]]:
+    """
+    Разбить столбцы (тикеры) на до parts смежных диапазонов [lo, hi)
+    с примерно равным числом баров
+    """
+    counts = np.asarray(counts, dtype='int64')
+    if not len(counts):
+        return []
+    parts = min(parts, len(counts))
+    bounds = np.searchsorted(np.cumsum(counts), np.arange(1, parts) * counts.sum() / parts, side='right')
+    edges = np.unique(np.r_[0, np.clip(bounds, 1, len(counts) - 1), len(counts)])
+    return [(int(lo), int(hi)) for lo, hi in zip(edges[:-1], edges[1:])]
+
+
+def run_chunks(
+    func: Callable, tasks: Sequence[tuple], workers: int, outputs: Optional[Dict[str, np.ndarray]] = None
+) -> None:
+    """
+    Выполнить func(*task) для каждой задачи в пуле процессов (fork)
+
+    Задачи - только описания (specs, границы столбцов), результаты воркеры
+    пишут в outputs (shared_output, доступны через output(name)) или на диск,
+    поэтому обратно ничего не передается.
+    """
+    _outputs.update(outputs or {})
+    try:
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context) as executor:
+            futures = [executor.submit(func, *task) for task in tasks]
+            for future in futures:
+                future.result()
+    finally:
+        _outputs.clear()
@@ -0,0 +1,621 @@
+"""Потоковые индикаторы: обновление за O(1) на новый бар, состояние сериализуемо"""
+
+import logging
+import math
+from collections import deque
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.ml_models.features import technical_indicators as ti
+from src.ml_models.features.feature_engineering import (
+    CROSS_TOLERANCE, FEATURE_NAMES, LAG_PERIODS, MOMENTUM_PERIODS, SMA_PERIODS, VOLATILITY_WINDOWS
+)
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+
+# Каждый индикатор дает те же числа, что одноименная функция technical_indicators
+# на том же ряду с его начала: те же формулы, окно заполнено, только если все
+# значения в нем непустые, NaN на входе - пропуск бара (EMA после пропуска
+# начинается заново, среднее Уайлдера его пропускает, как ti.wilder_mean).
+
+
+def _last(x: np.ndarray) -> float:
+    return float(x[-1]) if len(x) else NAN
+
+
+def _div(a: float, b: float) -> float:
+    """Деление с семантикой NumPy (x/0 -> ±inf, 0/0 -> NaN), как в пакетных функциях"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return float(np.float64(a) / np.float64(b))
+
+
+class StreamingIndicator:
+    """
+    База потоковых индикаторов
+
+    update(...) принимает значения нового бара и возвращает текущее значение
+    индикатора (NaN, пока окно не заполнено). seed(...) новому индикатору
+    задает состояние после всей истории за один векторный проход (рекурсии -
+    функциями technical_indicators, окна - прогоном только последнего окна).
+    Состояние - только числа и списки: to_dict() / indicator_from_dict() для
+    сохранения между запусками.
+    """
+
+    def seed(self, *series: np.ndarray) -> 'StreamingIndicator':
+        """Состояние как после update по всем значениям рядов (только для нового индикатора)"""
+        for values in zip(*(np.asarray(x, dtype='float64').tolist() for x in series)):
+            self.update(*values)
+        return self
+
+    def to_dict(self) -> dict:
+        """Состояние индикатора (JSON-совместимое)"""
+        state = {}
+        for name, value in self.__dict__.items():
+            if isinstance(value, StreamingIndicator):
+                value = value.to_dict()
+            elif isinstance(value, (deque, list)):
+                # Копия: снимок не должен меняться при следующих update
+                value = list(value)
+            state[name] = value
+        return {'type': type(self).__name__, 'state': state}
+
+    @classmethod
+    def _from_state(cls, state: dict) -> 'StreamingIndicator':
+        indicator = cls.__new__(cls)
+        for name, value in state.items():
+            if isinstance(value, dict) and 'type' in value and 'state' in value:
+                value = indicator_from_dict(value)
+            indicator.__dict__[name] = value
+        indicator._restore()
+        return indicator
+
+    def _restore(self) -> None:
+        """Восстановить не-JSON поля (deque) после загрузки состояния"""
+
+
+class EMA(StreamingIndicator):
+    """Экспоненциальное среднее (ti.ema): пропуск дает NaN, ряд начинается заново со следующего значения"""
+
+    def __init__(self, span: Optional[int] = None, alpha: Optional[float] = None):
+        self.alpha = alpha if alpha is not None else 2.0 / (span + 1)
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        if math.isnan(x):
+            self.value = NAN
+            return NAN
+        self.value = x if math.isnan(self.value) else self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+    def seed(self, x: np.ndarray) -> 'EMA':
+        self.value = _last(ti.ema(x, alpha=self.alpha))
+        return self
+
+
+class WilderMean(StreamingIndicator):
+    """Сглаживание Уайлдера (ti.wilder_mean): среднее первых period значений, затем рекурсия"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.seen = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        if math.isnan(x):
+            return self.value
+        self.seen += 1
+        if self.seen < self.period:
+            self.total += x
+        elif self.seen == self.period:
+            self.value = (self.total + x) / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + x) / self.period
+        return self.value
+
+    def seed(self, x: np.ndarray) -> 'WilderMean':
+        x = np.asarray(x, dtype='float64')
+        valid = x[~np.isnan(x)]
+        self.seen = len(valid)
+        # Сумма первых period - 1 значений - тем же порядком сложения, что в update
+        for value in valid[:self.period - 1].tolist():
+            self.total += value
+        self.value = _last(ti.wilder_mean(x, self.period)) if self.seen >= self.period else NAN
+        return self
+
+
+class RollingWindow(StreamingIndicator):
+    """
+    Скользящее окно со средним, суммой и std (ti.PrefixSums)
+
+    Суммы ведутся относительно первого непустого значения, как в пакетном
+    расчете, и раз в window баров пересчитываются по буферу заново, чтобы
+    ошибка округления не накапливалась (в среднем O(1) на бар).
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buffer = [NAN] * window
+        self.position = 0
+        self.valid = 0
+        self.offset = NAN
+        self.sum = 0.0
+        self.squares = 0.0
+
+    def update(self, x: float) -> 'RollingWindow':
+        old = self.buffer[self.position]
+        if not math.isnan(old):
+            self.sum -= old - self.offset
+            self.squares -= (old - self.offset) ** 2
+            self.valid -= 1
+        if not math.isnan(x):
+            if math.isnan(self.offset):
+                self.offset = x
+            self.sum += x - self.offset
+            self.squares += (x - self.offset) ** 2
+            self.valid += 1
+        self.buffer[self.position] = x
+        self.position = (self.position + 1) % self.window
+        if self.position == 0:
+            self._resync()
+        return self
+
+    def seed(self, x: np.ndarray) -> 'RollingWindow':
+        x = np.asarray(x, dtype='float64')
+        valid = x[~np.isnan(x)]
+        # Сдвиг сумм - первое непустое значение всего ряда, в окно входят только последние значения
+        self.offset = float(valid[0]) if len(valid) else NAN
+        for value in x[-self.window:].tolist():
+            RollingWindow.update(self, value)
+        return self
+
+    def _resync(self) -> None:
+        values = [value - self.offset for value in self.buffer if not math.isnan(value)]
+        self.sum = math.fsum(values)
+        self.squares = math.fsum(value * value for value in values)
+
+    @property
+    def full(self) -> bool:
+        return self.valid == self.window
+
+    def mean(self) -> float:
+        return self.sum / self.window + self.offset if self.full else NAN
+
+    def total(self) -> float:
+        return self.sum + self.window * self.offset if self.full else NAN
+
+    def std(self, ddof: int = 1) -> float:
+        if not self.full:
+            return NAN
+        variance = (self.squares - self.sum * self.sum / self.window) / (self.window - ddof)
+        return math.sqrt(max(variance, 0.0))
+
+
+class RollingMean(RollingWindow):
+    """Скользящее среднее (ti.rolling_mean)"""
+
+    def update(self, x: float) -> float:
+        return super().update(x).mean()
+
+
+class RollingStd(RollingWindow):
+    """Скользящее стандартное отклонение (ti.rolling_std, ddof=1)"""
+
+    def update(self, x: float) -> float:
+        return super().update(x).std()
+
+
+class RollingExtremum(StreamingIndicator):
+    """Скользящий минимум или максимум (ti.rolling_min / rolling_max) на монотонной очереди"""
+
+    def __init__(self, window: int, kind: str = 'min'):
+        self.window = window
+        self.kind = kind
+        self.index = -1
+        self.last_nan = -window  # Индекс последнего NaN: окно с ним дает NaN
+        self.queue = deque()     # (индекс, значение), значения монотонны
+
+    def _restore(self) -> None:
+        self.queue = deque(tuple(item) for item in self.queue)
+
+    def update(self, x: float) -> float:
+        self.index += 1
+        if math.isnan(x):
+            self.last_nan = self.index
+        else:
+            better = (lambda old: old >= x) if self.kind == 'min' else (lambda old: old <= x)
+            while self.queue and better(self.queue[-1][1]):
+                self.queue.pop()
+            self.queue.append((self.index, x))
+        while self.queue and self.queue[0][0] <= self.index - self.window:
+            self.queue.popleft()
+        if self.index < self.window - 1 or self.last_nan > self.index - self.window or not self.queue:
+            return NAN
+        return self.queue[0][1]
+
+    def seed(self, x: np.ndarray) -> 'RollingExtremum':
+        x = np.asarray(x, dtype='float64')
+        start = max(len(x) - self.window, 0)
+        self.index = start - 1
+        for value in x[start:].tolist():
+            self.update(value)
+        return self
+
+
+class Lag(StreamingIndicator):
+    """Значение periods баров назад (ti.shift)"""
+
+    def __init__(self, periods: int):
+        self.periods = periods
+        self.history = deque(maxlen=periods + 1)
+
+    def _restore(self) -> None:
+        self.history = deque(self.history, maxlen=self.periods + 1)
+
+    def update(self, x: float) -> float:
+        self.history.append(x)
+        return self.history[0] if len(self.history) == self.periods + 1 else NAN
+
+    def seed(self, x: np.ndarray) -> 'Lag':
+        self.history.extend(np.asarray(x, dtype='float64')[-(self.periods + 1):].tolist())
+        return self
+
+
+class RSI(StreamingIndicator):
+    """RSI по средним приростам и падениям за period баров (ti.rsi)"""
+
+    def __init__(self, period: int = 14, wilder: bool = False):
+        """
+        Args:
+            period: Период
+            wilder: Сглаживание Уайлдера (ti.rsi_wilder) вместо скользящего среднего
+        """
+        self.previous = NAN
+        self.gains = WilderMean(period) if wilder else RollingMean(period)
+        self.losses = WilderMean(period) if wilder else RollingMean(period)
+        # Число приростов и падений в окне (как в ti.rsi_many): окно без падений - ровно 0
+        self.rises = None if wilder else RollingWindow(period)
+        self.falls = None if wilder else RollingWindow(period)
+
+    def update(self, close: float) -> float:
+        delta = close - self.previous
+        self.previous = close
+        up = self.gains.update(max(delta, 0.0) if not math.isnan(delta) else NAN)
+        down = self.losses.update(max(-delta, 0.0) if not math.isnan(delta) else NAN)
+        if self.rises is not None:
+            moved = not math.isnan(delta)
+            if self.rises.update(float(delta > 0) if moved else NAN).total() == 0:
+                up = 0.0
+            if self.falls.update(float(delta < 0) if moved else NAN).total() == 0:
+                down = 0.0
+        if down == 0:
+            return 100.0 if up > 0 else 50.0 if up == 0 else NAN
+        return 100 - 100 / (1 + _div(up, down))
+
+    def seed(self, close: np.ndarray) -> 'RSI':
+        close = np.asarray(close, dtype='float64')
+        delta = close - ti.shift(close)
+        moved = ~np.isnan(delta)
+        self.previous = _last(close)
+        self.gains.seed(np.where(moved, np.maximum(delta, 0.0), NAN))
+        self.losses.seed(np.where(moved, np.maximum(-delta, 0.0), NAN))
+        if self.rises is not None:
+            self.rises.seed(np.where(moved, delta > 0, NAN))
+            self.falls.seed(np.where(moved, delta < 0, NAN))
+        return self
+
+
+class MACD(StreamingIndicator):
+    """MACD (ti.macd): update возвращает (линия, сигнальная линия, гистограмма)"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        line = self.fast.update(close) - self.slow.update(close)
+        signal = self.signal.update(line)
+        return line, signal, line - signal
+
+    def seed(self, close: np.ndarray) -> 'MACD':
+        fast, slow = ti.ema_many(close, alphas=[self.fast.alpha, self.slow.alpha])
+        self.fast.value, self.slow.value = _last(fast), _last(slow)
+        self.signal.seed(fast - slow)
+        return self
+
+
+class ATR(StreamingIndicator):
+    """Средний истинный диапазон (ti.atr)"""
+
+    def __init__(self, period: int = 14):
+        self.previous_close = NAN
+        self.ranges = RollingMean(period)
+
+    def update(self, high: float, low: float, close: float) -> float:
+        true_range = float(np.fmax(high - low, np.fmax(abs(high - self.previous_close), abs(low - self.previous_close))))
+        self.previous_close = close
+        return self.ranges.update(true_range)
+
+    def seed(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> 'ATR':
+        self.previous_close = _last(np.asarray(close, dtype='float64'))
+        self.ranges.seed(ti.true_range(high, low, close))
+        return self
+
+
+class Bollinger(StreamingIndicator):
+    """Полосы Боллинджера (ti.bollinger): update возвращает (верхняя, средняя, нижняя)"""
+
+    def __init__(self, period: int = 20, k: float = 2.0):
+        self.k = k
+        self.window = RollingWindow(period)
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        self.window.update(close)
+        middle = self.window.mean()
+        width = self.k * self.window.std()
+        return middle + width, middle, middle - width
+
+    def seed(self, close: np.ndarray) -> 'Bollinger':
+        self.window.seed(close)
+        return self
+
+
+class Stochastic(StreamingIndicator):
+    """Стохастик (ti.stochastic): update возвращает (%K, %D)"""
+
+    def __init__(self, k_period: int = 14, d_period: int = 3):
+        self.lowest = RollingExtremum(k_period, 'min')
+        self.highest = RollingExtremum(k_period, 'max')
+        self.d = RollingMean(d_period)
+
+    def update(self, high: float, low: float, close: float) -> Tuple[float, float]:
+        lowest = self.lowest.update(low)
+        highest = self.highest.update(high)
+        k = 100 * _div(close - lowest, highest - lowest)
+        return k, self.d.update(k)
+
+    def seed(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> 'Stochastic':
+        self.lowest.seed(low)
+        self.highest.seed(high)
+        self.d.seed(ti.stochastic(high, low, close, self.lowest.window, self.d.window)[0])
+        return self
+
+
+INDICATORS = {
+    cls.__name__: cls
+    for cls in (EMA, WilderMean, RollingWindow, RollingMean, RollingStd, RollingExtremum,
+                Lag, RSI, MACD, ATR, Bollinger, Stochastic)
+}
+
+
+def indicator_from_dict(data: dict) -> StreamingIndicator:
+    """Восстановить индикатор из to_dict()"""
+    return INDICATORS[data['type']]._from_state(data['state'])
+
+
+class StreamingFeatureEngineer:
+    """
+    Признаки FeatureEngineer для одного тикера с обновлением за O(1) на бар
+
+    update(bar) возвращает вектор признаков последнего бара в порядке
+    feature_names - те же числа, что FeatureEngineer.create_features на той же
+    истории. Состояние сохраняется через to_dict() / from_dict().
+    """
+
+    def __init__(self, feature_names: Optional[Sequence[str]] = None):
+        """
+        Args:
+            feature_names: Порядок признаков результата (по умолчанию FEATURE_NAMES)
+        """
+        self.feature_names = list(feature_names or FEATURE_NAMES)
+        self.bars = 0
+        self.last_time: Optional[int] = None
+        self.previous = {'close': NAN, 'volume': NAN}
+        self.rsi = {period: RSI(period) for period in (14, 7, 21)}
+        self.macd = MACD()
+        self.bollinger = Bollinger(20, 2.0)
+        self.atr = ATR(14)
+        self.stochastic = Stochastic(14, 3)
+        self.sma = {n: RollingMean(n) for n in SMA_PERIODS}
+        self.ema = {n: EMA(n) for n in SMA_PERIODS}
+        self.volume_ma = RollingMean(20)
+        self.lags = {(name, n): Lag(n) for n in LAG_PERIODS for name in ('close', 'returns', 'volume', 'rsi')}
+        self.volatility = {n: RollingStd(n) for n in VOLATILITY_WINDOWS}
+        self.momentum = {n: Lag(n) for n in MOMENTUM_PERIODS}
+
+    def update(self, bar: dict) -> np.ndarray:
+        """
+        Учесть новый бар
+
+        Args:
+            bar: time, open, high, low, close, volume[, value]
+
+        Returns:
+            Признаки бара (float64, порядок feature_names); NaN - окно еще не заполнено
+        """
+        f = self._compute(bar)
+        return np.array([f[name] for name in self.feature_names], dtype='float64')
+
+    def _compute(self, bar: dict) -> Dict[str, float]:
+        open_, high, low, close = (float(bar[name]) for name in ('open', 'high', 'low', 'close'))
+        volume = float(bar['volume'])
+        time = pd.Timestamp(bar['time'])
+        self.bars += 1
+        self.last_time = time.value
+
+        f = {'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}
+        f['value'] = float(bar['value']) if 'value' in bar else close * volume
+        previous_close, previous_volume = self.previous['close'], self.previous['volume']
+        self.previous = {'close': close, 'volume': volume}
+
+        f['returns'] = _div(close, previous_close) - 1
+        f['log_returns'] = float(np.log(_div(close, previous_close)))
+        f['high_low_ratio'] = _div(high, low)
+        f['close_open_ratio'] = _div(close, open_)
+        f['candle_range'] = high - low
+        f['body_size'] = abs(close - open_)
+        f['upper_shadow'] = high - max(open_, close)
+        f['lower_shadow'] = min(open_, close) - low
+
+        f['rsi'] = self.rsi[14].update(close)
+        f['rsi_7'] = self.rsi[7].update(close)
+        f['rsi_21'] = self.rsi[21].update(close)
+        f['macd'], f['macd_signal'], f['macd_histogram'] = self.macd.update(close)
+
+        upper, middle, lower = self.bollinger.update(close)
+        f['bb_upper'], f['bb_middle'], f['bb_lower'] = upper, middle, lower
+        f['bb_width'] = _div(upper - lower, middle)
+        f['bb_position'] = _div(close - lower, upper - lower)
+        f['bb_breakout_upper'] = float(close > upper)
+        f['bb_breakout_lower'] = float(close < lower)
+
+        f['atr'] = self.atr.update(high, low, close)
+        f['stoch_k'], f['stoch_d'] = self.stochastic.update(high, low, close)
+
+        for n in SMA_PERIODS:
+            f[f'sma_{n}'] = self.sma[n].update(close)
+            f[f'ema_{n}'] = self.ema[n].update(close)
+            f[f'price_sma_{n}_ratio'] = _div(close, f[f'sma_{n}'])
+            if n != 5:
+                f[f'sma_cross_{n}'] = float(f['sma_5'] - f[f'sma_{n}'] > CROSS_TOLERANCE * abs(f[f'sma_{n}']))
+
+        f['volume_ma'] = self.volume_ma.update(volume)
+        f['volume_ratio'] = _div(volume, f['volume_ma'])
+        f['volume_change'] = _div(volume, previous_volume) - 1
+        f['volume_on_up'] = volume * (f['returns'] > 0)
+        f['volume_on_down'] = volume * (f['returns'] < 0)
+
+        for (name, n), lag in self.lags.items():
+            f[f'{name}_lag_{n}'] = lag.update(f[name])
+
+        for n in VOLATILITY_WINDOWS:
+            f[f'volatility_{n}'] = self.volatility[n].update(f['returns'])
+        f['volatility_change'] = _div(f['volatility_5'], f['volatility_20'])
+
+        for n in MOMENTUM_PERIODS:
+            past = self.momentum[n].update(close)
+            f[f'momentum_{n}'] = close - past
+            f[f'roc_{n}'] = (_div(close, past) - 1) * 100
+
+        f['hour'] = float(time.hour)
+        f['day_of_week'] = float(time.dayofweek)
+        f['is_morning'] = float(10 <= time.hour < 14)
+        f['is_afternoon'] = float(14 <= time.hour < 19)
+
+        body = f['body_size']
+        f['hammer'] = float(f['lower_shadow'] > 2 * body and f['upper_shadow'] < body)
+        f['doji'] = float(body <= 0.1 * f['candle_range'])
+        return f
+
+    def seed(self, times: np.ndarray, fields: Dict[str, np.ndarray]) -> 'StreamingFeatureEngineer':
+        """
+        Состояние после всей истории (новый экземпляр) векторными функциями вместо
+        update по каждому бару - для первого построения длинной истории
+
+        Args:
+            times: Время баров (int64 нс или datetime64[ns])
+            fields: open/high/low/close/volume тех же баров
+        """
+        times = np.asarray(times).view('int64')
+        if not len(times):
+            return self
+        high, low, close, volume = (np.asarray(fields[name], dtype='float64') for name in ('high', 'low', 'close', 'volume'))
+        self.bars = len(times)
+        self.last_time = int(times[-1])
+        self.previous = {'close': float(close[-1]), 'volume': float(volume[-1])}
+
+        for rsi in self.rsi.values():
+            rsi.seed(close)
+        self.macd.seed(close)
+        self.bollinger.seed(close)
+        self.atr.seed(high, low, close)
+        self.stochastic.seed(high, low, close)
+        for n in SMA_PERIODS:
+            self.sma[n].seed(close)
+            self.ema[n].seed(close)
+        self.volume_ma.seed(volume)
+
+        returns = ti.pct_change(close)
+        sources = {'close': close, 'returns': returns, 'volume': volume, 'rsi': ti.rsi(close, 14)}
+        for (name, n), lag in self.lags.items():
+            lag.seed(sources[name])
+        for n in VOLATILITY_WINDOWS:
+            self.volatility[n].seed(returns)
+        for n in MOMENTUM_PERIODS:
+            self.momentum[n].seed(close)
+        return self
+
+    def warm_up(self, data: pd.DataFrame) -> Optional[np.ndarray]:
+        """
+        Прогнать историю свечей (time, open, high, low, close, volume[, value])
+
+        Бары не новее уже учтенного пропускаются, поэтому после восстановления
+        состояния можно передавать ту же историю целиком.
+
+        Returns:
+            Признаки последнего учтенного бара или None, если новых баров нет
+        """
+        columns = [name for name in ('open', 'high', 'low', 'close', 'volume', 'value') if name in data.columns]
+        times = pd.to_datetime(data['time']).to_numpy(dtype='datetime64[ns]')
+        start = 0
+        if self.last_time is not None:
+            start = int(np.searchsorted(times.view('int64'), self.last_time, side='right'))
+        values = {name: data[name].to_numpy(dtype='float64') for name in columns}
+
+        features = None
+        for i in range(start, len(times)):
+            bar = {name: values[name][i] for name in columns}
+            bar['time'] = times[i]
+            features = self.update(bar)
+        return features
+
+    def to_dict(self) -> dict:
+        """Состояние (JSON-совместимое)"""
+        return {
+            'feature_names': list(self.feature_names),
+            'bars': self.bars,
+            'last_time': self.last_time,
+            'previous': dict(self.previous),
+            'indicators': {
+                'rsi': {str(k): v.to_dict() for k, v in self.rsi.items()},
+                'macd': self.macd.to_dict(),
+                'bollinger': self.bollinger.to_dict(),
+                'atr': self.atr.to_dict(),
+                'stochastic': self.stochastic.to_dict(),
+                'sma': {str(k): v.to_dict() for k, v in self.sma.items()},
+                'ema': {str(k): v.to_dict() for k, v in self.ema.items()},
+                'volume_ma': self.volume_ma.to_dict(),
+                'lags': {f'{name}:{n}': v.to_dict() for (name, n), v in self.lags.items()},
+                'volatility': {str(k): v.to_dict() for k, v in self.volatility.items()},
+                'momentum': {str(k): v.to_dict() for k, v in self.momentum.items()},
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'StreamingFeatureEngineer':
+        """Восстановить из to_dict()"""
+        engine = cls(data['feature_names'])
+        engine.bars = data['bars']
+        engine.last_time = data['last_time']
+        engine.previous = dict(data['previous'])
+        state = data['indicators']
+        engine.rsi = {int(k): indicator_from_dict(v) for k, v in state['rsi'].items()}
+        engine.macd = indicator_from_dict(state['macd'])
+        engine.bollinger = indicator_from_dict(state['bollinger'])
+        engine.atr = indicator_from_dict(state['atr'])
+        engine.stochastic = indicator_from_dict(state['stochastic'])
+        engine.sma = {int(k): indicator_from_dict(v) for k, v in state['sma'].items()}
+        engine.ema = {int(k): indicator_from_dict(v) for k, v in state['ema'].items()}
+        engine.volume_ma = indicator_from_dict(state['volume_ma'])
+        engine.lags = {
+            (key.split(':')[0], int(key.split(':')[1])): indicator_from_dict(v)
+            for key, v in state['lags'].items()
+        }
+        engine.volatility = {int(k): indicator_from_dict(v) for k, v in state['volatility'].items()}
+        engine.momentum = {int(k): indicator_from_dict(v) for k, v in state['momentum'].items()}
+        return engine
@@ -1 +1,287 @@
-﻿
+﻿"""Технические индикаторы на NumPy для панели (бары x тикеры) за один проход"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Все функции работают вдоль оси 0 (время) и принимают 1-D ряд или 2-D панель
+# (бары x тикеры), где каждый столбец - ряд одного тикера от первого бара;
+# хвост короткого ряда заполнен NaN (см. FeatureEngineer.pack_panel).
+# Окно считается заполненным, только если в нем window непустых значений
+# (как min_periods=window в pandas).
+
+# Ширина (столбцов на бар), до которой рекурсии считаются сканом, а не шагом по барам
+SCAN_MAX_COLUMNS = 32
+
+
+def _as_float(x: np.ndarray) -> np.ndarray:
+    return np.asarray(x, dtype='float64')
+
+
+class PrefixSums:
+    """
+    Префиксные суммы ряда (и квадратов): среднее, сумма и std по любому окну
+    за O(1) на элемент без повторного cumsum
+
+    Значения сдвигаются к первому непустому значению столбца - меньше потеря
+    точности на длинных рядах цен.
+    """
+
+    def __init__(self, x: np.ndarray, squares: bool = False):
+        x = _as_float(x)
+        self.shape = x.shape
+        valid = ~np.isnan(x)
+        first = np.argmax(valid, axis=0)
+        offset = np.take_along_axis(x, np.expand_dims(first, 0), axis=0)[0]
+        self.offset = np.where(np.isnan(offset), 0.0, offset)
+        centered = np.where(valid, x - self.offset, 0.0)
+
+        zeros = np.zeros((1,) + x.shape[1:])
+        self.sums = np.concatenate([zeros, np.cumsum(centered, axis=0)])
+        self.counts = np.concatenate([zeros, np.cumsum(valid, axis=0, dtype='float64')])
+        self.squares = np.concatenate([zeros, np.cumsum(centered * centered, axis=0)]) if squares else None
+
+    def _window(self, prefix: np.ndarray, window: int) -> np.ndarray:
+        out = np.full(self.shape, np.nan)
+        if self.shape[0] >= window:
+            out[window - 1:] = prefix[window:] - prefix[:-window]
+        return out
+
+    def _full(self, window: int) -> np.ndarray:
+        """Окна, в которых все window значений непустые (как min_periods=window в pandas)"""
+        return self._window(self.counts, window) == window
+
+    def sum(self, window: int) -> np.ndarray:
+        sums = self._window(self.sums, window) + window * self.offset
+        return np.where(self._full(window), sums, np.nan)
+
+    def mean(self, window: int) -> np.ndarray:
+        means = self._window(self.sums, window) / window + self.offset
+        return np.where(self._full(window), means, np.nan)
+
+    def std(self, window: int, ddof: int = 1) -> np.ndarray:
+        if self.squares is None:
+            raise ValueError("PrefixSums создан без squares=True")
+        sums = self._window(self.sums, window)
+        variance = (self._window(self.squares, window) - sums * sums / window) / (window - ddof)
+        return np.where(self._full(window), np.sqrt(np.maximum(variance, 0.0)), np.nan)
+
+
+def rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """Скользящая сумма; стоимость не зависит от длины окна"""
+    return PrefixSums(x).sum(window)
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """Скользящее среднее (SMA)"""
+    return PrefixSums(x).mean(window)
+
+
+def rolling_std(x: np.ndarray, window: int, ddof: int = 1) -> np.ndarray:
+    """Скользящее стандартное отклонение (по умолчанию несмещенное, как в pandas)"""
+    return PrefixSums(x, squares=True).std(window, ddof)
+
+
+def _sliding(x: np.ndarray, window: int, reduce) -> np.ndarray:
+    x = _as_float(x)
+    out = np.full(x.shape, np.nan)
+    if len(x) >= window:
+        view = np.lib.stride_tricks.sliding_window_view(x, window, axis=0)
+        out[window - 1:] = reduce(view, axis=-1)
+    return out
+
+
+def rolling_min(x: np.ndarray, window: int) -> np.ndarray:
+    """Скользящий минимум (окна короткие, через sliding_window_view)"""
+    return _sliding(x, window, np.min)
+
+
+def rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+    """Скользящий максимум (окна короткие, через sliding_window_view)"""
+    return _sliding(x, window, np.max)
+
+
+def shift(x: np.ndarray, periods: int = 1) -> np.ndarray:
+    """Сдвиг на periods баров назад (значение periods баров назад, как Series.shift)"""
+    x = _as_float(x)
+    out = np.full(x.shape, np.nan)
+    if periods < len(x):
+        out[periods:] = x[:len(x) - periods]
+    return out
+
+
+def pct_change(x: np.ndarray, periods: int = 1) -> np.ndarray:
+    """Относительное изменение за periods баров"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _as_float(x) / shift(x, periods) - 1
+
+
+def linear_recurrence(decay: np.ndarray, inflow: np.ndarray, axis: int = 0) -> np.ndarray:
+    """
+    y[t] = decay[t] * y[t - 1] + inflow[t] вдоль оси axis, y[-1] = 0
+
+    decay = 0 начинает ряд заново; decay может транслироваться к форме inflow.
+    Узкие массивы (до SCAN_MAX_COLUMNS столбцов на бар) считаются префиксным
+    сканом удвоением шага: ceil(log2(T)) векторных проходов вместо цикла по
+    барам. Скан делает O(T log T) работы, поэтому на широкой панели быстрее
+    шаг по барам, где одна операция покрывает все столбцы.
+    """
+    out = np.array(inflow, dtype='float64')
+    decay = np.broadcast_to(np.asarray(decay, dtype='float64'), out.shape)
+    series, rates = np.moveaxis(out, axis, 0), np.moveaxis(decay, axis, 0)
+    if series[:1].size > SCAN_MAX_COLUMNS:
+        for t in range(1, len(series)):
+            series[t] += rates[t] * series[t - 1]
+        return out
+    rates = rates.copy()
+    step = 1
+    while step < len(series):
+        # Правые части вычисляются до записи, перекрытие срезов безопасно
+        series[step:] += rates[step:] * series[:-step]
+        rates[step:] *= rates[:-step]
+        step *= 2
+    return out
+
+
+def ema(x: np.ndarray, span: Optional[int] = None, alpha: Optional[float] = None) -> np.ndarray:
+    """Экспоненциальное среднее (как ewm(span, adjust=False) в pandas), см. ema_many"""
+    alpha = alpha if alpha is not None else 2.0 / (span + 1)
+    return ema_many(x, alphas=[alpha])[0]
+
+
+def ema_many(x: np.ndarray, spans: Sequence[int] = (), alphas: Sequence[float] = ()) -> List[np.ndarray]:
+    """
+    Несколько EMA одного ряда одним сканом linear_recurrence
+
+    Все тикеры и периоды идут одним массивом (периоды x бары x тикеры).
+    Ряд начинается с первого непустого значения столбца; пропуск дает NaN,
+    и после него ряд начинается заново.
+    """
+    x = _as_float(x)
+    alpha = np.array([2.0 / (span + 1) for span in spans] + list(alphas))
+    alpha = alpha.reshape((-1,) + (1,) * x.ndim)
+    valid = ~np.isnan(x)
+    start = valid & ~np.concatenate([np.zeros_like(valid[:1]), valid[:-1]])
+    filled = np.where(valid, x, 0.0)
+    # Пропуск обнуляет ряд (decay = 0), первое значение после него входит целиком
+    inflow = alpha * filled
+    np.copyto(inflow, np.broadcast_to(filled, inflow.shape), where=start)
+    out = linear_recurrence(valid * (1 - alpha), inflow, axis=1)
+    out[:, ~valid] = np.nan
+    return list(out)
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """RSI по средним приростам и падениям за period баров (0..100)"""
+    return rsi_many(close, [period])[0]
+
+
+def rsi_many(close: np.ndarray, periods: Sequence[int]) -> List[np.ndarray]:
+    """RSI для нескольких периодов по общим префиксным суммам приростов и падений"""
+    delta = _as_float(close) - shift(close)
+    gains = PrefixSums(np.maximum(delta, 0.0))
+    losses = PrefixSums(np.maximum(-delta, 0.0))
+    # Счетчики движений точны: окно без падений дает ровно 0, а не остаток округления
+    rises = PrefixSums(np.where(np.isnan(delta), np.nan, delta > 0))
+    falls = PrefixSums(np.where(np.isnan(delta), np.nan, delta < 0))
+    result = []
+    for period in periods:
+        up = np.where(rises.sum(period) == 0, 0.0, gains.mean(period))
+        down = np.where(falls.sum(period) == 0, 0.0, losses.mean(period))
+        result.append(_rsi_value(up, down))
+    return result
+
+
+def _rsi_value(up: np.ndarray, down: np.ndarray) -> np.ndarray:
+    """RSI по средним приросту и падению; без падений RSI = 100, без движения - 50"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = 100 - 100 / (1 + up / down)
+    value = np.where((down == 0) & (up > 0), 100.0, value)
+    return np.where((down == 0) & (up == 0), 50.0, value)
+
+
+def wilder_mean(x: np.ndarray, period: int) -> np.ndarray:
+    """
+    Сглаживание Уайлдера: первое значение - среднее первых period непустых
+    значений столбца, далее avg = (avg * (period - 1) + x) / period; пропуски
+    не меняют среднее. Считается сканом linear_recurrence.
+    """
+    x = _as_float(x)
+    valid = ~np.isnan(x)
+    seen = np.cumsum(valid, axis=0)
+    totals = np.cumsum(np.where(valid, x, 0.0), axis=0)
+    seed = valid & (seen == period)
+    smoothing = valid & (seen > period)
+    decay = np.where(smoothing, (period - 1) / period, np.where(seed, 0.0, 1.0))
+    inflow = np.where(smoothing, x / period, np.where(seed, totals / period, 0.0))
+    return np.where(seen < period, np.nan, linear_recurrence(decay, inflow))
+
+
+def rsi_wilder(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """RSI Уайлдера: приросты и падения сглаживаются wilder_mean (0..100)"""
+    delta = _as_float(close) - shift(close)
+    up = wilder_mean(np.maximum(delta, 0.0), period)
+    down = wilder_mean(np.maximum(-delta, 0.0), period)
+    return _rsi_value(up, down)
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD: (линия, сигнальная линия, гистограмма)"""
+    fast_ema, slow_ema = ema_many(close, [fast, slow])
+    line = fast_ema - slow_ema
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(
+    close: np.ndarray, period: int = 20, k: float = 2.0, prefix: Optional[PrefixSums] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Полосы Боллинджера: (верхняя, средняя, нижняя); prefix - готовые PrefixSums(close, squares=True)"""
+    prefix = prefix or PrefixSums(close, squares=True)
+    middle = prefix.mean(period)
+    width = k * prefix.std(period)
+    return middle + width, middle, middle - width
+
+
+def bollinger_position(close: np.ndarray, upper: np.ndarray, lower: np.ndarray) -> np.ndarray:
+    """Положение цены внутри полос: 0 - нижняя, 1 - верхняя"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (_as_float(close) - lower) / (upper - lower)
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """Истинный диапазон бара (первый бар - high - low)"""
+    high, low = _as_float(high), _as_float(low)
+    previous = shift(close)
+    return np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Средний истинный диапазон за period баров"""
+    return rolling_mean(true_range(high, low, close), period)
+
+
+def stochastic(
+    high: np.ndarray, low: np.ndarray, close: np.ndarray, k_period: int = 14, d_period: int = 3
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Стохастик: (%K, %D)"""
+    lowest = rolling_min(low, k_period)
+    highest = rolling_max(high, k_period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = 100 * (_as_float(close) - lowest) / (highest - lowest)
+    return k, rolling_mean(k, d_period)
+
+
+def volatility(returns: np.ndarray, window: int) -> np.ndarray:
+    """Волатильность - скользящее стандартное отклонение доходностей"""
+    return rolling_std(returns, window)
+
+
+def momentum(close: np.ndarray, period: int) -> np.ndarray:
+    """Изменение цены за period баров"""
+    return _as_float(close) - shift(close, period)
+
+
+def roc(close: np.ndarray, period: int) -> np.ndarray:
+    """Скорость изменения цены за period баров, %"""
+    return pct_change(close, period) * 100
@@ -3,7 +3,7 @@
 import sys
 import logging
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 import json
 
@@ -54,6 +54,8 @@ class TelegramBot:
         except ImportError:
             self.status_manager = None
         
+        self._db = None  # DatabaseManager для истории портфеля, создается при первом запросе
+        
         logger.info("TelegramBot инициализирован")
     
     def start(self):
@@ -194,6 +196,27 @@ class TelegramBot:
         status_text = self.get_status_text()
         await update.reply_text(status_text, parse_mode='HTML')
     
+    def get_equity_text(self, account: str, days: int = 30) -> str:
+        """Изменение капитала и текущая экспозиция счета за days дней из истории снимков"""
+        try:
+            if self._db is None:
+                from src.data_collection.database import DatabaseManager
+                self._db = DatabaseManager(settings.db.DATABASE_URL)
+            end = datetime.utcnow()
+            equity = self._db.load_equity_series(end - timedelta(days=days), end, account=account)
+        except Exception as e:
+            logger.warning(f"История портфеля недоступна: {e}")
+            return ""
+        
+        if len(equity) < 2 or not equity['total_value'].iloc[0]:
+            return ""
+        change = (equity['total_value'].iloc[-1] / equity['total_value'].iloc[0] - 1) * 100
+        return (
+            f"За {days} дн.: {change:+.2f}%, "
+            f"экспозиция {equity['exposure'].iloc[-1]:,.0f} ₽ "
+            f"(макс. {equity['exposure'].max():,.0f} ₽)\n"
+        )
+    
     async def portfolio_command(self, update, context: ContextTypes.DEFAULT_TYPE):
         """Команда портфеля"""
         # Получение информации из файла статуса
@@ -220,7 +243,8 @@ class TelegramBot:
         else:
             portfolio_text += "Нет открытых позиций\n"
         
-        portfolio_text += f"Общая стоимость: {sandbox_capital:,.0f} ₽\n\n"
+        portfolio_text += f"Общая стоимость: {sandbox_capital:,.0f} ₽\n"
+        portfolio_text += self.get_equity_text('sandbox') + "\n"
         portfolio_text += f"<b>💰 LIVE:</b>\n"
         
         if live_positions:
@@ -229,7 +253,8 @@ class TelegramBot:
         else:
             portfolio_text += "Нет открытых позиций\n"
         
-        portfolio_text += f"Общая стоимость: {live_capital:,.0f} ₽"
+        portfolio_text += f"Общая стоимость: {live_capital:,.0f} ₽\n"
+        portfolio_text += self.get_equity_text('live')
         
         await update.reply_text(portfolio_text, parse_mode='HTML')
     
@@ -1 +1,6 @@
-﻿
+﻿"""Общие константы"""
+
+from datetime import timedelta, timezone
+
+# Время биржи: MOEX работает по Москве (UTC+3, без перехода на летнее время)
+MSK = timezone(timedelta(hours=3))
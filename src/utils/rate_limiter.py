@@ -0,0 +1,291 @@
+"""Общий для процесса ограничитель частоты исходящих HTTP-запросов"""
+
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.exceptions import ConnectTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Статусы, на которые снижаем темп и повторяем запрос
+THROTTLE_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+
+@dataclass
+class HostLimits:
+    """Параметры корзины хоста (запросов в секунду)"""
+    rate: float = 10.0            # Стартовый темп
+    min_rate: float = 0.5         # Нижняя граница при снижении
+    max_rate: float = 50.0        # Верхняя граница при росте
+    burst: float = 20.0           # Емкость корзины (допустимый всплеск)
+    increase: float = 1.0         # Аддитивный рост темпа (req/s за секунду успешной работы)
+    decrease: float = 0.5         # Мультипликативное снижение при 429/5xx
+
+
+# Стартовые лимиты известных хостов; остальные получают HostLimits()
+DEFAULT_HOST_LIMITS: Dict[str, HostLimits] = {
+    'iss.moex.com': HostLimits(rate=20.0, max_rate=50.0, burst=40.0),
+    'tradeapi.finam.ru': HostLimits(rate=5.0, max_rate=10.0, burst=10.0),
+    'export.finam.ru': HostLimits(rate=1.0, max_rate=2.0, burst=2.0),
+    'api.alor.ru': HostLimits(rate=10.0, max_rate=20.0, burst=20.0),
+    'apidev.alor.ru': HostLimits(rate=10.0, max_rate=20.0, burst=20.0),
+    # Локальный стенд ISS (scripts/run_iss_stub.py) не ограничиваем
+    '127.0.0.1': HostLimits(rate=10000.0, max_rate=10000.0, burst=10000.0),
+    'localhost': HostLimits(rate=10000.0, max_rate=10000.0, burst=10000.0),
+}
+
+
+class HostBucket:
+    """
+    Token bucket одного хоста с AIMD-подстройкой темпа
+
+    Каждый успешный ответ немного поднимает темп (аддитивно), 429/5xx - снижает
+    его вдвое (мультипликативно, не чаще раза в секунду) и опустошает корзину.
+    Retry-After от сервера блокирует хост целиком до указанного момента.
+    """
+
+    def __init__(self, host: str, limits: HostLimits):
+        self.host = host
+        self.limits = limits
+        self.rate = limits.rate
+        self.tokens = limits.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'throttled': 0, 'retries': 0, 'waited': 0.0}
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.limits.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Дождаться токена
+
+        Args:
+            timeout: Максимальное ожидание (None = без ограничения)
+
+        Returns:
+            True, если токен получен
+        """
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    self.stats['requests'] += 1
+                    self.stats['waited'] += now - started
+                    return True
+                wait = max(self._blocked_until - now, (1.0 - self.tokens) / self.rate)
+
+            if timeout is not None:
+                remaining = timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        """Аддитивный рост темпа после успешного ответа"""
+        with self._lock:
+            # Прирост на запрос ~ increase / rate, т.е. около increase req/s за секунду
+            self.rate = min(self.limits.max_rate, self.rate + self.limits.increase / self.rate)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """Мультипликативное снижение темпа после 429/5xx"""
+        with self._lock:
+            now = time.monotonic()
+            self.stats['throttled'] += 1
+            # Пачка параллельных отказов - одно снижение
+            if now - self._last_decrease >= 1.0:
+                self._last_decrease = now
+                self.rate = max(self.limits.min_rate, self.rate * self.limits.decrease)
+                self.tokens = min(self.tokens, 0.0)
+                logger.warning(f"Снижение темпа запросов к {self.host}: {self.rate:.2f} req/s")
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+
+class RateLimiter:
+    """
+    Реестр корзин по хостам и выполнение запросов с повторами
+
+    Повторы: экспоненциальная задержка с полным джиттером (uniform(0, base * 2^n)),
+    но не меньше Retry-After и не больше backoff_max; если сервер просит ждать
+    дольше backoff_max, запрос завершается RetryError, а не блокирует поток.
+    Неидемпотентные запросы (POST - выставление ордеров) повторяются только на
+    429 и ошибку установки соединения (запрос не был отправлен), когда сервер
+    гарантированно не обработал запрос.
+    """
+
+    def __init__(
+        self,
+        host_limits: Optional[Dict[str, HostLimits]] = None,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0
+    ):
+        """
+        Args:
+            host_limits: Лимиты по хостам (по умолчанию DEFAULT_HOST_LIMITS)
+            max_retries: Максимум повторов одного запроса
+            backoff_base: База экспоненциальной задержки (секунды)
+            backoff_max: Потолок задержки между повторами (секунды)
+        """
+        self.host_limits = dict(DEFAULT_HOST_LIMITS if host_limits is None else host_limits)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._buckets: Dict[str, HostBucket] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def configure_host(self, host: str, limits: HostLimits) -> None:
+        """Задать лимиты хоста (сбрасывает его текущую корзину)"""
+        with self._lock:
+            self.host_limits[host] = limits
+            self._buckets.pop(host, None)
+
+    def bucket(self, url: str) -> HostBucket:
+        """Корзина хоста, к которому относится url"""
+        host = urlsplit(url).hostname or ''
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = HostBucket(host, self.host_limits.get(host, HostLimits()))
+            return bucket
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Задержка перед повтором attempt (с нуля), не больше backoff_max
+
+        Raises:
+            requests.exceptions.RetryError: Если Retry-After больше backoff_max
+        """
+        if retry_after is not None and retry_after > self.backoff_max:
+            raise requests.exceptions.RetryError(
+                f"Retry-After {retry_after:.0f} с больше допустимой паузы {self.backoff_max:.0f} с"
+            )
+        delay = self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return min(max(delay, retry_after or 0.0), self.backoff_max)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        session: Optional[requests.Session] = None,
+        max_retries: Optional[int] = None,
+        **kwargs
+    ) -> requests.Response:
+        """
+        Выполнить HTTP-запрос через корзину хоста
+
+        Args:
+            method: HTTP-метод
+            url: Адрес
+            session: Сессия requests (None = модуль requests, без keep-alive)
+            max_retries: Переопределить число повторов
+            **kwargs: Аргументы requests (params, json, headers, timeout, ...)
+
+        Returns:
+            Последний полученный ответ (статус проверяет вызывающий код)
+
+        Raises:
+            requests.exceptions.RequestException: Если все попытки завершились сетевой ошибкой
+            requests.exceptions.RetryError: Если сервер просит ждать дольше backoff_max
+        """
+        sender = session if session is not None else requests
+        bucket = self.bucket(url)
+        retries = self.max_retries if max_retries is None else max_retries
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        attempt = 0
+        while True:
+            bucket.acquire()
+            try:
+                response = sender.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                safe = idempotent or _not_sent(e)
+                if attempt >= retries or not safe:
+                    raise
+                bucket.on_throttle()
+                delay = self.backoff(attempt)
+                logger.debug(f"{method} {url}: {e}; повтор через {delay:.2f} с")
+            else:
+                if response.status_code not in THROTTLE_STATUSES:
+                    bucket.on_success()
+                    return response
+
+                retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                # Блокировка хоста не дольше паузы, которую готовы ждать
+                bucket.on_throttle(min(retry_after, self.backoff_max) if retry_after is not None else None)
+                can_retry = idempotent or response.status_code == 429
+                if attempt >= retries or not can_retry:
+                    return response
+                delay = self.backoff(attempt, retry_after)
+                logger.debug(f"{method} {url}: HTTP {response.status_code}; повтор через {delay:.2f} с")
+
+            bucket.stats['retries'] += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def get(self, url: str, session: Optional[requests.Session] = None, **kwargs) -> requests.Response:
+        return self.request('GET', url, session=session, **kwargs)
+
+    def post(self, url: str, session: Optional[requests.Session] = None, **kwargs) -> requests.Response:
+        return self.request('POST', url, session=session, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Статистика по хостам: текущий темп, запросы, отказы, повторы, суммарное ожидание"""
+        with self._lock:
+            buckets = list(self._buckets.values())
+        return {b.host: dict(b.stats, rate=round(b.rate, 2)) for b in buckets}
+
+
+def _not_sent(error: requests.exceptions.RequestException) -> bool:
+    """Ошибка возникла при установке соединения, т.е. запрос до сервера не дошел"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError) or not error.args:
+        return False
+    # requests оборачивает MaxRetryError(reason=NewConnectionError / NameResolutionError)
+    reason = getattr(error.args[0], 'reason', error.args[0])
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах (число или HTTP-дата)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_default_limiter: Optional[RateLimiter] = None
+_default_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Общий ограничитель процесса (создается при первом обращении)"""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
@@ -0,0 +1,40 @@
+"""Общие фикстуры тестов"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_collection.panel import build_panel
+
+
+def random_candles(bars: int = 600, seed: int = 0, start: str = '2025-01-06 10:00') -> pd.DataFrame:
+    """Часовые свечи случайного блуждания (time, open, high, low, close, volume)"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.005, bars)) * close
+    return pd.DataFrame({
+        'time': pd.date_range(start, periods=bars, freq='1h'),
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.integers(100, 10000, bars).astype('float64'),
+    })
+
+
+@pytest.fixture
+def candles() -> pd.DataFrame:
+    return random_candles()
+
+
+@pytest.fixture
+def panel():
+    """Панель трех тикеров с разной длиной истории (CandlePanel)"""
+    frames = {'SBER': random_candles(600, 1), 'GAZP': random_candles(450, 2, '2025-01-12 16:00'),
+              'LKOH': random_candles(520, 3, '2025-01-08 10:00')}
+    tickers = list(frames)
+    codes = np.concatenate([np.full(len(frame), j) for j, frame in enumerate(frames.values())])
+    data = pd.concat(frames.values(), ignore_index=True)
+    values = {name: data[name].to_numpy() for name in ('open', 'high', 'low', 'close', 'volume')}
+    return build_panel(tickers, codes, data['time'].to_numpy(dtype='datetime64[ns]'), values)
@@ -0,0 +1,55 @@
+"""Докачка свечей от последней сохраненной свечи с перекрытием"""
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from src.data_collection.candle_sync import CandleSynchronizer
+from src.data_collection.database import DatabaseManager
+
+START = datetime(2025, 1, 6, 10, 0)
+
+
+def candles(start, count, close=100.0):
+    return pd.DataFrame({
+        'time': pd.date_range(start, periods=count, freq='1h'),
+        'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 10,
+    })
+
+
+class FakeCollector:
+    """Отдает свечи от запрошенной начальной даты и запоминает запросы"""
+
+    def __init__(self, bars):
+        self.bars = bars
+        self.requests = []
+
+    def get_historical_candles_many(self, tickers, start_date, end_date, timeframe='1h', start_dates=None):
+        self.requests.append(dict(start_dates))
+        return {ticker: self.bars[self.bars['time'] >= start_dates[ticker]].reset_index(drop=True) if ticker == 'SBER'
+                else pd.DataFrame() for ticker in tickers}
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}", archive_dir=str(tmp_path / 'archive'))
+
+
+def test_sync_requests_only_new_bars(db):
+    db.save_candles(candles(START, 10), 'SBER', '1h')
+    # На бирже последняя сохраненная свеча успела измениться, пришли 5 новых
+    collector = FakeCollector(candles(START, 15, close=101.0))
+    sync = CandleSynchronizer(collector, db, overlap_bars=2, initial_days=3)
+
+    saved = sync.sync(['SBER', 'GAZP'])
+
+    start_dates = collector.requests[0]
+    assert start_dates['SBER'] == START + timedelta(hours=9 - 2)
+    assert datetime.now() - start_dates['GAZP'] == pytest.approx(timedelta(days=3), abs=timedelta(minutes=1))
+    assert saved == {'SBER': 8, 'GAZP': 0}
+
+    stored = db.load_candles('SBER', '1h', START, START + timedelta(days=1))
+    assert len(stored) == 15
+    assert stored['close'].tolist() == [100.0] * 7 + [101.0] * 8
+    assert db.get_last_candle_time('SBER', '1h') == START + timedelta(hours=14)
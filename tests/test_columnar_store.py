@@ -0,0 +1,75 @@
+"""Колоночное хранилище свечей: дозапись, перезапись хвоста, поиск по разреженному индексу"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_collection import columnar_store
+from src.data_collection.columnar_store import ColumnarCandleStore
+from src.data_collection.database import DatabaseManager
+
+START = datetime(2025, 1, 6, 10, 0)
+
+
+def candles(start, count, close=100.0):
+    close = close + np.arange(count, dtype='float64')
+    return pd.DataFrame({
+        'time': pd.date_range(start, periods=count, freq='1h'),
+        'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 10,
+    })
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Маленький шаг индекса: диапазоны попадают на границы нескольких блоков
+    monkeypatch.setattr(columnar_store, 'INDEX_STRIDE', 16)
+    return ColumnarCandleStore(str(tmp_path / 'columnar'))
+
+
+def test_overlapping_save_rewrites_tail(store, tmp_path):
+    store.save_candles(candles(START, 100), 'SBER', '1h')
+    store.save_candles(candles(START + timedelta(hours=90), 30, close=500.0), 'SBER', '1h')
+
+    # Новый экземпляр читает только зафиксированные meta.json строки
+    reopened = ColumnarCandleStore(str(tmp_path / 'columnar'))
+    stored = reopened.load_candles('SBER', '1h', START, START + timedelta(days=30))
+    assert len(stored) == 120
+    assert stored['time'].is_monotonic_increasing and stored['time'].is_unique
+    assert stored['close'].iloc[89] == 189.0 and stored['close'].iloc[90] == 500.0
+    assert reopened.get_last_candle_time('SBER', '1h') == START + timedelta(hours=119)
+    assert reopened.list_series() == [('SBER', '1h')]
+
+
+def test_range_lookup_matches_searchsorted(store):
+    store.save_candles(candles(START, 500), 'SBER', '1h')
+    times = candles(START, 500)['time'].to_numpy()
+    rng = np.random.default_rng(0)
+    for lo, hi in np.sort(rng.integers(-5, 505, size=(50, 2)), axis=1):
+        start = (pd.Timestamp(START) + pd.Timedelta(hours=int(lo), minutes=30)).to_pydatetime()
+        end = (pd.Timestamp(START) + pd.Timedelta(hours=int(hi))).to_pydatetime()
+        arrays = store.load_candle_arrays('SBER', '1h', start, end)
+        expected = times[(times >= np.datetime64(start)) & (times <= np.datetime64(end))]
+        np.testing.assert_array_equal(arrays['time'], expected.astype('datetime64[ns]').view('int64'))
+
+
+def test_sync_from_database_matches_sql(store, tmp_path):
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}", archive_dir=str(tmp_path / 'archive'))
+    db.save_candles(candles(START, 40), 'SBER', '1h')
+    db.save_candles(candles(START + timedelta(hours=10), 20, close=300.0), 'GAZP', '1h')
+    for ticker in ('SBER', 'GAZP'):
+        store.sync_from_database(db, ticker, '1h', START)
+
+    db.save_candles(candles(START + timedelta(hours=39), 5, close=900.0), 'SBER', '1h')
+    assert store.sync_from_database(db, 'SBER', '1h', START) == 5
+
+    end = START + timedelta(days=3)
+    columnar, sql = store.load_candles('SBER', '1h', START, end), db.load_candles('SBER', '1h', START, end)
+    assert list(columnar.columns) == list(sql.columns)
+    for name in sql.columns:
+        np.testing.assert_array_equal(np.asarray(columnar[name]), np.asarray(sql[name]))
+    columnar, sql = store.load_panel(['SBER', 'GAZP'], '1h', START, end), db.load_panel(['SBER', 'GAZP'], '1h', START, end)
+    np.testing.assert_array_equal(columnar.times, sql.times)
+    np.testing.assert_array_equal(columnar.mask, sql.mask)
+    np.testing.assert_array_equal(columnar['close'], sql['close'])
@@ -0,0 +1,179 @@
+"""DatabaseManager: upsert и чтение свечей, миграции, агрегаты старших таймфреймов"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import DateTime, bindparam, inspect, text
+
+from src.data_collection import database
+from src.data_collection.database import DatabaseManager
+from src.data_collection.migrations import (
+    CANDLES_TIMEFRAME_MIGRATION, CANDLES_UNIQUE_INDEX, migrate_candles_timeframe_length, migrate_candles_unique_index,
+    migration_applied
+)
+
+START = datetime(2025, 1, 6, 10, 0)
+
+
+def make_db(tmp_path):
+    return DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}", archive_dir=str(tmp_path / 'archive'))
+
+
+def insert_legacy_candles(db, bars):
+    """Свечи, записанные в обход save_candles (как до появления candle_rollups)"""
+    times = pd.date_range(START, periods=bars, freq='1h')
+    with db.engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO candles (ticker, timeframe, time, open, high, low, close, volume) "
+                "VALUES ('SBER', '1h', :time, 100, 101, 99, 100, 10)"
+            ).bindparams(bindparam('time', type_=DateTime)),
+            [{'time': t.to_pydatetime()} for t in times],
+        )
+
+
+def candles(start, count, close=100.0):
+    close = close + np.arange(count, dtype='float64')
+    return pd.DataFrame({
+        'time': pd.date_range(start, periods=count, freq='1h'),
+        'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 10,
+    })
+
+
+def count_candles(db):
+    with db.engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM candles")).scalar()
+
+
+def count_rollups(db):
+    with db.engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM candle_rollups")).scalar()
+
+
+def test_rollup_backfill_runs_once(tmp_path, monkeypatch):
+    db = make_db(tmp_path)
+    assert migration_applied(db.engine, database.ROLLUPS_BACKFILL_MIGRATION)
+
+    # Новая база отмечена сразу; база до появления агрегатов - свечи без отметки
+    insert_legacy_candles(db, 48)
+    with db.engine.begin() as conn:
+        conn.execute(text("DELETE FROM schema_migrations"))
+
+    calls = []
+    rebuild = DatabaseManager.rebuild_rollups
+    monkeypatch.setattr(DatabaseManager, 'rebuild_rollups', lambda self, *args: calls.append(args) or rebuild(self, *args))
+
+    db = make_db(tmp_path)
+    assert calls == [('SBER', '1h')]
+    assert count_rollups(db) > 0
+
+    # Агрегаты удалены вручную - повторный запуск их не пересобирает
+    with db.engine.begin() as conn:
+        conn.execute(text("DELETE FROM candle_rollups"))
+    make_db(tmp_path)
+    assert calls == [('SBER', '1h')]
+
+
+def test_rollups_maintained_by_save_candles(tmp_path):
+    db = make_db(tmp_path)
+    close = [100.0 + i for i in range(48)]
+    db.save_candles(pd.DataFrame({
+        'time': pd.date_range(START, periods=48, freq='1h'),
+        'open': close, 'high': close, 'low': close, 'close': close, 'volume': 1,
+    }), 'SBER', '1h')
+    daily = db.load_candles('SBER', '1d', START - timedelta(days=1), START + timedelta(days=3))
+    assert daily['volume'].sum() == 48
+    assert daily['close'].iloc[-1] == 147.0
+
+
+def test_save_candles_upserts_in_place(tmp_path):
+    db = make_db(tmp_path)
+    assert db.save_candles(candles(START, 10), 'SBER', '1h') == 10
+    # Перекрывающееся окно: 5 старых свечей обновляются, 5 новых добавляются
+    assert db.save_candles(candles(START + timedelta(hours=5), 10, close=500.0), 'SBER', '1h') == 10
+    assert count_candles(db) == 15
+
+    stored = db.load_candles('SBER', '1h', START, START + timedelta(days=1))
+    assert stored['close'].tolist() == [100.0 + i for i in range(5)] + [500.0 + i for i in range(10)]
+    assert db.get_last_candle_time('SBER', '1h') == START + timedelta(hours=14)
+
+
+def test_dedup_migration_keeps_latest_row(tmp_path):
+    db = make_db(tmp_path)
+    # База до миграции: без уникального индекса, повторные загрузки добавляли строки
+    with db.engine.begin() as conn:
+        conn.execute(text(f"DROP INDEX {CANDLES_UNIQUE_INDEX}"))
+    insert_legacy_candles(db, 3)
+    with db.engine.begin() as conn:
+        conn.execute(text("UPDATE candles SET close = 1"))
+    insert_legacy_candles(db, 3)
+    assert count_candles(db) == 6
+
+    assert migrate_candles_unique_index(db.engine) == 3
+    assert migrate_candles_unique_index(db.engine) == 0
+    assert count_candles(db) == 3
+    assert db.load_candles('SBER', '1h', START, START + timedelta(days=1))['close'].tolist() == [100.0] * 3
+    unique = [idx for idx in inspect(db.engine).get_indexes('candles') if idx['name'] == CANDLES_UNIQUE_INDEX]
+    assert unique and unique[0]['unique']
+
+
+def test_candle_arrays_fall_back_to_rollups(tmp_path):
+    db = make_db(tmp_path)
+    db.save_candles(candles(START, 48), 'SBER', '1h')
+    arrays = db.load_candle_arrays('SBER', '1h', START + timedelta(hours=2), START + timedelta(hours=5))
+    assert arrays['time'].dtype == np.int64 and arrays['volume'].dtype == np.int64
+    assert arrays['close'].tolist() == [102.0, 103.0, 104.0, 105.0]
+    assert arrays['time'][0] == pd.Timestamp(START + timedelta(hours=2)).value
+
+    # Нативных 4h нет - свечи из candle_rollups, как и в load_candles
+    rollup = db.load_candle_arrays('SBER', '4h', START - timedelta(days=1), START + timedelta(days=2))
+    frame = db.load_candles('SBER', '4h', START - timedelta(days=1), START + timedelta(days=2))
+    assert len(rollup['time']) == len(frame) > 0
+    np.testing.assert_array_equal(rollup['close'], frame['close'].to_numpy())
+    assert rollup['volume'].sum() == 480
+
+    assert len(db.load_candle_arrays('GAZP', '1h', START, START + timedelta(days=1))['time']) == 0
+
+
+def test_panel_aligns_tickers_on_shared_times(tmp_path):
+    db = make_db(tmp_path)
+    db.save_candles(candles(START, 6), 'SBER', '1h')
+    db.save_candles(candles(START + timedelta(hours=3), 6, close=200.0), 'GAZP', '1h')
+    end = START + timedelta(days=1)
+
+    panel = db.load_panel(['GAZP', 'SBER', 'LKOH'], '1h', START, end)
+    assert panel.tickers == ['GAZP', 'SBER', 'LKOH']
+    assert len(panel) == 9 and panel.times[0] == np.datetime64(START, 'ns')
+    assert panel.mask.sum(axis=0).tolist() == [6, 6, 0]
+    assert np.isnan(panel['close'][:3, 0]).all() and (panel['volume'][:3, 0] == 0).all()
+    assert panel['close'][3, 0] == 200.0 and panel['close'][3, 1] == 103.0
+    for ticker in ('GAZP', 'SBER'):
+        pd.testing.assert_frame_equal(panel.ticker_frame(ticker), db.load_candles(ticker, '1h', START, end))
+
+    # Старший таймфрейм без нативных свечей - из агрегатов
+    daily = db.load_panel(['SBER', 'GAZP'], '1d', START - timedelta(days=1), end, fields=['close'])
+    assert list(daily.fields) == ['close'] and daily.mask.all()
+    with pytest.raises(ValueError):
+        db.load_panel(['SBER'], '1h', START, end, fields=['close', 'vwap'])
+
+
+def test_legacy_timeframe_column_accepts_trade_bar_labels(tmp_path):
+    # Схема до баров из сделок: timeframe VARCHAR(5)
+    engine = make_db(tmp_path).engine
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE candles"))
+        conn.execute(text("DELETE FROM schema_migrations"))
+        conn.execute(text(
+            "CREATE TABLE candles (id INTEGER PRIMARY KEY, ticker VARCHAR(10) NOT NULL, timeframe VARCHAR(5) NOT NULL, "
+            "time DATETIME NOT NULL, open FLOAT NOT NULL, high FLOAT NOT NULL, low FLOAT NOT NULL, "
+            "close FLOAT NOT NULL, volume INTEGER NOT NULL)"
+        ))
+    engine.dispose()
+
+    db = make_db(tmp_path)
+    assert migration_applied(db.engine, CANDLES_TIMEFRAME_MIGRATION)
+    assert migrate_candles_timeframe_length(db.engine) is False
+    db.save_candles(candles(START, 3), 'SBER', 'v100000')
+    assert len(db.load_candles('SBER', 'v100000', START, START + timedelta(days=1))) == 3
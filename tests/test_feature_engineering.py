@@ -0,0 +1,76 @@
+"""Признаки модели: ленивый расчет, матрица для модели, столбцы is_<TICKER>"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ml_models.features.feature_engineering import (
+    FEATURE_NAMES, FeatureEngineer, is_ticker_flag, ticker_flags
+)
+
+
+class Booster:
+    """Бустер с get_score, как у XGBoost: признаки, по которым есть разбиения"""
+
+    def __init__(self, used):
+        self.used = used
+
+    def get_score(self, importance_type='weight'):
+        return {name: 1.0 for name in self.used}
+
+
+def test_is_ticker_flag():
+    assert is_ticker_flag('is_SBER')
+    assert not is_ticker_flag('is_morning')
+    assert not is_ticker_flag('is_mornin')
+
+
+def test_subset_matches_full_feature_set(candles):
+    full = FeatureEngineer().create_features(candles)
+    names = ['rsi', 'macd_histogram', 'bb_position', 'atr']
+    subset = FeatureEngineer(names).create_features(candles)
+    common = subset.index.intersection(full.index)
+    assert len(common) == len(full)
+    np.testing.assert_array_equal(subset.loc[common, names].to_numpy(), full.loc[common, names].to_numpy())
+
+
+def test_model_matrix_fills_only_used_ticker_flags(candles):
+    model_features = ['rsi', 'returns', 'sma_20', 'is_SBER', 'is_GAZP']
+    artifact = {'model': Booster(['rsi', 'sma_20', 'is_SBER']), 'feature_names': model_features}
+    engineer = FeatureEngineer.from_model(artifact)
+
+    assert engineer.feature_names == ['rsi', 'sma_20']
+    assert engineer.ticker_flags == ['is_SBER']
+
+    index, matrix = engineer.create_model_matrix(candles, ticker='SBER')
+    assert matrix.dtype == np.float32 and matrix.flags['C_CONTIGUOUS']
+    assert matrix.shape == (len(index), len(model_features))
+
+    expected = FeatureEngineer(['rsi', 'sma_20']).create_features(candles).loc[index]
+    np.testing.assert_array_equal(matrix[:, 0], expected['rsi'].to_numpy(dtype='float32'))
+    np.testing.assert_array_equal(matrix[:, 2], expected['sma_20'].to_numpy(dtype='float32'))
+    # returns и is_GAZP бустер не читает - NaN; is_SBER - флаг тикера
+    assert np.isnan(matrix[:, 1]).all() and np.isnan(matrix[:, 4]).all()
+    assert (matrix[:, 3] == 1).all()
+
+    _, other = engineer.create_model_matrix(candles, ticker='GAZP')
+    assert (other[:, 3] == 0).all()
+
+
+def test_model_without_split_info_uses_all_columns():
+    engineer = FeatureEngineer.from_model({'model': None, 'feature_names': ['rsi', 'is_SBER']})
+    assert engineer.feature_names == ['rsi']
+    assert engineer.ticker_flags == ['is_SBER']
+
+
+def test_unknown_model_feature_is_rejected():
+    with pytest.raises(ValueError):
+        FeatureEngineer.from_model({'model': None, 'feature_names': ['rsi', 'is_mornin']})
+
+
+def test_ticker_flags_block():
+    features = pd.DataFrame({'rsi': [1.0, 2.0]})
+    flagged = ticker_flags(features, 'GAZP', ['SBER', 'GAZP'])
+    assert list(flagged.columns) == ['rsi', 'is_SBER', 'is_GAZP']
+    assert flagged['is_GAZP'].tolist() == [1, 1] and flagged['is_SBER'].tolist() == [0, 0]
+    assert len(FEATURE_NAMES) == len(set(FEATURE_NAMES))
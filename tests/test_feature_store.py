@@ -0,0 +1,100 @@
+"""Хранилище признаков: дозапись новых баров, продолжение после перезапуска, перестроение"""
+
+import numpy as np
+import pandas as pd
+
+from src.ml_models.features.feature_engineering import FeatureEngineer
+from src.ml_models.features.feature_store import FeatureStore, feature_set_hash
+from src.ml_models.features.streaming_indicators import StreamingFeatureEngineer
+
+
+def fields(data):
+    return {name: data[name].to_numpy(dtype='float64') for name in ('open', 'high', 'low', 'close', 'volume')}
+
+
+def update(store, data, ticker='SBER'):
+    return store.update(ticker, '1h', data['time'].to_numpy(dtype='datetime64[ns]'), fields(data))
+
+
+def test_load_matches_batch_features(tmp_path, candles):
+    store = FeatureStore(str(tmp_path))
+    assert update(store, candles) == len(candles)
+    stored = store.load('SBER', '1h')
+    batch = FeatureEngineer().create_features(candles)
+    assert stored.index.equals(batch.index)
+    np.testing.assert_allclose(stored.to_numpy(), batch.to_numpy(), rtol=1e-8, atol=1e-10)
+
+
+def test_incremental_update_after_restart_equals_full_build(tmp_path, candles):
+    full = FeatureStore(str(tmp_path / 'full'))
+    update(full, candles)
+
+    store = FeatureStore(str(tmp_path / 'incremental'))
+    update(store, candles.iloc[:400])
+    # Новый экземпляр - как после перезапуска процесса; последний бар пересчитывается
+    resumed = FeatureStore(str(tmp_path / 'incremental'))
+    assert update(resumed, candles) == len(candles) - 400 + 1
+    assert update(resumed, candles) == 1
+
+    # Полное построение - векторное, дозапись - по бару: совпадение с точностью округления
+    incremental, rebuilt = resumed.load('SBER', '1h'), full.load('SBER', '1h')
+    assert incremental.index.equals(rebuilt.index)
+    np.testing.assert_allclose(incremental.to_numpy(), rebuilt.to_numpy(), rtol=1e-8, atol=1e-10)
+
+
+def test_history_is_built_without_per_bar_updates(tmp_path, candles, monkeypatch):
+    calls = []
+    update_bar = StreamingFeatureEngineer.update
+    monkeypatch.setattr(StreamingFeatureEngineer, 'update', lambda self, bar: calls.append(bar) or update_bar(self, bar))
+
+    store = FeatureStore(str(tmp_path))
+    update(store, candles.iloc[:500])
+    assert calls == []
+    # Дальше по бару считаются только новые бары и предварительный последний
+    assert update(store, candles) == 101
+    assert len(calls) == 101
+
+
+def test_shorter_candles_keep_stored_history(tmp_path, candles):
+    store = FeatureStore(str(tmp_path))
+    update(store, candles)
+    stored = store.load('SBER', '1h')
+    assert update(store, candles.iloc[100:300]) == 0
+    pd.testing.assert_frame_equal(store.load('SBER', '1h'), stored)
+
+
+def test_provisional_last_bar_is_recomputed(tmp_path, candles):
+    store = FeatureStore(str(tmp_path))
+    forming = candles.iloc[:401].copy()
+    forming.loc[400, 'close'] = forming.loc[400, 'close'] * 1.01
+    update(store, forming)
+    update(store, candles.iloc[:401])
+
+    expected = FeatureEngineer().create_features(candles.iloc[:401])
+    np.testing.assert_allclose(store.load('SBER', '1h').iloc[-1], expected.iloc[-1], rtol=1e-8)
+
+
+def test_changed_history_rebuilds_series(tmp_path, candles):
+    store = FeatureStore(str(tmp_path))
+    update(store, candles.iloc[:400])
+    # Закрытие последнего подтвержденного бара (перед формирующимся) пересмотрено
+    changed = candles.copy()
+    changed.loc[398, 'close'] = changed.loc[398, 'close'] * 1.05
+    assert update(store, changed) == len(changed)
+
+    expected = FeatureEngineer().create_features(changed)
+    np.testing.assert_allclose(store.load('SBER', '1h').to_numpy(), expected.to_numpy(), rtol=1e-8, atol=1e-10)
+
+
+def test_feature_set_hash_separates_stores(tmp_path):
+    assert feature_set_hash(['rsi', 'atr']) != feature_set_hash(['atr', 'rsi'])
+    assert FeatureStore(str(tmp_path), ['rsi']).root != FeatureStore(str(tmp_path), ['atr']).root
+
+
+def test_panel_features_match_engineer(tmp_path, panel):
+    stored = FeatureStore(str(tmp_path)).panel_features(panel, '1h')
+    batch = FeatureEngineer().create_panel_features(panel)
+    assert set(stored) == set(batch) == set(panel.tickers)
+    for ticker in panel.tickers:
+        assert stored[ticker].index.equals(batch[ticker].index)
+        np.testing.assert_allclose(stored[ticker].to_numpy(), batch[ticker].to_numpy(), rtol=1e-8, atol=1e-10)
@@ -0,0 +1,80 @@
+"""ISS-стенд: синтез ответов из базы, запись ответов настоящего ISS и их воспроизведение"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from src.data_collection.database import DatabaseManager
+from src.data_collection.iss_stub_server import ISSStubServer
+from src.data_collection.moex_api import MOEXDataCollector
+
+START = datetime(2025, 1, 6, 10, 0)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'iss.db'
+    db = DatabaseManager(f"sqlite:///{path}", archive_dir=str(tmp_path / 'archive'))
+    close = 100 + np.arange(48, dtype='float64')
+    db.save_candles(pd.DataFrame({
+        'time': pd.date_range(START, periods=48, freq='1h'),
+        'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 10,
+    }), 'SBER', '1h')
+    db.engine.dispose()
+    return str(path)
+
+
+def serve(**kwargs):
+    server = ISSStubServer(**kwargs)
+    server.start()
+    return server
+
+
+def test_recorded_responses_are_replayed(db_path, tmp_path):
+    end = START + timedelta(days=1)
+    upstream = serve(db_path=db_path)
+    recorder = serve(db_path=None, recordings_dir=str(tmp_path / 'rec'), upstream_url=upstream.url)
+    try:
+        recorded = MOEXDataCollector(cache_dir=None, base_url=recorder.url).get_historical_candles('SBER', START, end)
+    finally:
+        recorder.stop()
+        upstream.stop()
+    assert len(recorded) == 25
+
+    # Без базы и без upstream: только записанные ответы
+    replay = serve(db_path=None, recordings_dir=str(tmp_path / 'rec'))
+    try:
+        collector = MOEXDataCollector(cache_dir=None, base_url=replay.url)
+        pd.testing.assert_frame_equal(collector.get_historical_candles('SBER', START, end), recorded)
+        assert collector.get_historical_candles('GAZP', START, end).empty
+    finally:
+        replay.stop()
+
+
+def test_daily_candles_are_resampled(db_path):
+    stub = ISSStubServer(db_path=db_path)
+    status, reply = stub.handle('/iss/engines/stock/markets/shares/boards/TQBR/securities/SBER/candles.json',
+                                {'from': '2025-01-06', 'till': '2025-01-08', 'interval': '24'})
+    stub.httpd.server_close()
+    assert status == 200
+    columns = reply['candles']['columns']
+    rows = [dict(zip(columns, row)) for row in reply['candles']['data']]
+    assert [row['begin'][:10] for row in rows] == ['2025-01-06', '2025-01-07', '2025-01-08']
+    assert rows[0]['open'] == 100.0 and rows[0]['close'] == 113.0
+    assert sum(row['volume'] for row in rows) == 480
+
+
+def test_concurrent_requests_are_all_counted(db_path):
+    stub = serve(db_path=db_path, error_rate=0.3)
+    url = f"{stub.url}/engines/stock/markets/shares/boards/TQBR/securities.json"
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(lambda _: requests.get(url, timeout=10).status_code, range(200)))
+    finally:
+        stub.stop()
+    assert stub.stats['requests'] == 200
+    assert stub.stats['errors'] == statuses.count(500) > 0
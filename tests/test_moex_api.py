@@ -0,0 +1,104 @@
+"""Загрузка данных ISS через локальный стенд: пагинация, кэширование, пакетные запросы"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_collection.database import DatabaseManager
+from src.data_collection.iss_decoder import CANDLE_COLUMNS, decode_block
+from src.data_collection.iss_stub_server import ISSStubServer
+from src.data_collection.moex_api import MOEXDataCollector, is_closed_range
+
+START = datetime(2025, 1, 6, 10, 0)
+BARS = 1234
+
+
+@pytest.fixture
+def stub(tmp_path):
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'iss.db'}", archive_dir=str(tmp_path / 'archive'))
+    for ticker, base, bars in (('SBER', 100, BARS), ('GAZP', 200, 30)):
+        close = base + np.arange(bars, dtype='float64')
+        db.save_candles(pd.DataFrame({
+            'time': pd.date_range(START, periods=bars, freq='1h'),
+            'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 10,
+        }), ticker, '1h')
+    db.engine.dispose()
+    server = ISSStubServer(db_path=str(tmp_path / 'iss.db'))
+    server.start()
+    yield server
+    server.stop()
+
+
+def test_all_pages_are_fetched(stub):
+    collector = MOEXDataCollector(cache_dir=None, base_url=stub.url)
+    df = collector.get_historical_candles('SBER', START, START + timedelta(hours=BARS), '1h')
+    assert len(df) == BARS
+    assert df['time'].is_monotonic_increasing
+    assert df['close'].tolist() == (100 + np.arange(BARS)).tolist()
+    # 3 страницы по 500 строк: последняя неполная завершает загрузку
+    assert stub.stats['requests'] <= 1 + collector.page_prefetch
+
+
+def test_closed_range_uses_moscow_date():
+    # 22:30 UTC 6 января - уже 01:30 7 января по Москве: 6 января закрыт
+    evening_utc = datetime(2025, 1, 6, 22, 30, tzinfo=timezone.utc)
+    assert is_closed_range(datetime(2025, 1, 6, 23, 0), now=evening_utc)
+    assert not is_closed_range(datetime(2025, 1, 7), now=evening_utc)
+    # 23:30 по Москве 6 января - день еще идет
+    assert not is_closed_range(datetime(2025, 1, 6), now=datetime(2025, 1, 6, 20, 30, tzinfo=timezone.utc))
+
+
+def test_many_tickers_keep_input_order(stub):
+    collector = MOEXDataCollector(cache_dir=None, base_url=stub.url)
+    result = collector.get_historical_candles_many(['GAZP', 'NONE', 'SBER', 'GAZP'], START, START + timedelta(days=1))
+    assert list(result) == ['GAZP', 'NONE', 'SBER']
+    assert result['NONE'].empty
+    assert result['GAZP']['close'].iloc[0] == 200.0 and result['SBER']['close'].iloc[0] == 100.0
+    assert len(result['GAZP']) == 25
+
+
+def test_closed_range_is_served_from_cache(stub, tmp_path):
+    collector = MOEXDataCollector(cache_dir=str(tmp_path / 'cache'), base_url=stub.url)
+    end = START + timedelta(days=2)
+    first = collector.get_historical_candles('SBER', START, end, '1h')
+    requests = stub.stats['requests']
+
+    again = MOEXDataCollector(cache_dir=str(tmp_path / 'cache'), base_url=stub.url)
+    pd.testing.assert_frame_equal(again.get_historical_candles('SBER', START, end, '1h'), first)
+    assert stub.stats['requests'] == requests
+
+
+def test_cache_is_opt_in_and_not_tied_to_working_directory(stub, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    collector = MOEXDataCollector(base_url=stub.url)
+    collector.get_historical_candles('SBER', START, START + timedelta(days=1), '1h')
+    assert collector.cache is None
+    assert not (tmp_path / 'data').exists()
+
+    from config.settings import PROJECT_ROOT, settings
+    assert os.path.isabs(settings.api.ISS_CACHE_DIR)
+    assert settings.api.ISS_CACHE_DIR.startswith(PROJECT_ROOT)
+
+def test_current_prices_in_one_request(stub):
+    collector = MOEXDataCollector(cache_dir=None, base_url=stub.url)
+    prices = collector.get_current_prices(['SBER', 'NONE', 'GAZP'])
+    assert stub.stats['requests'] == 1
+    assert prices.index.tolist() == ['SBER', 'NONE', 'GAZP']
+    assert prices['SBER'] == 100.0 + BARS - 1 and prices['GAZP'] == 229.0
+    assert np.isnan(prices['NONE'])
+
+
+def test_decode_block_joins_pages():
+    columns = ['open', 'close', 'high', 'low', 'volume', 'begin']
+    pages = [
+        [[1.0, 2.0, 3.0, 0.5, 10, '2025-01-06 10:00:00']],
+        [[None, 2.5, 3.5, 1.5, None, '2025-01-06 11:00:00'], [2.0, 3.0, 4.0, 1.0, 7, '2025-01-06 12:00:00']],
+    ]
+    arrays = decode_block(columns, pages, CANDLE_COLUMNS)
+    assert arrays['begin'].dtype == np.dtype('datetime64[s]')
+    assert arrays['begin'][-1] == np.datetime64('2025-01-06T12:00:00')
+    assert np.isnan(arrays['open'][1]) and arrays['close'].tolist() == [2.0, 2.5, 3.0]
+    assert arrays['volume'].dtype == np.int64 and arrays['volume'].tolist() == [10, 0, 7]
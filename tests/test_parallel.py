@@ -0,0 +1,36 @@
+"""Параллельный расчет признаков панели: совпадение с расчетом в одном процессе"""
+
+import numpy as np
+import pytest
+
+from src.ml_models.features.feature_engineering import FeatureEngineer
+from src.ml_models.features.feature_store import FeatureStore
+from src.ml_models.features.parallel import PARALLEL_AVAILABLE, column_chunks
+
+needs_fork = pytest.mark.skipif(not PARALLEL_AVAILABLE, reason="нет fork")
+
+
+def test_column_chunks_cover_all_columns():
+    assert column_chunks([], 4) == []
+    assert column_chunks([10, 10, 10, 10], 2) == [(0, 2), (2, 4)]
+    assert column_chunks([100, 1, 1, 1], 2) == [(0, 1), (1, 4)]
+    # Частей не больше, чем столбцов
+    assert column_chunks([5, 5], 8) == [(0, 1), (1, 2)]
+
+
+@needs_fork
+def test_parallel_panel_features_match_sequential(panel):
+    sequential = FeatureEngineer().create_panel_features(panel)
+    parallel = FeatureEngineer(workers=2).create_panel_features(panel)
+    assert set(parallel) == set(sequential)
+    for ticker, expected in sequential.items():
+        assert parallel[ticker].index.equals(expected.index)
+        np.testing.assert_array_equal(parallel[ticker].to_numpy(), expected.to_numpy())
+
+
+@needs_fork
+def test_parallel_store_update_matches_sequential(tmp_path, panel):
+    sequential = FeatureStore(str(tmp_path / 'one')).panel_features(panel, '1h')
+    parallel = FeatureStore(str(tmp_path / 'two'), workers=2).panel_features(panel, '1h')
+    for ticker, expected in sequential.items():
+        np.testing.assert_array_equal(parallel[ticker].to_numpy(), expected.to_numpy())
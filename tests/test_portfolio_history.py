@@ -0,0 +1,94 @@
+"""Дельта-кодирование истории позиций: ключевые кадры, закрытие позиций, миграция"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from src.data_collection import database, migrations
+from src.data_collection.database import DatabaseManager
+from src.data_collection.portfolio_history import position_deltas, snapshot_changes
+
+START = datetime(2025, 1, 6, 10, 0)
+
+
+def make_db(tmp_path):
+    return DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}", archive_dir=str(tmp_path / 'archive'))
+
+
+def positions(**quantities):
+    return [{'ticker': ticker, 'quantity': quantity, 'average_price': 100.0} for ticker, quantity in quantities.items()]
+
+
+def test_snapshot_changes_keyframe_closes_missing_positions():
+    previous = {'SBER': (10.0, 100.0), 'GAZP': (5.0, 100.0)}
+    current = {'SBER': (10.0, 100.0)}
+    assert snapshot_changes(previous, current, keyframe=True) == {'SBER': (10.0, 100.0), 'GAZP': (0.0, 0.0)}
+    assert snapshot_changes(previous, current, keyframe=False) == position_deltas(previous, current)
+
+
+def test_position_closed_on_interval_keyframe(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'KEYFRAME_INTERVAL', 2)
+    db = make_db(tmp_path)
+    db.save_snapshot(1000, 0, positions(SBER=10, GAZP=5), timestamp=START)
+    # Второй снимок - ключевой кадр (интервал 2), GAZP в нем уже нет
+    db.save_snapshot(1000, 0, positions(SBER=10), timestamp=START + timedelta(hours=1))
+
+    history = db.load_position_history('GAZP', START - timedelta(hours=1), START + timedelta(days=1))
+    assert history['quantity'].tolist() == [0.0, 5.0, 0.0]
+    assert db.load_positions() == {'SBER': (10.0, 100.0)}
+
+
+def test_position_closed_on_first_snapshot_after_restart(tmp_path):
+    db = make_db(tmp_path)
+    db.save_snapshot(1000, 0, positions(SBER=10, GAZP=5), timestamp=START)
+    db.save_snapshot(1000, 0, positions(SBER=10, GAZP=5), timestamp=START + timedelta(hours=1))
+
+    # Новый процесс: кэш состояния пуст, первый снимок - ключевой кадр
+    restarted = make_db(tmp_path)
+    restarted.save_snapshot(1000, 0, positions(SBER=10), timestamp=START + timedelta(hours=2))
+
+    history = restarted.load_position_history('GAZP', START + timedelta(minutes=30), START + timedelta(days=1))
+    assert history['quantity'].tolist() == [5.0, 0.0]
+    assert restarted.load_positions(START + timedelta(hours=1)) == {'SBER': (10.0, 100.0), 'GAZP': (5.0, 100.0)}
+
+
+def test_deltas_reconstruct_every_snapshot(tmp_path):
+    db = make_db(tmp_path)
+    states = [
+        {'SBER': 10}, {'SBER': 10, 'GAZP': 3}, {'GAZP': 3}, {}, {'LKOH': 1}, {'LKOH': 2, 'SBER': 1},
+    ]
+    for i, state in enumerate(states):
+        db.save_snapshot(1000, 0, positions(**state), timestamp=START + timedelta(hours=i))
+    for i, state in enumerate(states):
+        expected = {ticker: (float(quantity), 100.0) for ticker, quantity in state.items()}
+        assert db.load_positions(START + timedelta(hours=i)) == expected
+
+
+def test_migration_closes_positions_on_keyframe(tmp_path, monkeypatch):
+    monkeypatch.setattr(migrations, 'KEYFRAME_INTERVAL', 2)
+    db = make_db(tmp_path)
+    legacy = [positions(SBER=10, GAZP=5), positions(SBER=10)]
+    with db.engine.begin() as conn:
+        for i, snapshot in enumerate(legacy):
+            conn.execute(
+                text(
+                    "INSERT INTO portfolio_snapshots (timestamp, account, total_value, cash, keyframe, positions_json) "
+                    "VALUES (:timestamp, '', 1000, 0, 0, :positions)"
+                ),
+                {'timestamp': START + timedelta(hours=i), 'positions': json.dumps(snapshot)},
+            )
+
+    assert migrations.migrate_portfolio_history(db.engine) == 2
+    history = db.load_position_history('GAZP', START - timedelta(hours=1), START + timedelta(days=1))
+    assert history['quantity'].tolist() == [0.0, 5.0, 0.0]
+
+
+@pytest.mark.parametrize('account', ['sandbox', 'live'])
+def test_accounts_have_separate_chains(tmp_path, account):
+    db = make_db(tmp_path)
+    db.save_snapshot(1000, 0, positions(SBER=1), account='sandbox', timestamp=START)
+    db.save_snapshot(1000, 0, positions(GAZP=2), account='live', timestamp=START)
+    expected = {'sandbox': {'SBER': (1.0, 100.0)}, 'live': {'GAZP': (2.0, 100.0)}}
+    assert db.load_positions(account=account) == expected[account]
@@ -0,0 +1,62 @@
+"""Кэш котировок и фоновый опрос: свежесть значений, bulk-запрос цен, стаканы"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data_collection.quote_poller import QuoteCache, QuotePoller
+
+
+class FakeCollector:
+    max_workers = 4
+
+    def __init__(self):
+        self.price_requests = []
+
+    def get_current_prices(self, tickers):
+        self.price_requests.append(list(tickers))
+        return pd.Series({'SBER': 250.0, 'GAZP': np.nan}).reindex(tickers)
+
+    def get_orderbook(self, ticker):
+        return {'bids': [{'price': 249.9, 'quantity': 10}], 'asks': []} if ticker == 'SBER' else None
+
+
+def test_cache_hides_stale_values():
+    cache = QuoteCache(history_size=3, max_age=5.0)
+    now = time.time()
+    cache.update_prices(pd.Series({'SBER': 1.0, 'GAZP': 2.0}), timestamp=now - 10)
+    for price in (3.0, 4.0, 5.0):
+        cache.update_prices(pd.Series({'SBER': price}), timestamp=now)
+
+    assert cache.get_price('SBER') == 5.0
+    assert cache.get_price('GAZP') is None
+    assert cache.get_price('GAZP', max_age=60) == 2.0
+    assert cache.get_history('SBER')[:, 1].tolist() == [3.0, 4.0, 5.0]
+    assert cache.get_prices(['SBER', 'LKOH']).isna().tolist() == [False, True]
+
+
+def test_poll_once_uses_one_bulk_request():
+    collector, cache = FakeCollector(), QuoteCache()
+    poller = QuotePoller(collector, cache, ['SBER', 'GAZP', 'SBER'], orderbook_interval=0)
+    poller.poll_once()
+
+    assert collector.price_requests == [['SBER', 'GAZP']]
+    assert cache.get_price('SBER') == 250.0 and cache.get_price('GAZP') is None
+    assert cache.get_orderbook('SBER')['bids'][0]['price'] == 249.9
+    assert cache.get_orderbook('GAZP') is None
+
+
+def test_background_poller_fills_cache():
+    collector, cache = FakeCollector(), QuoteCache()
+    poller = QuotePoller(collector, cache, ['SBER'], interval=0.01)
+    poller.start()
+    try:
+        deadline = time.time() + 5
+        while cache.get_price('SBER') is None and time.time() < deadline:
+            time.sleep(0.01)
+        poller.add_tickers(['GAZP'])
+    finally:
+        poller.stop()
+    assert cache.get_price('SBER') == 250.0
+    assert poller.tickers == ['SBER', 'GAZP']
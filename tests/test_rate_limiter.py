@@ -0,0 +1,108 @@
+"""Ограничитель частоты запросов: повторы на 429/5xx, неидемпотентные запросы, AIMD-темп"""
+
+import time
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+from src.utils.rate_limiter import HostBucket, HostLimits, RateLimiter, _parse_retry_after
+
+URL = 'http://iss.test/iss/securities.json'
+
+
+def response(status, headers=None):
+    result = requests.Response()
+    result.status_code = status
+    result.headers.update(headers or {})
+    return result
+
+
+class FakeSession:
+    """Отвечает заранее заданными статусами или исключениями по порядку"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.methods = []
+
+    def request(self, method, url, **kwargs):
+        self.methods.append(method)
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return response(*reply) if isinstance(reply, tuple) else response(reply)
+
+
+@pytest.fixture
+def limiter():
+    return RateLimiter(host_limits={'iss.test': HostLimits(rate=1000.0, burst=1000.0)}, max_retries=3, backoff_base=0.0)
+
+
+def test_get_is_retried_until_success(limiter):
+    session = FakeSession(503, requests.exceptions.ConnectionError("reset"), 200)
+    assert limiter.get(URL, session=session).status_code == 200
+    assert len(session.methods) == 3
+    stats = limiter.get_stats()['iss.test']
+    assert stats['retries'] == 2 and stats['throttled'] == 2
+
+
+def test_retries_are_bounded(limiter):
+    session = FakeSession(500, 500, 500, 500, 200)
+    assert limiter.get(URL, session=session).status_code == 500
+    assert len(session.methods) == 4
+
+
+def test_post_is_retried_only_when_not_processed(limiter):
+    # 5xx: ордер мог быть принят - без повтора
+    session = FakeSession(500, 200)
+    assert limiter.post(URL, session=session).status_code == 500
+    assert len(session.methods) == 1
+
+    # 429 и ошибки установки соединения: сервер запрос не обработал
+    refused = requests.exceptions.ConnectionError(
+        MaxRetryError(None, URL, NewConnectionError(None, "Connection refused"))
+    )
+    session = FakeSession(429, requests.exceptions.ConnectTimeout("timeout"), refused, 200)
+    assert limiter.post(URL, session=session).status_code == 200
+    assert len(session.methods) == 4
+
+    # Обрыв после отправки и таймаут чтения - ордер мог быть принят
+    aborted = requests.exceptions.ConnectionError(ProtocolError("Connection aborted."))
+    for error in (aborted, requests.exceptions.ReadTimeout("read")):
+        session = FakeSession(error, 200)
+        with pytest.raises(type(error)):
+            limiter.post(URL, session=session)
+        assert len(session.methods) == 1
+
+
+def test_long_retry_after_is_not_waited():
+    limiter = RateLimiter(host_limits={'iss.test': HostLimits(rate=1000.0, burst=1000.0)}, backoff_base=1.0,
+                          backoff_max=0.05)
+    assert limiter.backoff(10) <= 0.05
+    assert limiter.backoff(0, retry_after=0.05) == 0.05
+
+    session = FakeSession((503, {'Retry-After': '3600'}), 200)
+    with pytest.raises(requests.exceptions.RetryError):
+        limiter.get(URL, session=session)
+    assert len(session.methods) == 1
+    # Хост заблокирован не дольше backoff_max, а не на час
+    started = time.monotonic()
+    assert limiter.get(URL, session=FakeSession(200)).status_code == 200
+    assert time.monotonic() - started < 1
+
+
+def test_throttle_halves_rate_once_per_burst():
+    bucket = HostBucket('iss.test', HostLimits(rate=8.0, min_rate=1.0, burst=5.0))
+    bucket.on_throttle()
+    bucket.on_throttle()
+    assert bucket.rate == 4.0
+    bucket.on_success()
+    assert bucket.rate == pytest.approx(4.25)
+    assert bucket.acquire(timeout=0) is False
+
+
+def test_parse_retry_after():
+    assert _parse_retry_after('3') == 3.0
+    assert _parse_retry_after(None) is None
+    assert _parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert _parse_retry_after('soon') is None
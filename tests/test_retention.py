@@ -0,0 +1,70 @@
+"""Политика хранения: вытеснение в архив, прозрачное чтение, окно обслуживания по Москве"""
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from src.data_collection.database import DatabaseManager
+from src.data_collection.retention import RetentionManager, parse_retention_policy
+
+START = datetime(2025, 1, 6, 10, 0)
+NOW = datetime(2025, 1, 10, 12, 0)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}", archive_dir=str(tmp_path / 'archive'))
+    bars = 4 * 24 * 60
+    close = 100 + np.arange(bars, dtype='float64') / 100
+    db.save_candles(pd.DataFrame({
+        'time': pd.date_range(START, periods=bars, freq='1min'),
+        'open': close, 'high': close, 'low': close, 'close': close, 'volume': 1,
+    }), 'SBER', '1m')
+    return db
+
+
+def count_candles(db):
+    with db.engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM candles")).scalar()
+
+
+def test_parse_retention_policy():
+    assert parse_retention_policy('1m:90, 5m:365;') == {'1m': 90, '5m': 365}
+
+
+def test_compact_moves_old_bars_to_archive(db):
+    end = START + timedelta(days=5)
+    before = db.load_candles('SBER', '1m', START, end)
+    hourly = db.load_candles('SBER', '1h', START, end)
+
+    manager = RetentionManager(db, policy={'1m': 2}, archive=True, window='01:00-06:00')
+    # Граница - начало суток 8 января: бары 6 и 7 января уходят в архив
+    assert manager.compact(NOW) == {('SBER', '1m'): (14 + 24) * 60}
+    assert count_candles(db) == len(before) - (14 + 24) * 60
+    assert manager.compact(NOW) == {}
+
+    pd.testing.assert_frame_equal(db.load_candles('SBER', '1m', START, end), before)
+    pd.testing.assert_frame_equal(db.load_candles('SBER', '1h', START, end), hourly)
+    panel = db.load_panel(['SBER'], '1m', START, end)
+    np.testing.assert_array_equal(panel['close'][:, 0], before['close'].to_numpy())
+
+
+def test_compact_without_archive_drops_bars(db):
+    manager = RetentionManager(db, policy={'1m': 2}, archive=False, window='01:00-06:00')
+    manager.compact(NOW)
+    assert db.load_candles('SBER', '1m', START, NOW)['time'].iloc[0] == pd.Timestamp('2025-01-08')
+    # Агрегаты удаленного диапазона сохраняются
+    assert db.load_candles('SBER', '1h', START, NOW)['time'].iloc[0] == pd.Timestamp(START)
+
+
+def test_run_only_once_per_window(db):
+    manager = RetentionManager(db, policy={'1m': 2}, archive=True, window='23:00-06:00')
+    # 20:30 UTC = 23:30 по Москве: окно через полночь уже открыто
+    evening = datetime(2025, 1, 10, 20, 30, tzinfo=timezone.utc)
+    assert not manager.run(evening - timedelta(hours=1))
+    assert manager.run(evening)
+    assert not manager.run(evening + timedelta(minutes=10))
+    assert manager.run(evening - timedelta(hours=1), force=True)
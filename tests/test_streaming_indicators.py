@@ -0,0 +1,103 @@
+"""Потоковые признаки: совпадение с пакетным расчетом и восстановление состояния"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.ml_models.features import technical_indicators as ti
+from src.ml_models.features.feature_engineering import FeatureEngineer
+from src.ml_models.features.streaming_indicators import (
+    ATR, EMA, MACD, RSI, Bollinger, StreamingFeatureEngineer, Stochastic, WilderMean
+)
+
+
+def stream(engine, data):
+    rows = []
+    for bar in data.to_dict('records'):
+        rows.append(engine.update(bar))
+    return pd.DataFrame(rows, index=pd.DatetimeIndex(data['time']), columns=engine.feature_names)
+
+
+def test_streaming_matches_batch(candles):
+    batch = FeatureEngineer().create_features(candles)
+    streamed = stream(StreamingFeatureEngineer(), candles).loc[batch.index]
+    np.testing.assert_allclose(streamed.to_numpy(), batch.to_numpy(), rtol=1e-8, atol=1e-10)
+
+
+def test_indicators_match_batch_functions(candles):
+    close = candles['close'].to_numpy()
+    for indicator, expected in [
+        (EMA(20), ti.ema(close, 20)),
+        (WilderMean(14), ti.wilder_mean(close, 14)),
+        (RSI(14), ti.rsi(close, 14)),
+        (RSI(14, wilder=True), ti.rsi_wilder(close, 14)),
+    ]:
+        values = np.array([indicator.update(x) for x in close])
+        np.testing.assert_allclose(values, expected, rtol=1e-9, equal_nan=True)
+
+
+def test_indicators_match_batch_functions_across_gaps(candles):
+    data = candles.copy()
+    for i in (40, 150, 151, 152, 400):
+        data.loc[i, ['high', 'low', 'close']] = np.nan
+    high, low, close = (data[name].to_numpy() for name in ('high', 'low', 'close'))
+
+    short = EMA(3)
+    np.testing.assert_array_equal([short.update(x) for x in [1, 2, np.nan, 4, 5, 6]], [1, 1.5, np.nan, 4, 4.5, 5.25])
+    for indicator, expected in [
+        (EMA(20), ti.ema(close, 20)),
+        (WilderMean(14), ti.wilder_mean(close, 14)),
+        (RSI(14), ti.rsi(close, 14)),
+        (RSI(14, wilder=True), ti.rsi_wilder(close, 14)),
+    ]:
+        values = np.array([indicator.update(x) for x in close])
+        np.testing.assert_allclose(values, expected, rtol=1e-9, equal_nan=True)
+
+    for indicator, expected, args in [
+        (MACD(), ti.macd(close), (close,)),
+        (Bollinger(20, 2.0), ti.bollinger(close, 20, 2.0), (close,)),
+        (ATR(14), (ti.atr(high, low, close, 14),), (high, low, close)),
+        (Stochastic(14, 3), ti.stochastic(high, low, close, 14, 3), (high, low, close)),
+    ]:
+        values = np.array([indicator.update(*bar) for bar in zip(*args)]).reshape(len(close), -1)
+        np.testing.assert_allclose(values, np.column_stack(expected), rtol=1e-8, atol=1e-10, equal_nan=True)
+
+
+def test_seeded_state_continues_like_streamed(candles):
+    data = candles.copy()
+    data.loc[[100, 200, 201], ['high', 'low', 'close']] = np.nan
+    uninterrupted = stream(StreamingFeatureEngineer(), data)
+
+    seeded = StreamingFeatureEngineer()
+    head = data.iloc[:350]
+    seeded.seed(head['time'].to_numpy(dtype='datetime64[ns]'), {name: head[name].to_numpy() for name in head.columns})
+    restored = StreamingFeatureEngineer.from_dict(json.loads(json.dumps(seeded.to_dict())))
+    assert restored.bars == 350 and restored.last_time == pd.Timestamp(head['time'].iloc[-1]).value
+
+    tail = stream(restored, data.iloc[350:])
+    np.testing.assert_allclose(tail.to_numpy(), uninterrupted.iloc[350:].to_numpy(), rtol=1e-8, atol=1e-10)
+
+
+def test_restored_state_continues_identically(candles):
+    uninterrupted = stream(StreamingFeatureEngineer(), candles)
+
+    engine = StreamingFeatureEngineer()
+    head = stream(engine, candles.iloc[:350])
+    state = json.loads(json.dumps(engine.to_dict()))
+    restored = StreamingFeatureEngineer.from_dict(state)
+    tail = stream(restored, candles.iloc[350:])
+
+    resumed = pd.concat([head, tail])
+    np.testing.assert_array_equal(resumed.to_numpy(), uninterrupted.to_numpy())
+
+
+def test_warm_up_skips_seen_bars(candles):
+    engine = StreamingFeatureEngineer()
+    engine.warm_up(candles.iloc[:300])
+    last = engine.warm_up(candles)
+    reference = StreamingFeatureEngineer()
+    expected = reference.warm_up(candles)
+    assert engine.bars == len(candles)
+    np.testing.assert_array_equal(last, expected)
+    assert engine.warm_up(candles) is None
@@ -0,0 +1,80 @@
+"""Индикаторы панели: сверка с pandas и с пошаговыми рекурсиями"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ml_models.features import technical_indicators as ti
+
+
+def random_panel(bars, tickers, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (bars, tickers)), axis=0))
+
+
+def reference_recurrence(decay, inflow):
+    out = np.array(inflow, dtype='float64')
+    for t in range(1, len(out)):
+        out[t] += decay[t] * out[t - 1]
+    return out
+
+
+def reference_wilder(x, period):
+    out = np.full(len(x), np.nan)
+    seen, total, average = 0, 0.0, np.nan
+    for t, value in enumerate(x):
+        if not np.isnan(value):
+            seen += 1
+            if seen <= period:
+                total += value
+                if seen == period:
+                    average = total / period
+            else:
+                average = (average * (period - 1) + value) / period
+        out[t] = average
+    return out
+
+
+@pytest.mark.parametrize('tickers', [1, 3, 40])
+def test_linear_recurrence_matches_loop(tickers):
+    # 3 тикера - скан удвоением шага, 40 - шаг по барам (шире SCAN_MAX_COLUMNS)
+    rng = np.random.default_rng(tickers)
+    decay = rng.uniform(0, 1, (1000, tickers))
+    decay[rng.random(decay.shape) < 0.01] = 0.0
+    inflow = rng.normal(size=(1000, tickers))
+    np.testing.assert_allclose(ti.linear_recurrence(decay, inflow), reference_recurrence(decay, inflow), rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize('tickers', [1, 4, 40])
+def test_ema_many_matches_pandas(tickers):
+    panel = random_panel(2000, tickers)
+    # Короткий ряд: хвост столбца - NaN, как в FeatureEngineer.pack_panel
+    panel[1500:, 0] = np.nan
+    spans = [5, 12, 26, 200]
+    for span, values in zip(spans, ti.ema_many(panel, spans)):
+        expected = pd.DataFrame(panel).ewm(span=span, adjust=False).mean().to_numpy().copy()
+        expected[np.isnan(panel)] = np.nan
+        np.testing.assert_allclose(values, expected, rtol=1e-12)
+
+
+def test_ema_restarts_after_gap():
+    x = np.array([np.nan, 1.0, 2.0, np.nan, 10.0, 20.0])
+    result = ti.ema(x, alpha=0.5)
+    np.testing.assert_array_equal(result, [np.nan, 1.0, 1.5, np.nan, 10.0, 15.0])
+
+
+@pytest.mark.parametrize('tickers', [1, 40])
+def test_wilder_mean_matches_loop(tickers):
+    panel = random_panel(1500, tickers, seed=1)
+    panel[:20, 0] = np.nan
+    panel[700:710, 0] = np.nan
+    result = ti.wilder_mean(panel, 14)
+    for j in range(tickers):
+        np.testing.assert_allclose(result[:, j], reference_wilder(panel[:, j], 14), rtol=1e-12)
+
+
+def test_rsi_wilder_bounds():
+    close = random_panel(500, 2, seed=2)
+    values = ti.rsi_wilder(close, 14)
+    assert np.isnan(values[:14]).all()
+    assert ((values[14:] >= 0) & (values[14:] <= 100)).all()
@@ -0,0 +1,148 @@
+"""Агрегация ленты сделок в бары и загрузка сделок в таблицу candles"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_collection.database import DatabaseManager
+from src.data_collection.trades_stream import (
+    TickBarAggregator, TimeBarAggregator, TradesIngestor, VolumeBarAggregator, make_aggregator
+)
+
+START = np.datetime64('2025-01-06T10:00:00', 'ns')
+
+
+def ticks(count, seconds=None, start=0):
+    """count сделок с ценами start.., по секунде на сделку (или в заданные секунды)"""
+    seconds = np.arange(count) if seconds is None else np.asarray(seconds)
+    times = START + seconds.astype('timedelta64[s]')
+    prices = 100.0 + np.arange(start, start + count)
+    return times, prices, np.ones(count, dtype='int64')
+
+
+def test_time_bars_match_batch_resample():
+    times, prices, quantities = ticks(600)
+    agg = TimeBarAggregator('1m')
+    # Порции, не совпадающие с границами баров
+    parts = [agg.update(times[lo:lo + 70], prices[lo:lo + 70], quantities[lo:lo + 70]) for lo in range(0, 600, 70)]
+    bars = pd.concat(parts + [agg.flush()], ignore_index=True)
+
+    expected = pd.Series(prices, index=pd.DatetimeIndex(times)).resample('1min').ohlc()
+    assert agg.timeframe == 'tr1m'
+    assert bars['time'].tolist() == expected.index.tolist()
+    assert np.array_equal(bars[['open', 'high', 'low', 'close']].to_numpy(), expected.to_numpy())
+    assert bars['volume'].tolist() == [60] * 10
+
+
+def test_tick_bars_in_same_second_get_unique_times():
+    # 10 сделок в одну секунду -> 5 тиковых баров
+    times, prices, quantities = ticks(10, seconds=np.zeros(10))
+    agg = TickBarAggregator(2)
+    first = agg.update(times[:3], prices[:3], quantities[:3])
+    second = agg.update(times[3:], prices[3:], quantities[3:])
+    bars = pd.concat([first, second], ignore_index=True)
+
+    assert len(bars) == 5
+    assert bars['time'].is_unique and bars['time'].is_monotonic_increasing
+    assert bars['time'].iloc[0] == pd.Timestamp(START)
+    assert bars['open'].tolist() == [100.0, 102.0, 104.0, 106.0, 108.0]
+    # Сдвиг - микросекунды: время сохраняется в БД без потерь
+    assert (bars['time'].diff().dropna() == pd.Timedelta(1, 'us')).all()
+
+
+def test_volume_bars_keep_times_of_later_seconds():
+    times, prices, _ = ticks(6, seconds=[0, 0, 0, 5, 5, 9])
+    quantities = np.array([5, 5, 5, 5, 5, 5])
+    agg = VolumeBarAggregator(5)
+    bars = agg.update(times, prices, quantities)
+
+    assert len(bars) == 6
+    expected = [START, START + np.timedelta64(1, 'us'), START + np.timedelta64(2, 'us'),
+                START + np.timedelta64(5, 's'), START + np.timedelta64(5, 's') + np.timedelta64(1, 'us'),
+                START + np.timedelta64(9, 's')]
+    assert bars['time'].tolist() == [pd.Timestamp(t) for t in expected]
+
+
+def test_make_aggregator_labels():
+    assert make_aggregator('1h').timeframe == 'tr1h'
+    assert make_aggregator('t500').timeframe == 't500'
+    assert make_aggregator('v100000').timeframe == 'v100000'
+    with pytest.raises(ValueError):
+        make_aggregator('x1')
+
+
+class FakeCollector:
+    """Лента сделок постранично; страница fail_at бросает исключение один раз"""
+
+    def __init__(self, pages, fail_at=None):
+        self.pages = pages
+        self.fail_at = fail_at
+
+    def iter_trades(self, ticker, since_tradeno=None):
+        for i, page in enumerate(self.pages):
+            if since_tradeno is not None and page['TRADENO'][-1] <= since_tradeno:
+                continue
+            if i == self.fail_at:
+                self.fail_at = None
+                raise ConnectionError("обрыв соединения")
+            yield page
+
+
+def trade_pages(count, page_size):
+    times, prices, quantities = ticks(count, seconds=np.arange(count) * 30)
+    tradeno = np.arange(1, count + 1)
+    return [
+        {'TRADENO': tradeno[lo:lo + page_size], 'SYSTIME': times[lo:lo + page_size],
+         'PRICE': prices[lo:lo + page_size], 'QUANTITY': quantities[lo:lo + page_size]}
+        for lo in range(0, count, page_size)
+    ]
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}", archive_dir=str(tmp_path / 'archive'))
+
+
+def test_ingestor_does_not_overwrite_iss_candles(db):
+    iss = pd.DataFrame({'time': [pd.Timestamp(START)], 'open': [1.0], 'high': [1.0], 'low': [1.0],
+                        'close': [1.0], 'volume': [1]})
+    db.save_candles(iss, 'SBER', '1m')
+    ingestor = TradesIngestor(FakeCollector(trade_pages(8, 4)), db, ['SBER'], bar_specs=['1m'])
+    ingestor.poll()
+
+    end = datetime(2025, 1, 7)
+    assert db.load_candles('SBER', '1m', datetime(2025, 1, 6), end)['close'].tolist() == [1.0]
+    assert len(db.load_candles('SBER', 'tr1m', datetime(2025, 1, 6), end)) == 4
+
+
+def test_failed_page_keeps_bars_of_earlier_pages(db):
+    # 12 сделок по 30 с, по 4 на страницу: третья страница падает
+    collector = FakeCollector(trade_pages(12, 4), fail_at=2)
+    ingestor = TradesIngestor(collector, db, ['SBER'], bar_specs=['1m'], save_partial=False)
+    assert ingestor.poll() == {'SBER': 0}
+    assert ingestor.last_tradeno['SBER'] == 8
+
+    # Закрыты бары первых двух страниц; четвертый бар еще формируется
+    start, end = datetime(2025, 1, 6), datetime(2025, 1, 7)
+    assert len(db.load_candles('SBER', 'tr1m', start, end)) == 3
+
+    # Повторный опрос продолжает с сохраненного номера сделки без потерь
+    assert ingestor.poll() == {'SBER': 4}
+    ingestor.flush()
+    bars = db.load_candles('SBER', 'tr1m', start, end)
+    assert len(bars) == 6
+    assert bars['volume'].tolist() == [2] * 6
+    assert bars['close'].iloc[-1] == 111.0
+
+
+def test_tick_bars_saved_without_dedup(db):
+    times, prices, quantities = ticks(20, seconds=np.zeros(20))
+    page = {'TRADENO': np.arange(1, 21), 'SYSTIME': times, 'PRICE': prices, 'QUANTITY': quantities}
+    ingestor = TradesIngestor(FakeCollector([page]), db, ['SBER'], bar_specs=['t5'])
+    ingestor.poll()
+    bars = db.load_candles('SBER', 't5', datetime(2025, 1, 6), datetime(2025, 1, 7))
+    assert len(bars) == 4
+    assert bars['volume'].sum() == 20
+
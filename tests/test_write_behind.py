@@ -0,0 +1,108 @@
+"""Фоновая пакетная запись: склейка пачек, подтверждения, отклонение только плохих записей"""
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from src.data_collection.database import DatabaseManager
+from src.data_collection.write_behind import WriteBehindQueue
+
+START = datetime(2025, 1, 6, 10, 0)
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}", archive_dir=str(tmp_path / 'archive'))
+
+
+def candles(start, count):
+    times = pd.date_range(start, periods=count, freq='1h')
+    return pd.DataFrame({
+        'time': times, 'open': 100.0, 'high': 101.0, 'low': 99.0, 'close': 100.5, 'volume': 10,
+    })
+
+
+def trade(order_id, ticker='SBER'):
+    return {'order_id': order_id, 'ticker': ticker, 'direction': 'BUY', 'quantity': 1, 'price': 100.0,
+            'timestamp': START}
+
+
+def count(db, table):
+    with db.engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def test_batches_are_merged_and_flushed(db):
+    writer = WriteBehindQueue(db, batch_size=100, flush_interval=60, durable_trades=False)
+    try:
+        writer.save_candles(candles(START, 3), 'SBER', '1h')
+        writer.save_candles(candles(START + timedelta(hours=3), 2), 'SBER', '1h')
+        writer.save_trade(trade('1'))
+        writer.save_snapshot(1000, 0, [{'ticker': 'SBER', 'quantity': 1, 'average_price': 100.0}], timestamp=START)
+        assert writer.flush(timeout=10)
+    finally:
+        writer.close()
+
+    assert len(db.load_candles('SBER', '1h', START, START + timedelta(days=1))) == 5
+    assert count(db, 'trades') == 1
+    assert db.load_positions() == {'SBER': (1.0, 100.0)}
+    assert writer.stats['written'] == 4
+    assert writer.stats['rejected'] == 0
+
+
+def test_durable_trade_is_acknowledged(db):
+    writer = WriteBehindQueue(db, flush_interval=60)
+    try:
+        assert writer.save_trade(trade('1')).wait(0)
+        assert count(db, 'trades') == 1
+    finally:
+        writer.close()
+
+
+def test_bad_record_rejects_only_itself(db):
+    db.save_trade(trade('dup'))
+    writer = WriteBehindQueue(db, batch_size=100, flush_interval=60, durable_trades=False, retry_delay=0)
+    try:
+        writer.save_candles(candles(START, 3), 'SBER', '1h')
+        good = writer.save_trade(trade('ok'))
+        bad = writer.save_trade(trade('dup'))
+        writer.save_snapshot(1000, 0, timestamp=START)
+        assert not writer.flush(timeout=10)
+    finally:
+        writer.close()
+
+    assert good.wait(0)
+    assert not bad.wait(0) and bad.error is not None
+    # Свечи, вторая сделка и снимок записаны, несмотря на ошибку в пачке
+    assert len(db.load_candles('SBER', '1h', START, START + timedelta(days=1))) == 3
+    assert count(db, 'trades') == 2
+    assert count(db, 'portfolio_snapshots') == 1
+    assert writer.stats['rejected'] == 1
+    assert writer.stats['written'] == 3
+
+
+def test_transient_error_is_retried(db, monkeypatch):
+    calls = []
+    write_batch = db.write_batch
+
+    def flaky(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise OSError("database is locked")
+        return write_batch(**kwargs)
+
+    monkeypatch.setattr(db, 'write_batch', flaky)
+    writer = WriteBehindQueue(db, batch_size=100, flush_interval=60, durable_trades=False, retry_delay=0)
+    try:
+        writer.save_candles(candles(START, 2), 'SBER', '1h')
+        writer.save_trade(trade('1'))
+        assert writer.flush(timeout=10)
+    finally:
+        writer.close()
+
+    # Повтор всей пачки, без разбиения
+    assert len(calls) == 2
+    assert count(db, 'trades') == 1
+    assert writer.stats['rejected'] == 0